@@ -1,29 +1,229 @@
-from fastapi import FastAPI, Request, Form, Cookie, Response
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Request, Form, Cookie, Response, HTTPException, Query
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
 from sse_starlette.sse import EventSourceResponse
-import requests
+from starlette.background import BackgroundTask
+from contextlib import asynccontextmanager
+import base64
+import binascii
 import json
-from datetime import datetime
+import logging
+import os
+import time
+from datetime import datetime, timedelta
 from storage import Storage
-from conversation import ConversationHistory
+from conversation import ConversationHistory, HistoryBackend, SQLiteHistoryBackend
 from memory_manager import MemoryManager
-from typing import Dict, List, Optional, AsyncGenerator
+from offload import AsyncMemoryManager, AsyncPromptBuilder, AsyncStorage, BlockingPool
+from llm_client import OllamaClient, LLMError
+from metrics import Counter, Gauge, bind_request, finish_request, record_first_token, record_generation, record_stage, render as render_metrics, start_request, timed
+from post_processing import PostProcessor
+from compaction import Compactor, RetentionPolicy
+from prompt_builder import Prompt, PromptBuilder
+from context_packer import ContextPacker
+from response_cache import CacheKey, ResponseCache, make_key
+from scheduler import FairScheduler, QueueFull, Ticket
+from streaming import PARTIAL_RESPONSE_MARKER, StreamCancelled, StreamHandle, StreamRegistry, TokenCoalescer, replay
+from typing import Any, AsyncIterator, Dict, List, Optional, AsyncGenerator, Tuple
 import uuid
 import asyncio
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+# Profile, vector store, embedding cache and SQLite history all live under here.
+DATA_DIR = os.environ.get("DATA_DIR", "data")
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434")
+MODEL_NAME = os.environ.get("MODEL_NAME", "llama3.2:latest")
+LLM_CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.environ.get("LLM_READ_TIMEOUT", "120"))
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", "32"))
+# "chat" sends a stable system message first so Ollama can reuse its KV cache; "generate" is the flat prompt.
+LLM_API = os.environ.get("LLM_API", "chat")
+LLM_KEEP_ALIVE = os.environ.get("LLM_KEEP_ALIVE", "30m")
+LLM_WARM_UP = os.environ.get("LLM_WARM_UP", "1") == "1"
+# Opens ChromaDB and loads the embedding model in the background after startup instead of on the first request.
+MEMORY_WARM_UP = os.environ.get("MEMORY_WARM_UP", "1") == "1"
+# A failed memory warm-up is retried after this many seconds, doubling up to a minute.
+MEMORY_WARM_UP_RETRY = float(os.environ.get("MEMORY_WARM_UP_RETRY", "5"))
+# Admission control: generations beyond LLM_MAX_IN_FLIGHT wait in a per-session round-robin queue.
+LLM_MAX_IN_FLIGHT = int(os.environ.get("LLM_MAX_IN_FLIGHT", "2"))
+LLM_MAX_QUEUE = int(os.environ.get("LLM_MAX_QUEUE", "64"))
+LLM_MAX_QUEUE_PER_SESSION = int(os.environ.get("LLM_MAX_QUEUE_PER_SESSION", "4"))
+QUEUE_POSITION_INTERVAL = float(os.environ.get("QUEUE_POSITION_INTERVAL", "0.5"))
+POST_PROCESSING_QUEUE_SIZE = int(os.environ.get("POST_PROCESSING_QUEUE_SIZE", "100"))
+POST_PROCESSING_BATCH_SIZE = int(os.environ.get("POST_PROCESSING_BATCH_SIZE", "8"))
+MEMORY_WRITE_BUFFER_SIZE = int(os.environ.get("MEMORY_WRITE_BUFFER_SIZE", "32"))
+MEMORY_FLUSH_INTERVAL = float(os.environ.get("MEMORY_FLUSH_INTERVAL", "1.0"))
+MAX_SESSIONS = int(os.environ.get("MAX_SESSIONS", "10000"))
+SESSION_TTL = float(os.environ.get("SESSION_TTL", str(24 * 3600)))
+HISTORY_BACKEND = os.environ.get("HISTORY_BACKEND", "memory")
+HISTORY_DB_PATH = os.environ.get("HISTORY_DB_PATH", os.path.join(DATA_DIR, "history.db"))
+EMBEDDING_CACHE_SIZE = int(os.environ.get("EMBEDDING_CACHE_SIZE", "1024"))
+EMBEDDING_CACHE_DISK_CAPACITY = int(os.environ.get("EMBEDDING_CACHE_DISK_CAPACITY", "100000"))
+# "hybrid" fuses BM25 and vector hits, "lexical" skips embedding the query, "vector" is embedding-only.
+RETRIEVAL_MODE = os.environ.get("RETRIEVAL_MODE", "hybrid")
+# The BM25 index lives in each worker process; with several workers, rebuild it this often (seconds) to pick up
+# memories written by the others. 0 never rebuilds.
+LEXICAL_INDEX_REFRESH_INTERVAL = float(os.environ.get("LEXICAL_INDEX_REFRESH_INTERVAL", "0"))
+# Unset keeps exact-match dedup only; a distance in the collection's metric also merges paraphrases.
+FACT_NEAR_DUPLICATE_DISTANCE = float(os.environ["FACT_NEAR_DUPLICATE_DISTANCE"]) if os.environ.get("FACT_NEAR_DUPLICATE_DISTANCE") else None
+# Compaction deletes old memories for good, so it is off (0) unless an interval in seconds is set.
+COMPACTION_INTERVAL = float(os.environ.get("COMPACTION_INTERVAL", "0"))
+COMPACTION_BATCH_SIZE = int(os.environ.get("COMPACTION_BATCH_SIZE", "200"))
+CONVERSATION_RETENTION_DAYS = float(os.environ.get("CONVERSATION_RETENTION_DAYS", "30"))
+FACT_RETENTION_DAYS = float(os.environ.get("FACT_RETENTION_DAYS", "30"))
+SUMMARIZE_EXPIRED_CONVERSATIONS = os.environ.get("SUMMARIZE_EXPIRED_CONVERSATIONS", "1") == "1"
+# ChromaDB, embedding and profile file calls run on this pool instead of the event loop.
+BLOCKING_IO_THREADS = int(os.environ.get("BLOCKING_IO_THREADS", "8"))
+BLOCKING_IO_TIMEOUT = float(os.environ.get("BLOCKING_IO_TIMEOUT", "15"))
+# A slower memory lookup is skipped and the reply is generated without it.
+RETRIEVAL_TIMEOUT = float(os.environ.get("RETRIEVAL_TIMEOUT", "5"))
+# Token budget for history, memories and profile together; 0 disables packing.
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "2048"))
+HISTORY_CONTEXT_MESSAGES = int(os.environ.get("HISTORY_CONTEXT_MESSAGES", "5"))
+MEMORY_CONTEXT_LIMIT = int(os.environ.get("MEMORY_CONTEXT_LIMIT", "3"))
+# Tokens are batched into one SSE frame per window or size limit; an interval of 0 sends every token.
+STREAM_FLUSH_INTERVAL = float(os.environ.get("STREAM_FLUSH_INTERVAL", "0.05"))
+STREAM_FLUSH_BYTES = int(os.environ.get("STREAM_FLUSH_BYTES", "256"))
+# Finished replies are reused for an identical prompt; 0 entries disables the cache.
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "0"))
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", "3600"))
+# Cosine distance under which a reworded message reuses a reply given the same profile, memories and history.
+RESPONSE_CACHE_SEMANTIC_DISTANCE = float(os.environ["RESPONSE_CACHE_SEMANTIC_DISTANCE"]) if os.environ.get("RESPONSE_CACHE_SEMANTIC_DISTANCE") else None
+# Adds a per-request stage breakdown: a Server-Timing header on /chat, a "timings" field in the SSE done event.
+REQUEST_TIMING_DETAILS = os.environ.get("REQUEST_TIMING_DETAILS", "0") == "1"
+MEMORIES_PAGE_SIZE = int(os.environ.get("MEMORIES_PAGE_SIZE", "50"))
+MEMORIES_MAX_PAGE_SIZE = 200
+RECENT_CONVERSATIONS = 10
+
+def create_history_backend() -> Optional[HistoryBackend]:
+    if HISTORY_BACKEND == "sqlite":
+        return SQLiteHistoryBackend(HISTORY_DB_PATH, ttl=SESSION_TTL)
+    return None
 
 # Initialize components
 templates = Jinja2Templates(directory="templates")
-storage = Storage()
-conversation_history = ConversationHistory()
-memory_manager = MemoryManager()
+storage = Storage(data_dir=DATA_DIR)
+conversation_history = ConversationHistory(
+    max_sessions=MAX_SESSIONS,
+    session_ttl=SESSION_TTL,
+    backend=create_history_backend()
+)
+prompt_builder = PromptBuilder(
+    conversation_history,
+    storage,
+    max_messages=HISTORY_CONTEXT_MESSAGES,
+    packer=ContextPacker(CONTEXT_TOKEN_BUDGET) if CONTEXT_TOKEN_BUDGET > 0 else None
+)
+memory_manager = MemoryManager(
+    data_dir=DATA_DIR,
+    write_buffer_size=MEMORY_WRITE_BUFFER_SIZE,
+    flush_interval=MEMORY_FLUSH_INTERVAL,
+    embedding_cache_size=EMBEDDING_CACHE_SIZE,
+    embedding_cache_disk_capacity=EMBEDDING_CACHE_DISK_CAPACITY,
+    near_duplicate_distance=FACT_NEAR_DUPLICATE_DISTANCE,
+    retrieval_mode=RETRIEVAL_MODE,
+    # Each lookup queries both collections at once, so two threads per concurrent lookup.
+    query_threads=2 * BLOCKING_IO_THREADS
+)
+blocking_pool = BlockingPool(max_workers=BLOCKING_IO_THREADS, timeout=BLOCKING_IO_TIMEOUT)
+async_memory = AsyncMemoryManager(memory_manager, blocking_pool)
+async_storage = AsyncStorage(storage, blocking_pool)
+async_prompt_builder = AsyncPromptBuilder(prompt_builder, blocking_pool)
+llm_client = OllamaClient(
+    base_url=OLLAMA_URL,
+    model=MODEL_NAME,
+    connect_timeout=LLM_CONNECT_TIMEOUT,
+    read_timeout=LLM_READ_TIMEOUT,
+    max_connections=LLM_MAX_CONNECTIONS,
+    keep_alive=LLM_KEEP_ALIVE or None,
+    on_complete=record_generation
+)
+post_processor = PostProcessor(
+    memory_manager,
+    max_queue_size=POST_PROCESSING_QUEUE_SIZE,
+    batch_size=POST_PROCESSING_BATCH_SIZE
+)
+coalescer = TokenCoalescer(max_delay=STREAM_FLUSH_INTERVAL, max_bytes=STREAM_FLUSH_BYTES)
+stream_registry = StreamRegistry()
+scheduler = FairScheduler(
+    max_in_flight=LLM_MAX_IN_FLIGHT,
+    max_queue=LLM_MAX_QUEUE,
+    max_queue_per_session=LLM_MAX_QUEUE_PER_SESSION
+)
+response_cache = ResponseCache(
+    max_entries=RESPONSE_CACHE_SIZE,
+    ttl=RESPONSE_CACHE_TTL,
+    semantic_distance=RESPONSE_CACHE_SEMANTIC_DISTANCE
+)
+compactor = Compactor(
+    memory_manager,
+    RetentionPolicy(
+        conversation_max_age=CONVERSATION_RETENTION_DAYS * 24 * 3600,
+        summarize=SUMMARIZE_EXPIRED_CONVERSATIONS,
+        fact_max_age=FACT_RETENTION_DAYS * 24 * 3600,
+        batch_size=COMPACTION_BATCH_SIZE
+    )
+)
+
+# Background warm-ups still running; /health/ready reports 503 until they finish.
+warm_ups: Dict[str, asyncio.Task] = {}
+# The last error of a warm-up that is being retried.
+warm_up_errors: Dict[str, str] = {}
+
+async def warm_up_memory() -> None:
+    delay = MEMORY_WARM_UP_RETRY
+    while True:
+        try:
+            await async_memory.warm_up()
+        except Exception as e:
+            logger.exception("Memory warm-up failed; retrying in %.1fs", delay)
+            warm_up_errors["memory"] = str(e) or type(e).__name__
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60)
+        else:
+            warm_up_errors.pop("memory", None)
+            return
 
-OLLAMA_URL = "http://localhost:11434/api/generate"
-MODEL_NAME = "llama3.2:latest"
+async def refresh_lexical_indexes(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await blocking_pool.run(memory_manager.rebuild_lexical_indexes, timeout=float("inf"))
+        except Exception:
+            logger.exception("Rebuilding the lexical index failed")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    post_processor.start()
+    # Both run in the background so a slow model load never delays startup.
+    if MEMORY_WARM_UP:
+        warm_ups["memory"] = asyncio.create_task(warm_up_memory())
+    if LLM_WARM_UP:
+        system = await async_prompt_builder.system_message() if LLM_API == "chat" else None
+        warm_ups["llm"] = asyncio.create_task(llm_client.warm_up(system))
+    if COMPACTION_INTERVAL > 0:
+        compactor.start(COMPACTION_INTERVAL)
+    index_refresher = None
+    if LEXICAL_INDEX_REFRESH_INTERVAL > 0 and RETRIEVAL_MODE != "vector":
+        index_refresher = asyncio.create_task(refresh_lexical_indexes(LEXICAL_INDEX_REFRESH_INTERVAL))
+    yield
+    if index_refresher is not None:
+        index_refresher.cancel()
+    for task in warm_ups.values():
+        task.cancel()
+    warm_ups.clear()
+    warm_up_errors.clear()
+    await post_processor.stop()
+    await compactor.stop()
+    await async_memory.close()
+    blocking_pool.shutdown()
+    conversation_history.close()
+    await llm_client.aclose()
+
+app = FastAPI(lifespan=lifespan)
 
 class ChatResponse(BaseModel):
     response: str
@@ -32,7 +232,7 @@ class ChatResponse(BaseModel):
 async def root(request: Request, session: Optional[str] = Cookie(None)) -> HTMLResponse:
     chat_history = []
     if session:
-        chat_history = conversation_history.get_messages(session)
+        chat_history = await async_prompt_builder.get_messages(session)
     return templates.TemplateResponse(
         "chat.html", 
         {
@@ -44,51 +244,124 @@ async def root(request: Request, session: Optional[str] = Cookie(None)) -> HTMLR
 
 @app.get("/profile", response_class=HTMLResponse)
 async def profile_form(request: Request) -> HTMLResponse:
-    profile_data = storage.load_profile()
+    profile_data = await async_storage.load_profile()
     return templates.TemplateResponse("profile.html", {
         "request": request,
         "profile": profile_data,
         "active_page": "profile"
     })
 
+def encode_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"offset": offset}).encode()).decode()
+
+def decode_cursor(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    try:
+        offset = json.loads(base64.urlsafe_b64decode(cursor.encode()))["offset"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(offset, int) or offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return offset
+
+def parse_date(value: Optional[str], name: str, end_of_day: bool = False) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name} date")
+    # A bare date as the upper bound includes that whole day.
+    if end_of_day and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed.timestamp()
+
+async def load_memories_page(
+    category: Optional[str],
+    since: Optional[str],
+    until: Optional[str],
+    cursor: Optional[str],
+    limit: int
+) -> Dict[str, Any]:
+    offset = decode_cursor(cursor)
+    facts_page = async_memory.get_facts_page(
+        category=category,
+        since=parse_date(since, "since"),
+        until=parse_date(until, "until", end_of_day=True),
+        limit=limit,
+        offset=offset
+    )
+    try:
+        # Recent conversations are only shown alongside the first page of facts.
+        if offset == 0:
+            (facts, next_offset), conversations = await asyncio.gather(
+                facts_page, async_memory.get_recent_conversations(RECENT_CONVERSATIONS)
+            )
+        else:
+            (facts, next_offset), conversations = await facts_page, []
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Loading memories timed out")
+    return {
+        "facts": facts,
+        "conversations": conversations,
+        "next_cursor": encode_cursor(next_offset) if next_offset is not None else None
+    }
+
 @app.get("/memories", response_class=HTMLResponse)
-async def view_memories(request: Request) -> HTMLResponse:
-    facts = memory_manager.facts.get()
-    conversations = memory_manager.conversations.get()
-    
+async def view_memories(
+    request: Request,
+    category: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(MEMORIES_PAGE_SIZE, ge=1, le=MEMORIES_MAX_PAGE_SIZE)
+) -> HTMLResponse:
+    page = await load_memories_page(category, since, until, cursor, limit)
+
     categorized_facts: Dict[str, List[Dict]] = {}
-    
-    if facts["metadatas"]:
-        for idx, metadata in enumerate(facts["metadatas"]):
-            category = metadata.get("category", "uncategorized")
-            if category not in categorized_facts:
-                categorized_facts[category] = []
-            
-            categorized_facts[category].append({
-                "content": facts["documents"][idx],
-                "timestamp": metadata.get("timestamp", "Unknown"),
-                "confidence": metadata.get("confidence", "medium")
-            })
-    
-    recent_conversations = []
-    if conversations["metadatas"]:
-        for idx, metadata in enumerate(conversations["metadatas"]):
-            recent_conversations.append({
-                "content": conversations["documents"][idx],
-                "timestamp": metadata.get("timestamp", "Unknown"),
-                "session": metadata.get("session_id", "Unknown")
-            })
-    
+    for fact in page["facts"]:
+        categorized_facts.setdefault(fact.get("category", "uncategorized"), []).append({
+            "content": fact["content"],
+            "timestamp": fact.get("timestamp", "Unknown"),
+            "confidence": fact.get("confidence", "medium")
+        })
+
+    recent_conversations = [
+        {
+            "content": conv["content"],
+            "timestamp": conv.get("timestamp", "Unknown"),
+            "session": conv.get("session_id", "Unknown")
+        }
+        for conv in page["conversations"]
+    ]
+
+    next_url = None
+    if page["next_cursor"]:
+        next_url = str(request.url.include_query_params(cursor=page["next_cursor"]))
+
     return templates.TemplateResponse(
         "memories.html",
         {
             "request": request,
             "facts": categorized_facts,
-            "conversations": recent_conversations[-10:],  # Show last 10 conversations
+            "conversations": recent_conversations,
+            "filters": {"category": category or "", "since": since or "", "until": until or ""},
+            "next_url": next_url,
             "active_page": "memories"
         }
     )
 
+@app.get("/api/memories")
+async def api_memories(
+    category: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(MEMORIES_PAGE_SIZE, ge=1, le=MEMORIES_MAX_PAGE_SIZE)
+) -> Dict[str, Any]:
+    return await load_memories_page(category, since, until, cursor, limit)
+
 @app.post("/save_profile")
 async def save_profile(
     request: Request,
@@ -111,176 +384,325 @@ async def save_profile(
             "preferences": preferences
         }
         
-        storage.save_profile(profile_data)
+        await async_storage.save_profile(profile_data)
         return {"success": True}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+def log_prompt_usage(session: str, prompt: Prompt) -> None:
+    logger.debug(
+        "Prompt tokens for %s: %s (dropped %d, truncated %d snippets)",
+        session, prompt.tokens, prompt.dropped, prompt.truncated
+    )
+
+def stream_reply(prompt: Prompt) -> AsyncIterator[str]:
+    if LLM_API == "chat":
+        return llm_client.stream_chat_tokens(prompt.messages)
+    return llm_client.stream_tokens(prompt.text)
+
+async def observed_reply(prompt: Prompt, endpoint: str) -> AsyncIterator[str]:
+    started = time.perf_counter()
+    first = True
+    async for token in stream_reply(prompt):
+        if first:
+            record_first_token(endpoint)
+            first = False
+        yield token
+    record_stage("llm", time.perf_counter() - started)
+
+async def generate_reply(prompt: Prompt) -> str:
+    return "".join([token async for token in observed_reply(prompt, "chat")])
+
+async def build_prompt(session: str, message: str) -> Tuple[List[str], Prompt]:
+    with timed("retrieval"):
+        try:
+            memory_context = await async_memory.get_context_snippets(message, MEMORY_CONTEXT_LIMIT, timeout=RETRIEVAL_TIMEOUT)
+        except asyncio.TimeoutError:
+            memory_context = []
+    with timed("prompt"):
+        prompt = await async_prompt_builder.build(session, message, memory_context)
+    log_prompt_usage(session, prompt)
+    return memory_context, prompt
+
+async def response_cache_key(session: str, message: str, memory_context: List[str], prompt: Prompt) -> Optional[CacheKey]:
+    # Must run before the user message joins the history, which the key covers.
+    if not response_cache.enabled:
+        return None
+    vector = (await async_memory.embed([message]))[0] if response_cache.semantic else None
+    profile, history = await asyncio.gather(
+        async_storage.get_context_for_prompt(),
+        async_prompt_builder.history_text(session)
+    )
+    return make_key(prompt.text, prompt.messages, profile, memory_context, history, vector)
+
+def busy_response(session: str, response_obj: Optional[Response]) -> JSONResponse:
+    response = JSONResponse(
+        {"error": "Too many requests are waiting for the model; please retry shortly"},
+        status_code=429,
+        headers={"Retry-After": "5"}
+    )
+    if response_obj is not None and "set-cookie" in response_obj.headers:
+        response.set_cookie(key="session", value=session)
+    return response
+
 @app.post("/chat")
 async def chat(
     message: str = Form(...),
     session: Optional[str] = Cookie(None),
     response_obj: Response = None
 ) -> Dict:
+    timings = start_request()
+    outcome = "error"
+    ticket: Optional[Ticket] = None
     try:
         if not session:
             session = str(uuid.uuid4())
             response_obj.set_cookie(key="session", value=session)
-        
-        profile_context = storage.get_context_for_prompt()
-        conv_context = conversation_history.get_context_string(session)
-        memory_context = memory_manager.get_context_for_prompt(message)
-        
-        full_prompt = f"""You are my personal AI assistant. Focus on responding directly to the current message while keeping relevant context in mind. Be concise and natural in your responses.
-
-Recent Context:
-{conv_context}
-
-Relevant Background:
-{memory_context}
 
-Profile Info:
-{profile_context}
+        memory_context, prompt = await build_prompt(session, message)
+        cache_key = await response_cache_key(session, message, memory_context, prompt)
+        cached = response_cache.get("chat", cache_key) if cache_key else None
 
-Current message: {message}
+        # Cache hits skip the queue; they never touch the model.
+        if cached is None:
+            try:
+                ticket = scheduler.enqueue(session)
+            except QueueFull:
+                outcome = "rejected"
+                return busy_response(session, response_obj)
 
-Remember:
-- Respond directly to the current message
-- Only reference previous context if directly relevant
-- Keep responses concise and natural
-- Don't list out everything you know about me
-- If you learn new information, update your understanding without mentioning it"""
+        await async_prompt_builder.add_message(session, "user", message)
 
-        conversation_history.add_message(session, "user", message)
-        
-        llm_response = requests.post(
-            OLLAMA_URL,
-            json={
-                "model": MODEL_NAME,
-                "prompt": full_prompt
-            },
-            stream=True
-        )
+        if ticket is None:
+            full_response = cached
+        else:
+            try:
+                with timed("queue"):
+                    await scheduler.acquire(ticket)
+                full_response = await generate_reply(prompt)
+            except LLMError:
+                full_response = ""
+            finally:
+                scheduler.release(ticket)
+            if cache_key:
+                response_cache.put(cache_key, full_response)
         
-        if llm_response.status_code == 200:
-            full_response = ""
-            for line in llm_response.iter_lines():
-                if line:
-                    try:
-                        resp_obj = json.loads(line.decode('utf-8'))
-                        if resp_obj.get('response'):
-                            full_response += resp_obj['response']
-                    except json.JSONDecodeError:
-                        continue
-            
-            if full_response:
-                conversation_history.add_message(session, "assistant", full_response)
-                memory_manager.add_conversation(session, message, full_response)
-                
-                facts = memory_manager.extract_facts_from_conversation(message, full_response)
-                for fact in facts:
-                    memory_manager.add_fact(fact)
-                
-                return {"response": full_response}
+        if full_response:
+            with timed("save"):
+                await async_prompt_builder.add_message(session, "assistant", full_response)
+                # A cached reply was stored and mined for facts when it was first generated.
+                if ticket is not None:
+                    await post_processor.submit(session, message, full_response)
+            outcome = "cached" if ticket is None else "complete"
+            if REQUEST_TIMING_DETAILS:
+                response_obj.headers["Server-Timing"] = timings.server_timing()
+            return {"response": full_response}
         
         return {"response": "Error: Unable to get response from LLM"}
     except Exception as e:
         return {"response": f"Error: {str(e)}"}
+    finally:
+        # Any failure after enqueueing must still give the slot or queue place back.
+        if ticket is not None:
+            scheduler.release(ticket)
+        finish_request("chat", outcome, timings)
+
+async def queue_position_events(ticket: Ticket, handle: StreamHandle) -> AsyncIterator[Dict]:
+    last_position = None
+    started = time.perf_counter()
+    while not ticket.granted:
+        if handle.cancelled:
+            raise StreamCancelled(handle.stream_id)
+        position = scheduler.position(ticket)
+        if position != last_position:
+            last_position = position
+            yield {
+                "event": "queued",
+                "data": json.dumps({"position": position})
+            }
+        await scheduler.wait(ticket, QUEUE_POSITION_INTERVAL)
+    record_stage("queue", time.perf_counter() - started)
+
+def record_partial_response(session: str, parts: List[str]) -> None:
+    # Partial answers stay visible in the history but never reach long-term memory,
+    # since facts extracted from a cut-off reply can't be trusted. This also runs while the stream
+    # is being cancelled, where nothing can be awaited; history appends are buffered, so it stays inline.
+    if parts:
+        prompt_builder.add_message(session, "assistant", "".join(parts) + PARTIAL_RESPONSE_MARKER)
+
+@app.get("/health/live")
+async def health_live() -> Dict[str, str]:
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def health_ready() -> JSONResponse:
+    pending = sorted(name for name, task in warm_ups.items() if not task.done())
+    body: Dict[str, Any] = {
+        "status": "starting" if pending else "ready",
+        "warming_up": pending,
+        "memory_open": memory_manager.is_open
+    }
+    # A failed LLM warm-up is not fatal (requests retry the model); a memory store that can't open is,
+    # so it keeps being retried and reported here until it opens.
+    if "memory" in warm_up_errors:
+        body["status"] = "failed"
+        body["error"] = warm_up_errors["memory"]
+    return JSONResponse(body, status_code=200 if body["status"] == "ready" else 503)
+
+@app.get("/stats")
+async def stats() -> Dict[str, Any]:
+    return {
+        "scheduler": scheduler.stats(),
+        "streams": {
+            "active": len(stream_registry),
+            "cancelled": stream_registry.cancelled,
+            "disconnected": stream_registry.disconnected
+        },
+        "post_processing": {
+            "pending": post_processor.pending(),
+            "processed": post_processor.processed,
+            "dropped": post_processor.dropped
+        },
+        "history": await blocking_pool.run(conversation_history.stats),
+        "embedding_cache": memory_manager.embedding_cache.stats(),
+        "blocking_io": blocking_pool.stats(),
+        "response_cache": response_cache.stats(),
+        "compaction": compactor.totals
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    state = scheduler.stats()
+    in_flight = Gauge("chat_llm_in_flight", "Generations currently running against the model.")
+    in_flight.set(state["in_flight"])
+    queue_depth = Gauge("chat_queue_depth", "Requests waiting for a generation slot.")
+    queue_depth.set(state["queue_depth"])
+    rejected = Counter("chat_queue_rejected_total", "Requests shed with 429 because the queue was full.")
+    rejected.inc(amount=state["rejected"])
+    cache_lookups = Counter("chat_response_cache_lookups_total", "Response cache lookups by endpoint and result.", ["endpoint", "result"])
+    for endpoint, counts in response_cache.stats()["endpoints"].items():
+        for result in ("hits", "semantic_hits", "misses"):
+            cache_lookups.inc(endpoint, result, amount=counts[result])
+    return PlainTextResponse(
+        render_metrics([in_flight, queue_depth, rejected, cache_lookups]),
+        media_type="text/plain; version=0.0.4"
+    )
+
+@app.post("/cancel")
+async def cancel_stream(stream_id: str, session: Optional[str] = Cookie(None)) -> Dict:
+    if stream_registry.cancel(stream_id, session):
+        return {"status": "cancelled"}
+    return {"status": "not_found"}
 
 @app.get("/stream-chat")
 async def stream_chat(
     message: str,
+    stream_id: Optional[str] = None,
     session: Optional[str] = Cookie(None),
     response_obj: Response = None
 ) -> EventSourceResponse:
+    timings = start_request()
+    ticket: Optional[Ticket] = None
     try:
         if not session:
             session = str(uuid.uuid4())
             response_obj.set_cookie(key="session", value=session)
-        
-        profile_context = storage.get_context_for_prompt()
-        conv_context = conversation_history.get_context_string(session)
-        memory_context = memory_manager.get_context_for_prompt(message)
-        
-        full_prompt = f"""You are my personal AI assistant. Focus on responding directly to the current message while keeping relevant context in mind. Be concise and natural in your responses.
-
-Recent Context:
-{conv_context}
-
-Relevant Background:
-{memory_context}
-
-Profile Info:
-{profile_context}
+        if not stream_id or len(stream_id) > 64:
+            stream_id = uuid.uuid4().hex
 
-Current message: {message}
+        memory_context, prompt = await build_prompt(session, message)
+        cache_key = await response_cache_key(session, message, memory_context, prompt)
+        cached = response_cache.get("stream-chat", cache_key) if cache_key else None
 
-Remember:
-- Respond directly to the current message
-- Only reference previous context if directly relevant
-- Keep responses concise and natural
-- Don't list out everything you know about me
-- If you learn new information, update your understanding without mentioning it"""
+        if cached is None:
+            try:
+                ticket = scheduler.enqueue(session)
+            except QueueFull:
+                finish_request("stream-chat", "rejected", timings)
+                return busy_response(session, response_obj)
 
-        conversation_history.add_message(session, "user", message)
+        await async_prompt_builder.add_message(session, "user", message)
 
         async def event_generator() -> AsyncGenerator[Dict, None]:
-            full_response = ""
+            bind_request(timings)
+            parts: List[str] = []
+            outcome = "error"
+            handle = stream_registry.open(stream_id, session)
             try:
-                llm_response = requests.post(
-                    OLLAMA_URL,
-                    json={
-                        "model": MODEL_NAME,
-                        "prompt": full_prompt
-                    },
-                    stream=True
-                )
-                
-                if llm_response.status_code == 200:
-                    for line in llm_response.iter_lines():
-                        if line:
-                            try:
-                                resp_obj = json.loads(line.decode('utf-8'))
-                                if resp_obj.get('response'):
-                                    chunk = resp_obj['response']
-                                    full_response += chunk
-                                    yield {
-                                        "event": "message",
-                                        "data": json.dumps({
-                                            "content": chunk,
-                                            "type": "token"
-                                        })
-                                    }
-                                    await asyncio.sleep(0.01)  # Small delay for smooth streaming
-                            except json.JSONDecodeError:
-                                continue
-                    
-                    # Save the complete response
-                    if full_response:
-                        conversation_history.add_message(session, "assistant", full_response)
-                        memory_manager.add_conversation(session, message, full_response)
-                        
-                        facts = memory_manager.extract_facts_from_conversation(message, full_response)
-                        for fact in facts:
-                            memory_manager.add_fact(fact)
-                        
-                        yield {
-                            "event": "done",
-                            "data": json.dumps({"status": "complete"})
-                        }
+                yield {
+                    "event": "start",
+                    "data": json.dumps({"stream_id": stream_id})
+                }
+                if cached is not None:
+                    chunks = replay(cached, STREAM_FLUSH_BYTES)
                 else:
+                    async for event in queue_position_events(ticket, handle):
+                        yield event
+                    chunks = coalescer.coalesce(handle.guard(observed_reply(prompt, "stream-chat")))
+                async for chunk in chunks:
+                    parts.append(chunk)
                     yield {
-                        "event": "error",
-                        "data": json.dumps({"error": "Unable to get response from LLM"})
+                        "event": "message",
+                        "data": json.dumps({
+                            "content": chunk,
+                            "type": "token"
+                        })
                     }
+                
+                # Save the complete response
+                full_response = "".join(parts)
+                if full_response:
+                    if cache_key and cached is None:
+                        response_cache.put(cache_key, full_response)
+                    with timed("save"):
+                        await async_prompt_builder.add_message(session, "assistant", full_response)
+                        if cached is None:
+                            await post_processor.submit(session, message, full_response)
+                    outcome = "cached" if cached is not None else "complete"
+                    done = {"status": "complete"}
+                    if REQUEST_TIMING_DETAILS:
+                        done["timings"] = timings.as_dict()
+                    yield {
+                        "event": "done",
+                        "data": json.dumps(done)
+                    }
+            except StreamCancelled:
+                outcome = "cancelled"
+                record_partial_response(session, parts)
+                yield {
+                    "event": "cancelled",
+                    "data": json.dumps({"status": "cancelled", "stream_id": stream_id})
+                }
+            except asyncio.CancelledError:
+                # The client went away; sse_starlette cancels us, which also aborts the upstream read.
+                stream_registry.disconnected += 1
+                outcome = "disconnected"
+                record_partial_response(session, parts)
+                raise
+            except LLMError:
+                yield {
+                    "event": "error",
+                    "data": json.dumps({"error": "Unable to get response from LLM"})
+                }
             except Exception as e:
                 yield {
                     "event": "error",
                     "data": json.dumps({"error": str(e)})
                 }
+            finally:
+                stream_registry.close(stream_id)
+                finish_request("stream-chat", outcome, timings)
+                if ticket is not None:
+                    scheduler.release(ticket)
         
-        return EventSourceResponse(event_generator())
+        if ticket is None:
+            return EventSourceResponse(event_generator())
+        # Also released after the response, in case the generator never got to run.
+        return EventSourceResponse(event_generator(), background=BackgroundTask(scheduler.release, ticket))
     except Exception as e:
+        if ticket is not None:
+            scheduler.release(ticket)
+        finish_request("stream-chat", "error", timings)
         return EventSourceResponse([{
             "event": "error",
             "data": json.dumps({"error": str(e)})
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, List, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from memory_manager import MemoryManager
+from offload import AsyncMemoryManager, BlockingPool
+
+TOPICS = ["cello practice", "night shifts", "running routes", "tea blends", "trips to Lisbon", "sister's visit", "book club", "garden"]
+
+
+def seed(manager: MemoryManager, conversations: int) -> None:
+    timestamp = datetime.now().isoformat()
+    manager.add_conversations([
+        (f"seed-{index % 10}", f"Tell me about {TOPICS[index % len(TOPICS)]} #{index}", f"Here is note {index} on {TOPICS[index % len(TOPICS)]}")
+        for index in range(conversations)
+    ])
+    manager.add_facts([
+        {"content": f"I care about {topic}", "category": "interests", "confidence": "high", "source": "benchmark", "timestamp": timestamp}
+        for topic in TOPICS
+    ])
+    manager.flush()
+
+
+async def measure(lookup: Callable[[str], Awaitable[List[str]]], queries: List[str]) -> Tuple[float, float]:
+    """Wall time for all lookups at once, and the longest the event loop went without running a ticker."""
+    stalls = [0.0]
+    done = asyncio.Event()
+
+    async def ticker() -> None:
+        last = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            stalls[0] = max(stalls[0], now - last)
+            last = now
+
+    watcher = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    await asyncio.gather(*(lookup(query) for query in queries))
+    wall = time.perf_counter() - started
+    done.set()
+    await watcher
+    return wall, stalls[0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Concurrent retrieval run inline on the event loop vs on the blocking-I/O pool")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--conversations", type=int, default=2000)
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="bench-blocking-io-")
+    try:
+        # No embedding cache, so every lookup pays for the model like a new question does.
+        manager = MemoryManager(
+            data_dir=data_dir,
+            embedding_cache_size=0,
+            embedding_cache_disk_capacity=0,
+            retrieval_mode="hybrid",
+            query_threads=2 * args.threads
+        )
+        seed(manager, args.conversations)
+        manager.get_context_snippets("warm up")
+        pool = BlockingPool(max_workers=args.threads)
+        facade = AsyncMemoryManager(manager, pool)
+        queries = [f"What do you remember about {TOPICS[index % len(TOPICS)]} {index}?" for index in range(args.concurrency)]
+
+        async def inline(query: str) -> List[str]:
+            return manager.get_context_snippets(query)
+
+        async def offloaded(query: str) -> List[str]:
+            return await facade.get_context_snippets(query)
+
+        for label, lookup in [("inline (blocks the loop)", inline), (f"thread pool ({args.threads})", offloaded)]:
+            wall, stall = asyncio.run(measure(lookup, queries))
+            print(
+                f"{label:<26} {args.concurrency} lookups in {wall * 1000:8.1f} ms  "
+                f"({wall / args.concurrency * 1000:6.1f} ms each)  longest loop stall {stall * 1000:8.1f} ms"
+            )
+        pool.shutdown()
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fake_ollama import FakeOllama, ServerThread, free_port
+from llm_client import OllamaClient
+
+
+async def timed_stream(client: OllamaClient) -> float:
+    started = time.perf_counter()
+    async for _ in client.stream_tokens("benchmark prompt"):
+        pass
+    return time.perf_counter() - started
+
+
+async def run_streams(url: str, concurrency: int) -> List[float]:
+    client = OllamaClient(base_url=url, model="fake")
+    try:
+        return await asyncio.gather(*(timed_stream(client) for _ in range(concurrency)))
+    finally:
+        await client.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Concurrent streaming load test against a fake Ollama")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    args = parser.parse_args()
+
+    fake = FakeOllama(tokens=args.tokens, token_delay=args.token_delay)
+    with ServerThread(fake.app(), free_port()) as server:
+        single = asyncio.run(run_streams(server.url, 1))[0]
+
+        started = time.perf_counter()
+        durations = asyncio.run(run_streams(server.url, args.concurrency))
+        wall = time.perf_counter() - started
+
+    print(f"single stream:          {single * 1000:8.1f} ms")
+    print(f"{args.concurrency} concurrent streams:  {wall * 1000:8.1f} ms wall")
+    print(f"slowest stream:         {max(durations) * 1000:8.1f} ms")
+    print(f"wall / single:          {wall / single:8.2f}x (serialized would be {args.concurrency}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from fake_ollama import FakeOllama, ServerThread, free_port
+
+ENDPOINTS = ("chat", "stream-chat", "memories", "root")
+MESSAGES = [
+    "What should I cook tonight?",
+    "Remind me what my goals are",
+    "I started learning the cello last month",
+    "Any tips for running in the rain?",
+    "Summarize what you know about my work",
+    "My sister is visiting next weekend",
+    "How do I stay focused in the afternoon?",
+    "What's a good book for a long flight?"
+]
+PROFILE = {
+    "name": "Sam",
+    "birthdate": "1990-04-12",
+    "location": "Lisbon",
+    "occupation": "Nurse",
+    "interests": "Cello, running",
+    "goals": "Run a half marathon",
+    "preferences": "Short answers"
+}
+# Metrics where a bigger number is the better one.
+HIGHER_IS_BETTER = {"throughput_rps", "tokens_per_second"}
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def rss_mb(pid: int) -> Tuple[float, float]:
+    """Current and peak resident set size, from /proc (Linux only)."""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    name, amount, _ = line.split()
+                    values[name[:-1]] = int(amount) / 1024
+    except OSError:
+        return 0.0, 0.0
+    return values.get("VmRSS", 0.0), values.get("VmHWM", 0.0)
+
+
+class AppProcess:
+    """Runs app.py under uvicorn in a child process with its own data directory."""
+
+    def __init__(self, port: int, ollama_url: str, data_dir: str, extra_env: Dict[str, str], ready_path: str = "/health/ready") -> None:
+        self.url = f"http://127.0.0.1:{port}"
+        self.ready_path = ready_path
+        self.command = [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+        self.env = {
+            **os.environ,
+            "DATA_DIR": data_dir,
+            "OLLAMA_URL": ollama_url,
+            "MODEL_NAME": "fake",
+            "COMPACTION_INTERVAL": "0",
+            **extra_env
+        }
+        self.process: Optional[subprocess.Popen] = None
+
+    def start(self) -> None:
+        self.process = subprocess.Popen(self.command, cwd=ROOT, env=self.env)
+
+    def stop(self) -> None:
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+    def __enter__(self) -> "AppProcess":
+        self.start()
+        deadline = time.monotonic() + 120
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"app exited with status {self.process.returncode}")
+            try:
+                if httpx.get(f"{self.url}{self.ready_path}", timeout=1).status_code == 200:
+                    return self
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        self.process.kill()
+        raise RuntimeError("app did not start within 120 s")
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.stop()
+
+
+async def chat_request(client: httpx.AsyncClient, message: str) -> Tuple[float, Optional[float], int]:
+    started = time.perf_counter()
+    response = await client.post("/chat", data={"message": message})
+    return time.perf_counter() - started, None, response.status_code
+
+
+async def stream_request(client: httpx.AsyncClient, message: str) -> Tuple[float, Optional[float], int]:
+    started = time.perf_counter()
+    first_token = None
+    event = None
+    async with client.stream("GET", "/stream-chat", params={"message": message}) as response:
+        if response.status_code != 200:
+            return time.perf_counter() - started, None, response.status_code
+        async for line in response.aiter_lines():
+            if line.startswith("event:"):
+                event = line.split(":", 1)[1].strip()
+            elif line.startswith("data:") and event == "message" and first_token is None:
+                first_token = time.perf_counter() - started
+            elif line.startswith("data:") and event in ("done", "error", "cancelled"):
+                break
+    status = 200 if event == "done" else 599
+    return time.perf_counter() - started, first_token, status
+
+
+async def page_request(client: httpx.AsyncClient, path: str) -> Tuple[float, Optional[float], int]:
+    started = time.perf_counter()
+    response = await client.get(path)
+    return time.perf_counter() - started, None, response.status_code
+
+
+async def drive(url: str, endpoint: str, requests: int, concurrency: int, sessions: int, seed: int) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    clients = [
+        httpx.AsyncClient(base_url=url, timeout=300, cookies={"session": f"bench-{index}"})
+        for index in range(sessions)
+    ]
+    semaphore = asyncio.Semaphore(concurrency)
+    results: List[Tuple[float, Optional[float], int]] = []
+
+    async def one(index: int) -> None:
+        client = clients[index % sessions]
+        message = rng.choice(MESSAGES)
+        async with semaphore:
+            if endpoint == "chat":
+                results.append(await chat_request(client, message))
+            elif endpoint == "stream-chat":
+                results.append(await stream_request(client, message))
+            elif endpoint == "memories":
+                results.append(await page_request(client, "/memories"))
+            else:
+                results.append(await page_request(client, "/"))
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(one(index) for index in range(requests)))
+    finally:
+        for client in clients:
+            await client.aclose()
+    wall = time.perf_counter() - started
+
+    latencies = [latency * 1000 for latency, _, status in results if status == 200]
+    ttfts = [ttft * 1000 for _, ttft, status in results if status == 200 and ttft is not None]
+    summary: Dict[str, Any] = {
+        "requests": len(results),
+        "errors": sum(1 for _, _, status in results if status != 200),
+        "throughput_rps": round(len(latencies) / wall, 2)
+    }
+    if latencies:
+        summary.update({
+            "p50_ms": round(percentile(latencies, 0.50), 1),
+            "p95_ms": round(percentile(latencies, 0.95), 1),
+            "p99_ms": round(percentile(latencies, 0.99), 1),
+            "mean_ms": round(statistics.mean(latencies), 1)
+        })
+    if ttfts:
+        summary.update({
+            "ttft_p50_ms": round(percentile(ttfts, 0.50), 1),
+            "ttft_p95_ms": round(percentile(ttfts, 0.95), 1)
+        })
+    return summary
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions = []
+    for section, metrics in results.items():
+        previous = baseline.get(section, {})
+        for name, value in metrics.items():
+            old = previous.get(name)
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or name in ("requests", "errors"):
+                continue
+            if old == 0:
+                continue
+            change = (value - old) / old
+            worse = -change if name in HIGHER_IS_BETTER else change
+            flag = "REGRESSION" if worse > tolerance else ""
+            print(f"{section:<12} {name:<14} {old:10.1f} -> {value:10.1f}  {change * 100:+7.1f}%  {flag}")
+            if flag:
+                regressions.append(f"{section}.{name}")
+        if metrics.get("errors", 0) > previous.get("errors", 0):
+            print(f"{section:<12} errors         {previous.get('errors', 0):10d} -> {metrics['errors']:10d}  REGRESSION")
+            regressions.append(f"{section}.errors")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="End-to-end latency, TTFT, throughput and RSS of the app against a fake Ollama")
+    parser.add_argument("--requests", type=int, default=40, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS))
+    parser.add_argument("--tokens", type=int, default=50, help="tokens per fake reply")
+    parser.add_argument("--token-rate", type=float, default=100.0, help="fake tokens per second")
+    parser.add_argument("--first-token-delay", type=float, default=0.05)
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE", help="extra app setting, repeatable")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the results as JSON, e.g. to use as a baseline later")
+    parser.add_argument("--baseline", help="compare against a previous --output file; exits 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative slowdown before flagging")
+    args = parser.parse_args()
+
+    endpoints = [endpoint for endpoint in args.endpoints.split(",") if endpoint]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+    extra_env = dict(item.split("=", 1) for item in args.env)
+
+    fake = FakeOllama(tokens=args.tokens, token_delay=1 / args.token_rate, first_token_delay=args.first_token_delay)
+    data_dir = tempfile.mkdtemp(prefix="bench-e2e-")
+    results: Dict[str, Any] = {}
+    try:
+        with ServerThread(fake.app(), free_port()) as ollama, AppProcess(free_port(), ollama.url, data_dir, extra_env) as app:
+            httpx.post(f"{app.url}/save_profile", data=PROFILE, timeout=30)
+            results["startup"] = dict(zip(("rss_mb", "peak_rss_mb"), (round(value, 1) for value in rss_mb(app.process.pid))))
+            for endpoint in endpoints:
+                summary = asyncio.run(drive(app.url, endpoint, args.requests, args.concurrency, args.sessions, args.seed))
+                current, peak = rss_mb(app.process.pid)
+                summary["rss_mb"] = round(current, 1)
+                summary["peak_rss_mb"] = round(peak, 1)
+                results[endpoint] = summary
+                latency = f"p50 {summary.get('p50_ms', 0):8.1f}  p95 {summary.get('p95_ms', 0):8.1f}  p99 {summary.get('p99_ms', 0):8.1f} ms"
+                ttft = f"  ttft p50 {summary['ttft_p50_ms']:7.1f} ms" if "ttft_p50_ms" in summary else ""
+                print(
+                    f"{endpoint:<12} {latency}{ttft}  {summary['throughput_rps']:7.2f} req/s  "
+                    f"rss {summary['rss_mb']:7.1f} MB  errors {summary['errors']}"
+                )
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(results, handle, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+        print()
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nNo regressions beyond tolerance.")
+
+
+if __name__ == "__main__":
+    main()
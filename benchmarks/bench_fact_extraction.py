@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fact_extractor import CONFIRMATION_PATTERNS, FACT_PATTERNS, extract_facts
+
+SENTENCES = [
+    "I like hiking in the mountains",
+    "The build failed again on the staging server",
+    "I'm trying to learn Rust this year",
+    "Normally I work from home on Fridays",
+    "Here is the stack trace from the last deploy",
+    "My name is Alex and I live in Lisbon",
+    "ERROR 2024-05-01 connection reset by peer",
+    "I've been playing guitar for ten years",
+    "Every week I usually cook for my family",
+    "I don't like crowded trains but I can cope",
+    "My goal is to run a marathon, I plan to train daily",
+    "In my experience the second attempt goes better",
+    "I'm good at chess and I prefer fast games",
+    "I remember when I used to live by the sea"
+]
+
+
+def legacy_extract(user_message: str, assistant_response: str) -> List[Dict[str, str]]:
+    facts = []
+    lower_msg = user_message.lower()
+    for category, patterns in FACT_PATTERNS.items():
+        for pattern in patterns:
+            if pattern in lower_msg:
+                for sentence in user_message.split('.'):
+                    if pattern.lower() in sentence.lower():
+                        facts.append({
+                            "content": sentence.strip(),
+                            "category": category,
+                            "confidence": "high" if pattern in ["i am", "i'm", "my name is"] else "medium",
+                            "timestamp": datetime.now().isoformat()
+                        })
+    lower_resp = assistant_response.lower()
+    for pattern in CONFIRMATION_PATTERNS["confirmation"]:
+        if pattern in lower_resp:
+            for sentence in assistant_response.split('.'):
+                if pattern in sentence.lower():
+                    facts.append({"content": sentence.strip(), "category": "confirmation"})
+    return facts
+
+
+def make_message(size: int) -> str:
+    parts = []
+    length = 0
+    index = 0
+    while length < size:
+        sentence = SENTENCES[index % len(SENTENCES)] + f" (line {index}). "
+        parts.append(sentence)
+        length += len(sentence)
+        index += 1
+    return "".join(parts)
+
+
+def measure(extract: Callable[[str, str], List[Dict[str, str]]], message: str, rounds: int) -> tuple:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        facts = extract(message, "As you told me, you like hiking.")
+    return (time.perf_counter() - started) / rounds * 1000, len(facts)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fact extraction cost on long pasted messages")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 50_000, 200_000])
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        message = make_message(size)
+        legacy_ms, legacy_count = measure(legacy_extract, message, args.rounds)
+        current_ms, current_count = measure(extract_facts, message, args.rounds)
+        print(
+            f"{size / 1000:6.0f} KB  legacy {legacy_ms:9.2f} ms ({legacy_count} facts)  "
+            f"compiled {current_ms:8.2f} ms ({current_count} facts)  {legacy_ms / current_ms:6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
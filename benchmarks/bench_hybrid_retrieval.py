@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from memory_manager import MemoryManager
+
+TEMPLATES = [
+    "My order number is SKU-{code}",
+    "My friend {name} in {city} has member id {code}",
+    "I am working on project {name}-{code}",
+    "I usually meet {name} for coffee in {city} at table {code}"
+]
+NAMES = ["Anneliese", "Bartholomew", "Chidi", "Dagny", "Esperanza", "Fitzgerald", "Guadalupe", "Hamid"]
+CITIES = ["Lisbon", "Tromsø", "Valparaíso", "Kraków", "Hobart", "Oaxaca", "Tbilisi", "Dunedin"]
+
+
+def make_corpus(size: int, rng: random.Random) -> List[Tuple[str, str]]:
+    corpus = []
+    for index in range(size):
+        template = TEMPLATES[index % len(TEMPLATES)]
+        content = template.format(code=10000 + index, name=rng.choice(NAMES), city=rng.choice(CITIES))
+        corpus.append((content, str(10000 + index)))
+    return corpus
+
+
+def make_facts(corpus: List[Tuple[str, str]]) -> List[Dict[str, str]]:
+    timestamp = datetime.now().isoformat()
+    return [
+        {
+            "content": content,
+            "category": "personal_info",
+            "source": "user_message",
+            "confidence": "medium",
+            "timestamp": timestamp
+        }
+        for content, _ in corpus
+    ]
+
+
+def run_mode(manager: MemoryManager, mode: str, queries: List[Tuple[str, str]], k: int) -> Tuple[List[float], float]:
+    timings = []
+    found = 0
+    for query, expected in queries:
+        started = time.perf_counter()
+        memories = manager.get_relevant_memories(query, limit=1, fact_limit=k, mode=mode)
+        timings.append((time.perf_counter() - started) * 1000)
+        if expected in memories["facts"]:
+            found += 1
+    return timings, found / len(queries)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Latency and exact-term recall@k for vector, lexical and hybrid retrieval")
+    parser.add_argument("--size", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    corpus = make_corpus(args.size, rng)
+    queries = [(f"what was the thing with code {code}?", content) for content, code in rng.sample(corpus, args.queries)]
+
+    data_dir = tempfile.mkdtemp()
+    try:
+        # The embedding cache would turn repeated queries into lookups, hiding the cost being compared.
+        manager = MemoryManager(data_dir=data_dir, embedding_cache_size=0, embedding_cache_disk_capacity=0)
+        facts = make_facts(corpus)
+        for start in range(0, len(facts), args.batch_size):
+            manager.add_facts(facts[start:start + args.batch_size])
+        manager.flush()
+
+        started = time.perf_counter()
+        manager.lexical_indexes()
+        print(f"index build: {(time.perf_counter() - started) * 1000:.1f} ms for {args.size} facts")
+
+        for mode in MemoryManager.RETRIEVAL_MODES:
+            timings, recall = run_mode(manager, mode, queries, args.k)
+            timings.sort()
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            print(
+                f"{mode:<8} p50 {statistics.median(timings):7.2f} ms  p95 {p95:7.2f} ms  "
+                f"recall@{args.k} {recall:6.1%}"
+            )
+    finally:
+        shutil.rmtree(data_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from memory_manager import MemoryManager
+
+
+def make_facts(count: int) -> List[Dict[str, str]]:
+    return [
+        {
+            "content": f"I like hobby number {index} on weekends",
+            "category": "preference",
+            "source": "user_message",
+            "confidence": "medium",
+            "timestamp": datetime.now().isoformat()
+        }
+        for index in range(count)
+    ]
+
+
+def ingest_one_by_one(manager: MemoryManager, facts: List[Dict[str, str]]) -> None:
+    for fact in facts:
+        manager.add_fact(fact)
+
+
+def ingest_batched(manager: MemoryManager, facts: List[Dict[str, str]], batch_size: int) -> None:
+    for start in range(0, len(facts), batch_size):
+        manager.add_facts(facts[start:start + batch_size])
+    manager.flush()
+
+
+def timed(label: str, facts: List[Dict[str, str]], **kwargs: int) -> float:
+    data_dir = tempfile.mkdtemp()
+    try:
+        manager = MemoryManager(data_dir=data_dir)
+        manager.add_fact(make_facts(1)[0])  # load the embedding model outside the timing
+        started = time.perf_counter()
+        if "batch_size" in kwargs:
+            ingest_batched(manager, facts, kwargs["batch_size"])
+        else:
+            ingest_one_by_one(manager, facts)
+        elapsed = time.perf_counter() - started
+    finally:
+        shutil.rmtree(data_dir)
+    print(f"{label:<24} {elapsed:8.2f} s  {len(facts) / elapsed:8.1f} facts/s")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fact ingest throughput against a local PersistentClient")
+    parser.add_argument("--facts", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+
+    facts = make_facts(args.facts)
+    single = timed("add_fact per fact", facts)
+    batched = timed(f"add_facts x{args.batch_size}", facts, batch_size=args.batch_size)
+    print(f"speedup: {single / batched:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
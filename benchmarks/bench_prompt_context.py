@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from memory_manager import MemoryManager
+
+QUERIES = [
+    "what do I do for work?",
+    "where do I live?",
+    "what are my hobbies?",
+    "tell me about my family",
+    "what am I learning?"
+]
+
+
+def make_facts(start: int, count: int) -> List[Dict[str, str]]:
+    return [
+        {
+            "content": f"I am interested in subject {index} and practice it weekly",
+            "category": "personal_info",
+            "source": "user_message",
+            "confidence": "high" if index % 4 == 0 else "medium",
+            "timestamp": datetime.now().isoformat()
+        }
+        for index in range(start, start + count)
+    ]
+
+
+def legacy_context(manager: MemoryManager, message: str) -> str:
+    memories = manager.get_relevant_memories(message, limit=3)
+    relevant_facts = []
+    for fact in memories["facts"]:
+        metadata = manager.facts.get(where={"document": fact})
+        if metadata and metadata["metadatas"]:
+            if metadata["metadatas"][0].get("confidence", "medium") == "high":
+                relevant_facts.append(fact)
+    return "\n".join(relevant_facts + memories["conversations"][:1])
+
+
+def measure(build: Callable[[str], str], rounds: int) -> List[float]:
+    timings = []
+    for round_index in range(rounds):
+        message = QUERIES[round_index % len(QUERIES)]
+        started = time.perf_counter()
+        build(message)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def report(label: str, size: int, timings: List[float]) -> None:
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{size:>8} facts  {label:<8} p50 {statistics.median(timings):7.2f} ms  p95 {p95:7.2f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Prompt-build latency as the facts collection grows")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp()
+    try:
+        manager = MemoryManager(data_dir=data_dir)
+        manager.add_conversation("bench", "I work as a nurse", "That sounds demanding")
+        stored = 0
+        for size in sorted(args.sizes):
+            while stored < size:
+                count = min(args.batch_size, size - stored)
+                manager.add_facts(make_facts(stored, count))
+                stored += count
+            manager.flush()
+
+            report("legacy", size, measure(lambda message: legacy_context(manager, message), args.rounds))
+            report("current", size, measure(manager.get_context_for_prompt, args.rounds))
+    finally:
+        shutil.rmtree(data_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sys
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from conversation import ConversationHistory
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        resident_pages = int(f.read().split()[1])
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+
+
+class UnboundedHistory:
+    def __init__(self) -> None:
+        self.conversations = {}
+
+    def add_message(self, session_id: str, role: str, content: str) -> None:
+        self.conversations.setdefault(session_id, []).append({"role": role, "content": content})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="RSS while simulating one new session per visitor")
+    parser.add_argument("--sessions", type=int, default=1_000_000)
+    parser.add_argument("--max-sessions", type=int, default=10_000)
+    parser.add_argument("--report-every", type=int, default=100_000)
+    parser.add_argument("--unbounded", action="store_true", help="use a plain dict like the old history for comparison")
+    args = parser.parse_args()
+
+    history = UnboundedHistory() if args.unbounded else ConversationHistory(max_sessions=args.max_sessions)
+    print(f"{'sessions':>10} {'rss MB':>8}")
+    print(f"{0:>10} {rss_mb():8.1f}")
+    for index in range(1, args.sessions + 1):
+        session_id = str(uuid.uuid4())
+        history.add_message(session_id, "user", "hi")
+        history.add_message(session_id, "assistant", "Hello! How can I help you today?")
+        if index % args.report_every == 0:
+            print(f"{index:>10} {rss_mb():8.1f}")
+
+    if not args.unbounded:
+        print(history.stats())
+
+
+if __name__ == "__main__":
+    main()
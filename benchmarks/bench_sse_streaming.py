@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import AsyncIterator, Dict, Tuple
+
+import httpx
+from sse_starlette.sse import EventSourceResponse
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.routing import Route
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fake_ollama import FakeOllama, ServerThread, free_port
+from llm_client import OllamaClient
+from streaming import TokenCoalescer
+
+
+def make_app(ollama_url: str, flush_interval: float, flush_bytes: int) -> Starlette:
+    client = OllamaClient(base_url=ollama_url, model="fake")
+    coalescer = TokenCoalescer(max_delay=flush_interval, max_bytes=flush_bytes)
+
+    async def legacy(tokens: AsyncIterator[str]) -> AsyncIterator[str]:
+        async for token in tokens:
+            yield token
+            await asyncio.sleep(0.01)
+
+    async def stream(request: Request) -> EventSourceResponse:
+        mode = request.query_params["mode"]
+        tokens = client.stream_tokens("benchmark prompt")
+        frames = legacy(tokens) if mode == "legacy" else coalescer.coalesce(tokens)
+
+        async def events() -> AsyncIterator[Dict[str, str]]:
+            async for frame in frames:
+                yield {"event": "message", "data": json.dumps({"content": frame, "type": "token"})}
+            yield {"event": "done", "data": json.dumps({"status": "complete"})}
+
+        return EventSourceResponse(events())
+
+    return Starlette(routes=[Route("/stream", stream)])
+
+
+async def consume(url: str, mode: str) -> Tuple[float, int, int]:
+    frames = 0
+    characters = 0
+    started = time.perf_counter()
+    async with httpx.AsyncClient(timeout=60) as client:
+        async with client.stream("GET", f"{url}/stream", params={"mode": mode}) as response:
+            event = None
+            async for line in response.aiter_lines():
+                if line.startswith("event:"):
+                    event = line.split(":", 1)[1].strip()
+                elif line.startswith("data:") and event == "message":
+                    frames += 1
+                    characters += len(json.loads(line[5:])["content"])
+                elif line.startswith("data:") and event == "done":
+                    break
+    return time.perf_counter() - started, frames, characters
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tokens/sec and SSE frames per response for each streaming mode")
+    parser.add_argument("--tokens", type=int, default=500)
+    parser.add_argument("--token-delay", type=float, default=0.002)
+    parser.add_argument("--flush-interval", type=float, default=0.05)
+    parser.add_argument("--flush-bytes", type=int, default=256)
+    args = parser.parse_args()
+
+    fake = FakeOllama(tokens=args.tokens, token_delay=args.token_delay)
+    with ServerThread(fake.app(), free_port()) as ollama:
+        for label, mode, interval in [
+            ("legacy (sleep 10 ms/token)", "legacy", 0.0),
+            ("per-token frames", "coalesce", 0.0),
+            (f"coalesced ({args.flush_interval * 1000:.0f} ms / {args.flush_bytes} B)", "coalesce", args.flush_interval)
+        ]:
+            app = make_app(ollama.url, interval, args.flush_bytes)
+            with ServerThread(app, free_port()) as server:
+                elapsed, frames, characters = asyncio.run(consume(server.url, mode))
+            print(
+                f"{label:<32} {elapsed * 1000:8.1f} ms  {args.tokens / elapsed:8.1f} tokens/s  "
+                f"{frames:5d} frames  {characters} chars"
+            )
+
+
+if __name__ == "__main__":
+    main()
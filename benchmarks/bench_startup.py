@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+import httpx
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from bench_e2e import AppProcess
+from fake_ollama import FakeOllama, ServerThread, free_port
+
+IMPORT_PROBE = "import time; started = time.perf_counter(); import app; print(time.perf_counter() - started)"
+
+
+def import_seconds(data_dir: str) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE],
+        cwd=ROOT,
+        env={**os.environ, "DATA_DIR": data_dir},
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def wait_for(url: str, deadline: float) -> float:
+    while time.perf_counter() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return time.perf_counter()
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.01)
+    raise RuntimeError(f"{url} did not answer in time")
+
+
+def startup_run(ollama_url: str, memory_warm_up: bool) -> Tuple[float, float, float]:
+    """Seconds from spawn to liveness and readiness, and the first /chat's own latency."""
+    data_dir = tempfile.mkdtemp(prefix="bench-startup-")
+    env = {"MEMORY_WARM_UP": "1" if memory_warm_up else "0", "LLM_WARM_UP": "0"}
+    app = AppProcess(free_port(), ollama_url, data_dir, env)
+    started = time.perf_counter()
+    app.start()
+    try:
+        deadline = started + 120
+        live = wait_for(f"{app.url}/health/live", deadline) - started
+        ready = wait_for(f"{app.url}/health/ready", deadline) - started
+        request_started = time.perf_counter()
+        httpx.post(f"{app.url}/chat", data={"message": "Hello there"}, timeout=120).raise_for_status()
+        first_chat = time.perf_counter() - request_started
+    finally:
+        app.stop()
+        shutil.rmtree(data_dir, ignore_errors=True)
+    return live, ready, first_chat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import time of app.py and time to the first served request")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="bench-import-")
+    try:
+        imports = [import_seconds(data_dir) for _ in range(args.runs)]
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    print(f"import app                 median {statistics.median(imports) * 1000:8.1f} ms")
+
+    fake = FakeOllama(tokens=5, token_delay=0.001)
+    with ServerThread(fake.app(), free_port()) as ollama:
+        for label, memory_warm_up in [("lazy, no warm-up", False), ("lazy + background warm-up", True)]:
+            runs: Dict[str, List[float]] = {"live": [], "ready": [], "first_chat": []}
+            for _ in range(args.runs):
+                live, ready, first_chat = startup_run(ollama.url, memory_warm_up)
+                runs["live"].append(live)
+                runs["ready"].append(ready)
+                runs["first_chat"].append(first_chat)
+            print(
+                f"{label:<26} live {statistics.median(runs['live']) * 1000:8.1f} ms  "
+                f"ready {statistics.median(runs['ready']) * 1000:8.1f} ms  "
+                f"first /chat {statistics.median(runs['first_chat']) * 1000:8.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import AsyncIterator, List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from conversation import ConversationHistory
+from fake_ollama import FakeOllama, ServerThread, free_port
+from llm_client import OllamaClient
+from prompt_builder import Prompt, PromptBuilder
+from storage import Storage
+
+FACTS = [
+    "I work as a nurse on night shifts",
+    "I live in Lisbon with my partner",
+    "I am learning to play the cello",
+    "My sister Dagny visits every summer",
+    "I prefer tea over coffee",
+    "I usually run on Sunday mornings"
+]
+
+
+def stream(client: OllamaClient, layout: str, prompt: Prompt) -> AsyncIterator[str]:
+    if layout == "chat":
+        return client.stream_chat_tokens(prompt.messages)
+    return client.stream_tokens(prompt.text)
+
+
+async def run_conversation(url: str, layout: str, turns: int, warm_up: bool, keep_alive: str, think_time: float) -> List[float]:
+    rng = random.Random(3)
+    data_dir = tempfile.mkdtemp()
+    storage = Storage(data_dir=data_dir)
+    storage.save_profile({"name": "Sam", "location": "Lisbon", "occupation": "Nurse", "interests": "Cello, running"})
+    builder = PromptBuilder(ConversationHistory(), storage)
+    client = OllamaClient(base_url=url, model="fake", keep_alive=keep_alive or None)
+    ttfts = []
+    try:
+        if warm_up:
+            await client.warm_up(builder.system_message() if layout == "chat" else None)
+        for turn in range(turns):
+            message = f"Question {turn}: what should I do this weekend?"
+            prompt = builder.build("bench", message, rng.sample(FACTS, 2))
+            started = time.perf_counter()
+            first = None
+            reply = []
+            async for token in stream(client, layout, prompt):
+                if first is None:
+                    first = time.perf_counter() - started
+                reply.append(token)
+            ttfts.append(first * 1000)
+            builder.add_message("bench", "user", message)
+            builder.add_message("bench", "assistant", "".join(reply))
+            await asyncio.sleep(think_time)
+    finally:
+        await client.aclose()
+    return ttfts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time to first token per turn for the generate and chat layouts")
+    parser.add_argument("--turns", type=int, default=8)
+    parser.add_argument("--prompt-eval-delay", type=float, default=0.0005, help="seconds per uncached prompt character")
+    parser.add_argument("--load-delay", type=float, default=1.0)
+    parser.add_argument("--default-keep-alive", type=float, default=0.5, help="server-side unload timeout")
+    parser.add_argument("--think-time", type=float, default=0.6, help="pause between turns")
+    args = parser.parse_args()
+
+    scenarios = [
+        ("generate", False, ""),
+        ("generate", True, "30m"),
+        ("chat", False, ""),
+        ("chat", True, "30m")
+    ]
+    for layout, warm_up, keep_alive in scenarios:
+        fake = FakeOllama(
+            tokens=5,
+            token_delay=0.001,
+            prompt_eval_delay=args.prompt_eval_delay,
+            load_delay=args.load_delay,
+            default_keep_alive=args.default_keep_alive
+        )
+        with ServerThread(fake.app(), free_port()) as server:
+            ttfts = asyncio.run(run_conversation(server.url, layout, args.turns, warm_up, keep_alive, args.think_time))
+        label = f"{layout}{' + warm-up + keep_alive' if warm_up else ''}"
+        follow_ups = ttfts[1:]
+        print(
+            f"{label:<32} first turn {ttfts[0]:8.1f} ms  "
+            f"follow-ups p50 {statistics.median(follow_ups):8.1f} ms  max {max(follow_ups):8.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
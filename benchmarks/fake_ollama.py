@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import json
+import socket
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List, Union
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+
+def parse_keep_alive(value: Union[str, int, float, None], default: float) -> float:
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        return float("inf") if value < 0 else float(value)
+    units = {"s": 1, "m": 60, "h": 3600}
+    if value[-1] in units:
+        return float(value[:-1]) * units[value[-1]]
+    seconds = float(value)
+    return float("inf") if seconds < 0 else seconds
+
+
+def common_prefix_length(first: str, second: str) -> int:
+    length = min(len(first), len(second))
+    for index in range(length):
+        if first[index] != second[index]:
+            return index
+    return length
+
+
+class FakeOllama:
+    """Streams canned tokens, charging for model loads and for prompt text outside the cached prefix."""
+
+    def __init__(
+        self,
+        tokens: int = 50,
+        token_delay: float = 0.02,
+        first_token_delay: float = 0.0,
+        prompt_eval_delay: float = 0.0,
+        load_delay: float = 0.0,
+        default_keep_alive: float = 300.0
+    ) -> None:
+        self.tokens = tokens
+        self.token_delay = token_delay
+        self.first_token_delay = first_token_delay
+        # Seconds per prompt character that is not a prefix of the previous prompt.
+        self.prompt_eval_delay = prompt_eval_delay
+        self.load_delay = load_delay
+        self.default_keep_alive = default_keep_alive
+        self.requests_served = 0
+        self.tokens_streamed = 0
+        self.loaded_until = 0.0
+        self.cached_prompt = ""
+
+    async def _prepare(self, body: Dict[str, Any], prompt: str) -> int:
+        now = time.monotonic()
+        if now >= self.loaded_until:
+            self.cached_prompt = ""
+            await asyncio.sleep(self.load_delay)
+        reused = common_prefix_length(self.cached_prompt, prompt)
+        self.cached_prompt = prompt
+        evaluated = len(prompt) - reused
+        await asyncio.sleep(self.first_token_delay + evaluated * self.prompt_eval_delay)
+        self.loaded_until = time.monotonic() + parse_keep_alive(body.get("keep_alive"), self.default_keep_alive)
+        return evaluated
+
+    async def _lines(self, chat: bool, evaluated: int) -> AsyncIterator[bytes]:
+        started = time.perf_counter()
+        for index in range(self.tokens):
+            await asyncio.sleep(self.token_delay)
+            self.tokens_streamed += 1
+            yield self._line(self._chunk(chat, f"tok{index} ", False))
+        elapsed_ns = int((time.perf_counter() - started) * 1e9)
+        yield self._line({
+            **self._chunk(chat, "", True),
+            "prompt_eval_count": evaluated // 4,
+            "eval_count": self.tokens,
+            "eval_duration": elapsed_ns,
+            "total_duration": elapsed_ns
+        })
+
+    def _chunk(self, chat: bool, text: str, done: bool) -> Dict[str, Any]:
+        if chat:
+            return {"message": {"role": "assistant", "content": text}, "done": done}
+        return {"response": text, "done": done}
+
+    def _line(self, obj: Dict) -> bytes:
+        return json.dumps(obj).encode("utf-8") + b"\n"
+
+    async def _respond(self, body: Dict[str, Any], prompt: str, chat: bool) -> Response:
+        self.requests_served += 1
+        evaluated = await self._prepare(body, prompt)
+        if not prompt or body.get("stream") is False:
+            return JSONResponse({**self._chunk(chat, "" if not prompt else "tok0", True), "prompt_eval_count": evaluated // 4})
+        return StreamingResponse(self._lines(chat, evaluated), media_type="application/x-ndjson")
+
+    async def generate(self, request: Request) -> Response:
+        body = await request.json()
+        return await self._respond(body, body.get("prompt", ""), chat=False)
+
+    async def chat(self, request: Request) -> Response:
+        body = await request.json()
+        messages: List[Dict[str, str]] = body.get("messages", [])
+        prompt = "".join(f"<|{message['role']}|>{message['content']}" for message in messages)
+        return await self._respond(body, prompt, chat=True)
+
+    def app(self) -> Starlette:
+        return Starlette(routes=[
+            Route("/api/generate", self.generate, methods=["POST"]),
+            Route("/api/chat", self.chat, methods=["POST"])
+        ])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ServerThread:
+    def __init__(self, app: Starlette, port: int) -> None:
+        config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+        self.url = f"http://127.0.0.1:{port}"
+
+    def __enter__(self) -> "ServerThread":
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.server.should_exit = True
+        self.thread.join()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local stand-in for the Ollama HTTP API")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--first-token-delay", type=float, default=0.0)
+    parser.add_argument("--prompt-eval-delay", type=float, default=0.0)
+    parser.add_argument("--load-delay", type=float, default=0.0)
+    parser.add_argument("--default-keep-alive", type=float, default=300.0)
+    args = parser.parse_args()
+
+    fake = FakeOllama(
+        args.tokens, args.token_delay, args.first_token_delay,
+        args.prompt_eval_delay, args.load_delay, args.default_keep_alive
+    )
+    uvicorn.run(fake.app(), host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
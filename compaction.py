@@ -0,0 +1,204 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fact_extractor import CONFIDENCE_RANK
+
+logger = logging.getLogger(__name__)
+
+DAY = 24 * 3600
+SUMMARY_HEADER = "Earlier in this session:"
+
+Summarizer = Callable[[Optional[str], List[str]], str]
+
+
+def excerpt_summary(previous: Optional[str], exchanges: List[str], max_chars: int = 2000, line_chars: int = 160) -> str:
+    lines = previous.split("\n")[1:] if previous else []
+    for exchange in exchanges:
+        first_line = exchange.split("\n", 1)[0]
+        if len(first_line) > line_chars:
+            first_line = first_line[:line_chars - 3] + "..."
+        lines.append(f"- {first_line}")
+
+    # Keep the newest points that fit, so a long-lived session's summary stays bounded.
+    kept: List[str] = []
+    size = len(SUMMARY_HEADER)
+    for line in reversed(lines):
+        size += len(line) + 1
+        if size > max_chars:
+            break
+        kept.append(line)
+    return "\n".join([SUMMARY_HEADER, *reversed(kept)])
+
+
+class RetentionPolicy:
+    def __init__(
+        self,
+        conversation_max_age: Optional[float] = 30 * DAY,
+        summarize: bool = True,
+        fact_max_age: Optional[float] = 30 * DAY,
+        fact_max_confidence: str = "medium",
+        batch_size: int = 200
+    ) -> None:
+        self.conversation_max_age = conversation_max_age
+        self.summarize = summarize
+        self.fact_max_age = fact_max_age
+        self.fact_max_confidence = fact_max_confidence
+        self.batch_size = batch_size
+
+    def droppable_confidences(self) -> List[str]:
+        limit = CONFIDENCE_RANK[self.fact_max_confidence]
+        return [confidence for confidence, rank in CONFIDENCE_RANK.items() if rank <= limit]
+
+
+def estimated_bytes(document: str, metadata: Dict[str, Any], embedding: Any) -> int:
+    return len(document.encode()) + len(json.dumps(metadata).encode()) + 4 * len(embedding)
+
+
+class Compactor:
+    def __init__(
+        self,
+        memory_manager: Any,
+        policy: Optional[RetentionPolicy] = None,
+        summarizer: Summarizer = excerpt_summary,
+        clock: Callable[[], float] = time.time
+    ) -> None:
+        self.memory_manager = memory_manager
+        self.policy = policy or RetentionPolicy()
+        self.summarizer = summarizer
+        self.clock = clock
+        self.totals = {
+            "runs": 0,
+            "conversations_deleted": 0,
+            "facts_deleted": 0,
+            "summaries_written": 0,
+            "vectors_reclaimed": 0,
+            "bytes_reclaimed": 0
+        }
+        self._task: Optional[asyncio.Task] = None
+        self._backfilled = False
+
+    def run_once(self) -> Dict[str, int]:
+        """Compacts at most one batch of conversations and one batch of facts."""
+        started = time.perf_counter()
+        self.memory_manager.flush()
+        self.memory_manager.flush_retrievals()
+        now = self.clock()
+
+        result = {
+            "conversations_deleted": 0,
+            "facts_deleted": 0,
+            "summaries_written": 0,
+            "vectors_reclaimed": 0,
+            "bytes_reclaimed": 0
+        }
+        if not self._backfilled:
+            self.memory_manager.backfill_legacy_metadata(self.policy.batch_size)
+            self._backfilled = True
+        if self.policy.conversation_max_age is not None:
+            self._age_out_conversations(now - self.policy.conversation_max_age, result)
+        if self.policy.fact_max_age is not None:
+            self._drop_unused_facts(now - self.policy.fact_max_age, result)
+
+        result["vectors_reclaimed"] += result["conversations_deleted"] + result["facts_deleted"]
+        self.totals["runs"] += 1
+        for key, value in result.items():
+            self.totals[key] += value
+        result["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return result
+
+    def _age_out_conversations(self, cutoff: float, result: Dict[str, int]) -> None:
+        collection = self.memory_manager.conversations
+        # Summaries carry their own type, so they are never aged out themselves.
+        expired = collection.get(
+            where={"$and": [{"type": "conversation"}, {"ts": {"$lt": cutoff}}]},
+            limit=self.policy.batch_size,
+            include=["documents", "metadatas", "embeddings"]
+        )
+        if not expired["ids"]:
+            return
+
+        by_session: Dict[str, List[Tuple[float, str]]] = {}
+        for document, metadata, embedding in zip(expired["documents"], expired["metadatas"], expired["embeddings"]):
+            result["bytes_reclaimed"] += estimated_bytes(document, metadata, embedding)
+            by_session.setdefault(metadata.get("session_id", "unknown"), []).append((metadata["ts"], document))
+
+        if self.policy.summarize:
+            self._write_summaries(by_session, result)
+        self.memory_manager.delete("conversations", expired["ids"])
+        result["conversations_deleted"] = len(expired["ids"])
+
+    def _write_summaries(self, by_session: Dict[str, List[Tuple[float, str]]], result: Dict[str, int]) -> None:
+        collection = self.memory_manager.conversations
+        ids = [f"summary_{session_id}" for session_id in by_session]
+        existing = collection.get(ids=ids, include=["documents", "metadatas", "embeddings"])
+        previous = {
+            doc_id: (document, metadata, embedding)
+            for doc_id, document, metadata, embedding in zip(
+                existing["ids"], existing["documents"], existing["metadatas"], existing["embeddings"]
+            )
+        }
+
+        documents, metadatas = [], []
+        for doc_id, (session_id, exchanges) in zip(ids, by_session.items()):
+            exchanges.sort()
+            old = previous.get(doc_id)
+            if old is not None:
+                result["bytes_reclaimed"] += estimated_bytes(*old)
+            documents.append(self.summarizer(old[0] if old else None, [document for _, document in exchanges]))
+            metadatas.append({
+                "session_id": session_id,
+                "timestamp": datetime.fromtimestamp(exchanges[-1][0]).isoformat(),
+                "ts": exchanges[-1][0],
+                "type": "summary"
+            })
+
+        embeddings = self.memory_manager.embed(documents)
+        self.memory_manager.upsert("conversations", ids, documents, metadatas, embeddings)
+        for document, metadata, embedding in zip(documents, metadatas, embeddings):
+            result["bytes_reclaimed"] -= estimated_bytes(document, metadata, embedding)
+        result["summaries_written"] = len(ids)
+        result["vectors_reclaimed"] -= len(ids) - len(previous)
+
+    def _drop_unused_facts(self, cutoff: float, result: Dict[str, int]) -> None:
+        collection = self.memory_manager.facts
+        # Age is measured from the last time the fact was stated, so repeating it keeps it.
+        unused = collection.get(
+            where={"$and": [
+                {"last_seen_ts": {"$lt": cutoff}},
+                {"retrieved": 0},
+                {"confidence": {"$in": self.policy.droppable_confidences()}}
+            ]},
+            limit=self.policy.batch_size,
+            include=["documents", "metadatas", "embeddings"]
+        )
+        if not unused["ids"]:
+            return
+        for document, metadata, embedding in zip(unused["documents"], unused["metadatas"], unused["embeddings"]):
+            result["bytes_reclaimed"] += estimated_bytes(document, metadata, embedding)
+        self.memory_manager.delete("facts", unused["ids"])
+        result["facts_deleted"] = len(unused["ids"])
+
+    def start(self, interval: float) -> None:
+        self._task = asyncio.create_task(self._run_forever(interval))
+
+    async def _run_forever(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                result = await asyncio.to_thread(self.run_once)
+            except Exception:
+                logger.exception("Memory compaction failed")
+                continue
+            if result["vectors_reclaimed"] or result["summaries_written"]:
+                logger.info("Memory compaction: %s", result)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await asyncio.to_thread(self.memory_manager.flush_retrievals)
@@ -0,0 +1,113 @@
+from typing import Dict, List, Optional
+
+from lexical_index import tokenize
+
+TRUNCATION_MARK = " [...]"
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English under Llama-style tokenizers;
+    # exact counts would need the model's tokenizer and a round trip per request.
+    return (len(text) + 3) // 4
+
+
+def truncate_to_tokens(text: str, tokens: int) -> str:
+    limit = tokens * 4 - len(TRUNCATION_MARK)
+    if limit <= 0:
+        return ""
+    return text[:limit].rstrip() + TRUNCATION_MARK
+
+
+def overlap(text: str, query_terms: set) -> float:
+    if not query_terms:
+        return 0.0
+    return len(query_terms.intersection(tokenize(text))) / len(query_terms)
+
+
+class Snippet:
+    __slots__ = ("section", "position", "text", "relevance", "recency", "tokens")
+
+    def __init__(self, section: str, position: int, text: str, relevance: float, recency: float) -> None:
+        self.section = section
+        self.position = position
+        self.text = text
+        self.relevance = relevance
+        self.recency = recency
+        self.tokens = estimate_tokens(text)
+
+
+class PackedContext:
+    def __init__(
+        self,
+        sections: Dict[str, List[str]],
+        positions: Dict[str, List[int]],
+        tokens: Dict[str, int],
+        dropped: int,
+        truncated: int
+    ) -> None:
+        self.sections = sections
+        self.positions = positions
+        self.tokens = tokens
+        self.dropped = dropped
+        self.truncated = truncated
+
+
+class ContextPacker:
+    """Greedily fills a token budget with the best-scoring snippets."""
+
+    def __init__(
+        self,
+        budget: int = 2048,
+        relevance_weight: float = 0.6,
+        recency_weight: float = 0.4,
+        min_truncated_tokens: int = 32
+    ) -> None:
+        self.budget = budget
+        self.relevance_weight = relevance_weight
+        self.recency_weight = recency_weight
+        self.min_truncated_tokens = min_truncated_tokens
+
+    def score(self, snippet: Snippet) -> float:
+        return self.relevance_weight * snippet.relevance + self.recency_weight * snippet.recency
+
+    def pack(self, snippets: List[Snippet], budget: Optional[int] = None) -> PackedContext:
+        remaining = self.budget if budget is None else budget
+        chosen: List[Snippet] = []
+        dropped = truncated = 0
+        for snippet in sorted(snippets, key=self.score, reverse=True):
+            if snippet.tokens <= remaining:
+                chosen.append(snippet)
+                remaining -= snippet.tokens
+            elif remaining >= self.min_truncated_tokens:
+                # A single oversized snippet (a pasted log) keeps its head rather than vanishing.
+                text = truncate_to_tokens(snippet.text, remaining)
+                shortened = Snippet(snippet.section, snippet.position, text, snippet.relevance, snippet.recency)
+                chosen.append(shortened)
+                remaining -= shortened.tokens
+                truncated += 1
+            else:
+                dropped += 1
+
+        # Sections keep their original order so the prompt still reads naturally.
+        chosen.sort(key=lambda snippet: (snippet.section, snippet.position))
+        sections: Dict[str, List[str]] = {}
+        positions: Dict[str, List[int]] = {}
+        tokens: Dict[str, int] = {}
+        for snippet in chosen:
+            sections.setdefault(snippet.section, []).append(snippet.text)
+            positions.setdefault(snippet.section, []).append(snippet.position)
+            tokens[snippet.section] = tokens.get(snippet.section, 0) + snippet.tokens
+        return PackedContext(sections, positions, tokens, dropped, truncated)
+
+
+def history_snippets(lines: List[str], query_terms: set) -> List[Snippet]:
+    count = len(lines)
+    return [
+        Snippet("history", index, line, overlap(line, query_terms), (index + 1) / count)
+        for index, line in enumerate(lines)
+    ]
+
+
+def ranked_snippets(section: str, texts: List[str], recency: float = 0.0) -> List[Snippet]:
+    count = len(texts)
+    return [Snippet(section, index, text, 1.0 - index / count, recency) for index, text in enumerate(texts)]
@@ -1,39 +1,307 @@
-from typing import List, Dict, Any
+import os
+import sqlite3
+import sys
+import threading
+import time
+import itertools
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from typing import Callable, Deque, List, Dict, Any, Optional, Tuple
 from datetime import datetime
+from metrics import timed
+
+class Message:
+    __slots__ = ("role", "content", "timestamp")
+
+    def __init__(self, role: str, content: str, timestamp: Optional[float] = None) -> None:
+        self.role = role
+        self.content = content
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "role": self.role,
+            "content": self.content,
+            "timestamp": str(datetime.fromtimestamp(self.timestamp))
+        }
+
+class Session:
+    __slots__ = ("messages", "last_access", "version")
+
+    def __init__(self, max_messages: int, now: float) -> None:
+        self.messages: Deque[Message] = deque(maxlen=max_messages)
+        self.last_access = now
+        self.version = 0
+
+class HistoryBackend(ABC):
+    @abstractmethod
+    def append(self, session_id: str, message: Message) -> None:
+        ...
+
+    @abstractmethod
+    def recent(self, session_id: str, limit: int) -> List[Message]:
+        ...
+
+    def version(self, session_id: str) -> Optional[int]:
+        """Token that changes on every append, or None if the backend can change behind our back."""
+        return None
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+    def close(self) -> None:
+        pass
+
+class SessionStore(HistoryBackend):
+    def __init__(
+        self,
+        max_messages: int = 10,
+        max_sessions: int = 10000,
+        ttl: float = 24 * 3600,
+        clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.max_messages = max_messages
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.clock = clock
+        self.evicted = 0
+        self.expired = 0
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._message_count = 0
+        self._content_chars = 0
+        self._versions = itertools.count(1)
+        # Prompt building runs on the blocking-I/O pool, so the store is shared between threads.
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def append(self, session_id: str, message: Message) -> None:
+        with self._lock:
+            now = self.clock()
+            self._expire(now)
+            session = self._touch(session_id, now)
+            if session is None:
+                session = Session(self.max_messages, now)
+                self._sessions[session_id] = session
+                self._evict_overflow()
+
+            if len(session.messages) == session.messages.maxlen:
+                self._forget(session.messages[0])
+            session.messages.append(message)
+            session.version = next(self._versions)
+            self._message_count += 1
+            self._content_chars += len(message.content)
+
+    def get(self, session_id: str) -> Optional[Deque[Message]]:
+        with self._lock:
+            now = self.clock()
+            self._expire(now)
+            session = self._touch(session_id, now)
+            return session.messages if session is not None else None
+
+    def version(self, session_id: str) -> Optional[int]:
+        with self._lock:
+            self._expire(self.clock())
+            session = self._sessions.get(session_id)
+            return session.version if session is not None else 0
+
+    def recent(self, session_id: str, limit: int) -> List[Message]:
+        with self._lock:
+            messages = self.get(session_id)
+            if not messages:
+                return []
+            return list(messages)[-limit:]
+
+    def _touch(self, session_id: str, now: float) -> Optional[Session]:
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.last_access = now
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def _expire(self, now: float) -> None:
+        # Sessions are kept in access order, so expired ones sit at the front.
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_access < self.ttl:
+                break
+            self._drop(session_id)
+            self.expired += 1
+
+    def _evict_overflow(self) -> None:
+        while len(self._sessions) > self.max_sessions:
+            self._drop(next(iter(self._sessions)))
+            self.evicted += 1
+
+    def _drop(self, session_id: str) -> None:
+        session = self._sessions.pop(session_id)
+        for message in session.messages:
+            self._forget(message)
+
+    def _forget(self, message: Message) -> None:
+        self._message_count -= 1
+        self._content_chars -= len(message.content)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return self._stats()
+
+    def _stats(self) -> Dict[str, int]:
+        message_overhead = sys.getsizeof(Message("", "", 0.0)) + sys.getsizeof("")
+        session_overhead = sys.getsizeof(Session(self.max_messages, 0.0)) + sys.getsizeof(deque(maxlen=self.max_messages))
+        return {
+            "sessions": len(self._sessions),
+            "messages": self._message_count,
+            "content_chars": self._content_chars,
+            "estimated_bytes": (
+                len(self._sessions) * session_overhead
+                + self._message_count * message_overhead
+                + self._content_chars
+            ),
+            "evicted_sessions": self.evicted,
+            "expired_sessions": self.expired
+        }
+
+class SQLiteHistoryBackend(HistoryBackend):
+    def __init__(
+        self,
+        path: str,
+        max_messages: int = 10,
+        ttl: float = 24 * 3600,
+        batch_size: int = 32,
+        flush_interval: float = 0.05
+    ) -> None:
+        self.path = path
+        self.max_messages = max_messages
+        self.ttl = ttl
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.RLock()
+        self._pending: List[Tuple[str, str, str, float]] = []
+        self._flush_timer: Optional[threading.Timer] = None
+        self._last_expiry = 0.0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "session_id TEXT NOT NULL, "
+            "role TEXT NOT NULL, "
+            "content TEXT NOT NULL, "
+            "timestamp REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_session_seq ON messages (session_id, seq)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages (timestamp)")
+        self._conn.commit()
+
+    def append(self, session_id: str, message: Message) -> None:
+        with self._lock:
+            self._pending.append((session_id, message.role, message.content, message.timestamp))
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+            elif self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, []
+            sessions = {row[0] for row in pending}
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO messages (session_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
+                    pending
+                )
+                for session_id in sessions:
+                    self._trim(session_id)
+                self._expire_if_due()
+
+    def _trim(self, session_id: str) -> None:
+        self._conn.execute(
+            "DELETE FROM messages WHERE session_id = ? AND seq < ("
+            "SELECT seq FROM messages WHERE session_id = ? ORDER BY seq DESC LIMIT 1 OFFSET ?)",
+            (session_id, session_id, self.max_messages - 1)
+        )
+
+    def _expire_if_due(self) -> None:
+        now = time.time()
+        if now - self._last_expiry < min(self.ttl, 60.0):
+            return
+        self._last_expiry = now
+        self._conn.execute(
+            "DELETE FROM messages WHERE session_id IN ("
+            "SELECT session_id FROM messages GROUP BY session_id HAVING MAX(timestamp) < ?)",
+            (now - self.ttl,)
+        )
+
+    def recent(self, session_id: str, limit: int) -> List[Message]:
+        with self._lock:
+            self.flush()
+            rows = self._conn.execute(
+                "SELECT role, content, timestamp FROM messages WHERE session_id = ? ORDER BY seq DESC LIMIT ?",
+                (session_id, limit)
+            ).fetchall()
+        return [Message(role, content, timestamp) for role, content, timestamp in reversed(rows)]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            sessions, messages = self._conn.execute(
+                "SELECT COUNT(DISTINCT session_id), COUNT(*) FROM messages"
+            ).fetchone()
+            return {"sessions": sessions, "messages": messages, "pending_writes": len(self._pending)}
+
+    def close(self) -> None:
+        self.flush()
+        self._conn.close()
 
 class ConversationHistory:
-    def __init__(self, max_history: int = 10) -> None:
+    def __init__(
+        self,
+        max_history: int = 10,
+        max_sessions: int = 10000,
+        session_ttl: float = 24 * 3600,
+        backend: Optional[HistoryBackend] = None
+    ) -> None:
         self.max_history = max_history
-        self.conversations: Dict[str, List[Dict[str, Any]]] = {}
+        self.conversations = backend or SessionStore(max_messages=max_history, max_sessions=max_sessions, ttl=session_ttl)
 
     def add_message(self, session_id: str, role: str, content: str) -> None:
-        if session_id not in self.conversations:
-            self.conversations[session_id] = []
-        
-        message = {
-            "role": role,
-            "content": content,
-            "timestamp": str(datetime.now())
-        }
-        
-        self.conversations[session_id].append(message)
-        
-        if len(self.conversations[session_id]) > self.max_history:
-            self.conversations[session_id] = self.conversations[session_id][-self.max_history:]
+        with timed("history.append"):
+            self.conversations.append(session_id, Message(role, content))
 
     def get_history(self, session_id: str) -> List[Dict[str, Any]]:
-        return self.conversations.get(session_id, [])
+        return [message.to_dict() for message in self.conversations.recent(session_id, self.max_history)]
+
+    def recent_messages(self, session_id: str, limit: int) -> List[Message]:
+        with timed("history.read"):
+            return self.conversations.recent(session_id, limit)
+
+    def version(self, session_id: str) -> Optional[int]:
+        return self.conversations.version(session_id)
 
     def get_context_string(self, session_id: str, max_messages: int = 5) -> str:
-        history = self.get_history(session_id)[-max_messages:]
+        history = self.recent_messages(session_id, max_messages)
         if not history:
             return ""
-        
+
         context = ["Recent conversation:"]
         for msg in history:
-            role = "You" if msg["role"] == "user" else "Assistant"
-            context.append(f"{role}: {msg['content']}")
-        
+            role = "You" if msg.role == "user" else "Assistant"
+            context.append(f"{role}: {msg.content}")
+
         return "\n".join(context)
 
     def get_messages(self, session_id: str) -> List[Dict[str, Any]]:
@@ -45,4 +313,10 @@ class ConversationHistory:
                 "content": msg["content"]
             }
             for msg in messages
-        ]
\ No newline at end of file
+        ]
+
+    def stats(self) -> Dict[str, int]:
+        return self.conversations.stats()
+
+    def close(self) -> None:
+        self.conversations.close()
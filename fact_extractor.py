@@ -0,0 +1,140 @@
+import re
+from bisect import bisect_right
+from datetime import datetime
+from typing import Dict, Iterable, List, Pattern
+
+CONFIDENCE_RANK = {"low": 0, "medium": 1, "high": 2}
+
+FACT_PATTERNS = {
+    "preference": ["i like", "i love", "i enjoy", "i prefer", "i'm fond of", "i don't like", "i hate", "i dislike"],
+    "habit": ["i usually", "i always", "i never", "i sometimes", "every day", "every week", "normally i"],
+    "personal_info": ["i am", "i'm", "my name is", "i work", "i live", "my job", "my home", "my family"],
+    "skill": ["i can", "i know how", "i'm good at", "i'm skilled in", "i'm experienced in", "i've learned"],
+    "goal": ["i want to", "i plan to", "i hope to", "i'm trying to", "my goal", "i aim to", "i wish to"],
+    "experience": ["i've been", "i have been", "i used to", "in my experience", "i remember when"]
+}
+
+HIGH_CONFIDENCE_PATTERNS = {"i am", "i'm", "my name is"}
+
+CONFIRMATION_PATTERNS = {
+    "confirmation": ["you mentioned that", "you said", "as you told me", "based on what you said", "you indicated"]
+}
+
+
+def trie_regex(words: Iterable[str]) -> str:
+    # A prefix-factored alternation fails on the first character at most offsets,
+    # where a flat alternation would try every pattern in turn.
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    return _trie_node_regex(trie)
+
+
+def _trie_node_regex(node: Dict[str, dict]) -> str:
+    branches = [re.escape(char) + _trie_node_regex(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ""
+    body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    return f"(?:{body})?" if "" in node else body
+
+
+class PatternRule:
+    __slots__ = ("pattern", "category", "confidence", "strength")
+
+    def __init__(self, pattern: str, category: str, confidence: str, order: int) -> None:
+        self.pattern = pattern
+        self.category = category
+        self.confidence = confidence
+        # Strongest confidence wins, then the most specific pattern, then declaration order.
+        self.strength = (CONFIDENCE_RANK[confidence], len(pattern), -order)
+
+
+class FactExtractor:
+    def __init__(self, patterns: Dict[str, List[str]], source: str, high_confidence: Iterable[str] = ()) -> None:
+        self.source = source
+        high_confidence = set(high_confidence)
+        self.rules: Dict[str, List[PatternRule]] = {}
+        order = 0
+        for category, category_patterns in patterns.items():
+            for pattern in category_patterns:
+                confidence = "high" if pattern in high_confidence else "medium"
+                self.rules.setdefault(pattern, []).append(PatternRule(pattern, category, confidence, order))
+                order += 1
+
+        # A pattern's match also proves every pattern it contains, so each match
+        # resolves straight to the strongest rule it implies.
+        self.strongest: Dict[str, PatternRule] = {
+            pattern: max(
+                (rule for other, rules in self.rules.items() if other in pattern for rule in rules),
+                key=lambda rule: rule.strength
+            )
+            for pattern in self.rules
+        }
+        # Matches consume their text, so re-probe the offsets where a pattern's
+        # tail could start another one ("normally i" + "i am").
+        self.overlaps: Dict[str, List[int]] = {
+            pattern: [
+                offset for offset in range(1, len(pattern))
+                if any(other.startswith(pattern[offset:]) for other in self.rules)
+            ]
+            for pattern in self.rules
+        }
+        self.automaton: Pattern[str] = re.compile(trie_regex(self.rules))
+
+    def best_rules(self, lowered: str, sentence_ends: List[int]) -> Dict[int, PatternRule]:
+        best: Dict[int, PatternRule] = {}
+        for match in self.automaton.finditer(lowered):
+            probes = [match]
+            while probes:
+                found = probes.pop()
+                pattern = found.group()
+                rule = self.strongest[pattern]
+                sentence = bisect_right(sentence_ends, found.start())
+                current = best.get(sentence)
+                if current is None or rule.strength > current.strength:
+                    best[sentence] = rule
+                for offset in self.overlaps[pattern]:
+                    overlap = self.automaton.match(lowered, found.start() + offset)
+                    if overlap is not None:
+                        probes.append(overlap)
+        return best
+
+    def extract(self, text: str, timestamp: str) -> List[Dict[str, str]]:
+        sentences = text.split('.')
+        lowered = text.lower()
+        # Offsets come from the lowered text itself, since lowercasing can change length.
+        sentence_ends = []
+        offset = -1
+        for lowered_sentence in lowered.split('.'):
+            offset += len(lowered_sentence) + 1
+            sentence_ends.append(offset)
+
+        facts: Dict[str, Dict[str, str]] = {}
+        for index, rule in sorted(self.best_rules(lowered, sentence_ends).items()):
+            content = sentences[index].strip()
+            existing = facts.get(content)
+            if existing is None or CONFIDENCE_RANK[rule.confidence] > CONFIDENCE_RANK[existing["confidence"]]:
+                facts[content] = {
+                    "content": content,
+                    "category": rule.category,
+                    "source": self.source,
+                    "confidence": rule.confidence,
+                    "timestamp": timestamp
+                }
+        return list(facts.values())
+
+USER_FACTS = FactExtractor(FACT_PATTERNS, "user_message", HIGH_CONFIDENCE_PATTERNS)
+ASSISTANT_CONFIRMATIONS = FactExtractor(CONFIRMATION_PATTERNS, "assistant_response")
+
+
+def extract_facts(user_message: str, assistant_response: str) -> List[Dict[str, str]]:
+    timestamp = datetime.now().isoformat()
+    facts = USER_FACTS.extract(user_message, timestamp)
+    known = {fact["content"] for fact in facts}
+    for fact in ASSISTANT_CONFIRMATIONS.extract(assistant_response, timestamp):
+        if fact["content"] not in known:
+            facts.append(fact)
+    return facts
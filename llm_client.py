@@ -0,0 +1,155 @@
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Union
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class LLMError(Exception):
+    pass
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Dict[str, Any]]:
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        lines = buffer.split(b"\n")
+        buffer = lines.pop()
+        for line in lines:
+            parsed = _parse_line(line)
+            if parsed is not None:
+                yield parsed
+
+    parsed = _parse_line(buffer)
+    if parsed is not None:
+        yield parsed
+
+
+def _parse_line(line: bytes) -> Optional[Dict[str, Any]]:
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        return json.loads(line.decode("utf-8"))
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+
+
+class OllamaClient:
+    def __init__(
+        self,
+        base_url: str = "http://localhost:11434",
+        model: str = "llama3.2:latest",
+        connect_timeout: float = 5.0,
+        read_timeout: float = 120.0,
+        max_connections: int = 32,
+        max_keepalive_connections: int = 16,
+        keepalive_expiry: float = 30.0,
+        keep_alive: Optional[Union[str, int]] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        on_complete: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        # How long Ollama keeps the model (and its KV cache) loaded after a request.
+        self.keep_alive = keep_alive
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.transport = transport
+        # Receives Ollama's final streamed object, which carries eval_count and eval_duration.
+        self.on_complete = on_complete
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Pooled connections belong to the loop that opened them, so a new
+        # loop (e.g. a TestClient without a lifespan) gets its own pool.
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=self.limits,
+                transport=self.transport
+            )
+            self._client_loop = loop
+        return self._client
+
+    def _payload(self, **fields: Any) -> Dict[str, Any]:
+        payload = {"model": self.model, **fields}
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        return payload
+
+    async def _stream(self, path: str, payload: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        async with self._get_client().stream("POST", path, json=payload) as response:
+            if response.status_code != 200:
+                raise LLMError(f"Ollama returned HTTP {response.status_code}")
+            async for obj in iter_ndjson(response.aiter_bytes()):
+                if obj.get("done") and self.on_complete is not None:
+                    self.on_complete(obj)
+                yield obj
+
+    async def stream_generate(self, prompt: str, **options: Any) -> AsyncIterator[Dict[str, Any]]:
+        async for obj in self._stream("/api/generate", self._payload(prompt=prompt, stream=True, **options)):
+            yield obj
+
+    async def stream_chat(self, messages: List[Dict[str, str]], **options: Any) -> AsyncIterator[Dict[str, Any]]:
+        async for obj in self._stream("/api/chat", self._payload(messages=messages, stream=True, **options)):
+            yield obj
+
+    async def stream_chat_tokens(self, messages: List[Dict[str, str]], **options: Any) -> AsyncIterator[str]:
+        async for obj in self.stream_chat(messages, **options):
+            content = obj.get("message", {}).get("content")
+            if content:
+                yield content
+
+    async def chat(self, messages: List[Dict[str, str]], **options: Any) -> str:
+        parts = []
+        async for token in self.stream_chat_tokens(messages, **options):
+            parts.append(token)
+        return "".join(parts)
+
+    async def warm_up(self, system_prompt: Optional[str] = None) -> bool:
+        """Loads the model and, given the stable system prompt, evaluates it so later turns reuse that prefix."""
+        try:
+            if system_prompt is None:
+                # A generate request without a prompt only loads the model.
+                response = await self._get_client().post("/api/generate", json=self._payload())
+            else:
+                response = await self._get_client().post("/api/chat", json=self._payload(
+                    messages=[{"role": "system", "content": system_prompt}],
+                    stream=False,
+                    options={"num_predict": 1}
+                ))
+        except httpx.HTTPError as exc:
+            logger.warning("Model warm-up failed: %s", exc)
+            return False
+        if response.status_code != 200:
+            logger.warning("Model warm-up failed with HTTP %d", response.status_code)
+            return False
+        return True
+
+    async def stream_tokens(self, prompt: str, **options: Any) -> AsyncIterator[str]:
+        async for obj in self.stream_generate(prompt, **options):
+            if obj.get("response"):
+                yield obj["response"]
+
+    async def generate(self, prompt: str, **options: Any) -> str:
+        parts = []
+        async for token in self.stream_tokens(prompt, **options):
+            parts.append(token)
+        return "".join(parts)
+
+    async def aclose(self) -> None:
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+        self._client_loop = None
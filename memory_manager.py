@@ -1,115 +1,810 @@
-import chromadb
-from chromadb.config import Settings
+import numpy as np
+import hashlib
+import json
+import logging
 import os
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Any
+from fact_extractor import CONFIDENCE_RANK, extract_facts
+from lexical_index import BM25Index, reciprocal_rank_fusion
+from metrics import timed
+from typing import List, Dict, Any, Callable, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single process owns the cache directory.
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+EmbeddingFunction = Callable[[List[str]], List[Any]]
+
+def embedding_key(text: str) -> bytes:
+    normalized = " ".join(text.split()).casefold()
+    return hashlib.sha1(normalized.encode("utf-8")).digest()
+
+class DiskEmbeddingStore:
+    """Fixed-capacity ring of vectors in memory-mapped files; the oldest entry is overwritten when full.
+
+    Several worker processes can share one directory: slots are handed out under a file lock from a
+    shared sequence counter, and a read only counts if the slot still holds the key it was looked up by.
+    """
+
+    def __init__(self, cache_dir: str, capacity: int) -> None:
+        self.cache_dir = cache_dir
+        self.capacity = capacity
+        self.dim: Optional[int] = None
+        self._index: Dict[bytes, int] = {}
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock_file = open(self._path("lock"), "a+")
+        with self._exclusive():
+            self._open_existing()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.cache_dir, name)
+
+    @contextmanager
+    def _exclusive(self) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _open_existing(self) -> None:
+        meta_path = self._path("meta.json")
+        if not os.path.exists(meta_path):
+            return
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        if meta.get("capacity") != self.capacity:
+            return
+        self._map_files(meta["dim"], "r+")
+        self._index = {self._keys[slot].tobytes(): int(slot) for slot in np.flatnonzero(self._seqs)}
+
+    def _map_files(self, dim: int, mode: str) -> None:
+        self.dim = dim
+        self._vectors = np.memmap(self._path("vectors.f32"), dtype=np.float32, mode=mode, shape=(self.capacity, dim))
+        self._keys = np.memmap(self._path("keys.bin"), dtype="V20", mode=mode, shape=(self.capacity,))
+        self._seqs = np.memmap(self._path("seqs.i64"), dtype=np.int64, mode=mode, shape=(self.capacity,))
+        # The last sequence number handed out, shared by every process using the directory.
+        head_path = self._path("head.i64")
+        if mode == "r+" and os.path.exists(head_path):
+            self._head = np.memmap(head_path, dtype=np.int64, mode="r+", shape=(1,))
+        else:
+            self._head = np.memmap(head_path, dtype=np.int64, mode="w+", shape=(1,))
+            self._head[0] = int(self._seqs.max())
+
+    def _create(self, dim: int) -> None:
+        self._map_files(dim, "w+")
+        with open(self._path("meta.json"), "w") as f:
+            json.dump({"dim": dim, "capacity": self.capacity}, f)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def _holds(self, slot: int, key: bytes) -> bool:
+        if self._keys[slot].tobytes() == key:
+            return True
+        # Another process reused the slot for a different text.
+        self._index.pop(key, None)
+        return False
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        slot = self._index.get(key)
+        if slot is None or not self._holds(slot, key):
+            return None
+        seq = int(self._seqs[slot])
+        vector = np.array(self._vectors[slot])
+        # Checked again in case the slot was overwritten while the vector was being copied.
+        if not self._holds(slot, key) or int(self._seqs[slot]) != seq:
+            self._index.pop(key, None)
+            return None
+        return vector
+
+    def put(self, key: bytes, vector: np.ndarray) -> None:
+        with self._exclusive():
+            if self.dim is None:
+                # Another process may have created the files since this one started.
+                self._open_existing()
+            if self.dim is None:
+                self._create(len(vector))
+            elif len(vector) != self.dim:
+                # A different embedding model; the stored vectors can never be served again.
+                logger.warning(
+                    "Embedding size changed from %d to %d; recreating the disk cache in %s",
+                    self.dim, len(vector), self.cache_dir
+                )
+                self._index.clear()
+                self._create(len(vector))
+            slot = self._index.get(key)
+            if slot is not None and self._holds(slot, key):
+                return
+            seq = int(self._head[0]) + 1
+            self._head[0] = seq
+            slot = (seq - 1) % self.capacity
+            if self._seqs[slot]:
+                self._index.pop(self._keys[slot].tobytes(), None)
+            # Cleared first, so a concurrent reader never pairs the old key with the new vector.
+            self._seqs[slot] = 0
+            self._keys[slot] = np.void(bytes(20))
+            self._vectors[slot] = vector
+            self._keys[slot] = np.void(key)
+            self._seqs[slot] = seq
+            self._index[key] = slot
+
+    def sync(self) -> None:
+        if self.dim is not None:
+            self._vectors.flush()
+            self._keys.flush()
+            self._seqs.flush()
+            self._head.flush()
+
+class EmbeddingCache:
+    def __init__(
+        self,
+        embedding_function: EmbeddingFunction,
+        memory_size: int = 1024,
+        cache_dir: Optional[str] = None,
+        disk_capacity: int = 100_000,
+        sync_interval: float = 30.0
+    ) -> None:
+        self.embedding_function = embedding_function
+        self.memory_size = memory_size
+        self.disk = DiskEmbeddingStore(cache_dir, disk_capacity) if cache_dir else None
+        # New disk entries are msynced on this timer and at shutdown, never on the lookup path.
+        self.sync_interval = sync_interval
+        self._sync_timer: Optional[threading.Timer] = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __call__(self, input: List[str]) -> List[np.ndarray]:
+        keys = [embedding_key(text) for text in input]
+        with self._lock:
+            vectors = [self._lookup(key) for key in keys]
+        missing = [index for index, vector in enumerate(vectors) if vector is None]
+        if missing:
+            computed = self.embedding_function([input[index] for index in missing])
+            with self._lock:
+                for index, vector in zip(missing, computed):
+                    vectors[index] = np.asarray(vector, dtype=np.float32)
+                    self._store(keys[index], vectors[index])
+                if self.disk is not None and self._sync_timer is None:
+                    self._sync_timer = threading.Timer(self.sync_interval, self.sync)
+                    self._sync_timer.daemon = True
+                    self._sync_timer.start()
+        return vectors
+
+    def sync(self) -> None:
+        with self._lock:
+            if self._sync_timer is not None:
+                self._sync_timer.cancel()
+                self._sync_timer = None
+            if self.disk is not None:
+                self.disk.sync()
+
+    def _lookup(self, key: bytes) -> Optional[np.ndarray]:
+        vector = self._memory.get(key)
+        if vector is not None:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return vector
+        if self.disk is not None:
+            vector = self.disk.get(key)
+            if vector is not None:
+                self.disk_hits += 1
+                self._remember(key, vector)
+                return vector
+        self.misses += 1
+        return None
+
+    def _store(self, key: bytes, vector: np.ndarray) -> None:
+        self._remember(key, vector)
+        if self.disk is not None:
+            self.disk.put(key, vector)
+
+    def _remember(self, key: bytes, vector: np.ndarray) -> None:
+        if self.memory_size <= 0:
+            return
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+            "disk_entries": len(self.disk) if self.disk is not None else 0
+        }
+
+class DefaultEmbedding:
+    """chromadb's ONNX MiniLM, imported and loaded on the first call rather than at startup."""
+
+    def __init__(self) -> None:
+        self._function: Optional[EmbeddingFunction] = None
+        self._lock = threading.Lock()
+
+    def __call__(self, input: List[str]) -> List[Any]:
+        if self._function is None:
+            with self._lock:
+                if self._function is None:
+                    from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+                    self._function = DefaultEmbeddingFunction()
+        return self._function(input)
+
+class WriteBuffer:
+    def __init__(self, collection: Any, embed: EmbeddingFunction) -> None:
+        self.collection = collection
+        self.embed = embed
+        self.documents: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.ids: List[str] = []
+
+    def append(self, document: str, metadata: Dict[str, Any], doc_id: str) -> None:
+        self.documents.append(document)
+        self.metadatas.append(metadata)
+        self.ids.append(doc_id)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def flush(self) -> List[Tuple[str, str]]:
+        if not self.ids:
+            return []
+        documents, metadatas, ids = self.documents, self.metadatas, self.ids
+        self.documents, self.metadatas, self.ids = [], [], []
+        self.collection.add(documents=documents, metadatas=metadatas, ids=ids, embeddings=self.embed(documents))
+        return list(zip(ids, documents))
+
+def fact_id(content: str) -> str:
+    return f"fact_{embedding_key(content).hex()}"
+
+def parse_timestamp(value: Any) -> Optional[float]:
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+def first_seen_timestamp(metadata: Dict[str, Any], default: float = 0.0) -> float:
+    # Rows written before ts existed only carry the ISO timestamp.
+    if "ts" in metadata:
+        return metadata["ts"]
+    parsed = parse_timestamp(metadata.get("timestamp"))
+    return default if parsed is None else parsed
+
+def last_seen_timestamp(metadata: Dict[str, Any], default: float = 0.0) -> float:
+    # Facts written before last_seen_ts existed fall back to last_seen, then to when they were first seen.
+    if "last_seen_ts" in metadata:
+        return metadata["last_seen_ts"]
+    parsed = parse_timestamp(metadata.get("last_seen"))
+    return first_seen_timestamp(metadata, default) if parsed is None else parsed
+
+def merge_fact_metadata(existing: Dict[str, Any], incoming: Dict[str, Any]) -> Dict[str, Any]:
+    merged = dict(existing)
+    merged["count"] = existing.get("count", 1) + incoming.get("count", 1)
+    merged["last_seen"] = max(existing.get("last_seen", existing.get("timestamp", "")), incoming["last_seen"])
+    merged["last_seen_ts"] = max(last_seen_timestamp(existing), last_seen_timestamp(incoming))
+    if CONFIDENCE_RANK.get(incoming["confidence"], 0) > CONFIDENCE_RANK.get(existing.get("confidence"), 0):
+        merged["confidence"] = incoming["confidence"]
+        merged["category"] = incoming["category"]
+    return merged
+
+class FactWriteBuffer:
+    """Upserts facts by content hash, merging repeats into one record with a count."""
+
+    def __init__(self, collection: Any, embed: EmbeddingFunction, near_duplicate_distance: Optional[float] = None) -> None:
+        self.collection = collection
+        self.embed = embed
+        self.near_duplicate_distance = near_duplicate_distance
+        self.pending: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+
+    def append(self, document: str, metadata: Dict[str, Any], doc_id: str) -> None:
+        if doc_id in self.pending:
+            document, existing = self.pending[doc_id]
+            metadata = merge_fact_metadata(existing, metadata)
+        self.pending[doc_id] = (document, metadata)
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    def flush(self) -> List[Tuple[str, str]]:
+        if not self.pending:
+            return []
+        pending, self.pending = self.pending, {}
+        existing = self.collection.get(ids=list(pending), include=["metadatas"])
+        updates: Dict[str, Dict[str, Any]] = {
+            doc_id: merge_fact_metadata(metadata, pending[doc_id][1])
+            for doc_id, metadata in zip(existing["ids"], existing["metadatas"])
+        }
+
+        new_ids = [doc_id for doc_id in pending if doc_id not in updates]
+        embeddings = self.embed([pending[doc_id][0] for doc_id in new_ids]) if new_ids else []
+        if new_ids and self.near_duplicate_distance is not None:
+            new_ids, embeddings = self._merge_near_duplicates(pending, new_ids, embeddings, updates)
+
+        if updates:
+            self.collection.update(ids=list(updates), metadatas=list(updates.values()))
+        if new_ids:
+            self.collection.upsert(
+                ids=new_ids,
+                documents=[pending[doc_id][0] for doc_id in new_ids],
+                metadatas=[pending[doc_id][1] for doc_id in new_ids],
+                embeddings=embeddings
+            )
+        return [(doc_id, pending[doc_id][0]) for doc_id in new_ids]
+
+    def _merge_near_duplicates(
+        self,
+        pending: Dict[str, Tuple[str, Dict[str, Any]]],
+        new_ids: List[str],
+        embeddings: List[Any],
+        updates: Dict[str, Dict[str, Any]]
+    ) -> Tuple[List[str], List[Any]]:
+        nearest = self.collection.query(query_embeddings=embeddings, n_results=1, include=["metadatas", "distances"])
+        kept_ids, kept_embeddings = [], []
+        for index, doc_id in enumerate(new_ids):
+            match_ids = nearest["ids"][index]
+            if match_ids and nearest["distances"][index][0] <= self.near_duplicate_distance:
+                target = match_ids[0]
+                base = updates.get(target, nearest["metadatas"][index][0])
+                updates[target] = merge_fact_metadata(base, pending[doc_id][1])
+            else:
+                kept_ids.append(doc_id)
+                kept_embeddings.append(embeddings[index])
+        return kept_ids, kept_embeddings
+
+class SearchHits:
+    __slots__ = ("ids", "documents", "metadatas")
+
+    def __init__(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+
+    @classmethod
+    def from_query(cls, results: Dict[str, Any]) -> "SearchHits":
+        return cls(
+            results["ids"][0] if results.get("ids") else [],
+            results["documents"][0] if results["documents"] else [],
+            results["metadatas"][0] if results.get("metadatas") else []
+        )
 
 class MemoryManager:
-    def __init__(self, data_dir: str = "data") -> None:
+    FACT_OVERSAMPLE = 10
+    RETRIEVAL_MODES = ("vector", "lexical", "hybrid")
+
+    def __init__(
+        self,
+        data_dir: str = "data",
+        write_buffer_size: int = 1,
+        flush_interval: float = 1.0,
+        embedding_function: Optional[EmbeddingFunction] = None,
+        embedding_cache_size: int = 1024,
+        embedding_cache_disk_capacity: int = 100_000,
+        near_duplicate_distance: Optional[float] = None,
+        retrieval_mode: str = "vector",
+        query_threads: int = 2
+    ) -> None:
+        if retrieval_mode not in self.RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode: {retrieval_mode}")
+        self.retrieval_mode = retrieval_mode
         self.data_dir = data_dir
         self.memory_dir = os.path.join(data_dir, "memory")
         os.makedirs(self.memory_dir, exist_ok=True)
         
-        self.client = chromadb.PersistentClient(path=self.memory_dir)
-        self.conversations = self.client.get_or_create_collection("conversations")
-        self.facts = self.client.get_or_create_collection("facts")
+        # The Chroma client and collections are opened on first use (or by warm_up);
+        # importing chromadb alone takes longer than the rest of the app's startup.
+        self.client: Any = None
+        self._opened: Optional[Dict[str, Any]] = None
+        self._open_lock = threading.Lock()
+        self.embedding_cache = EmbeddingCache(
+            embedding_function or DefaultEmbedding(),
+            memory_size=embedding_cache_size,
+            cache_dir=os.path.join(data_dir, "embedding_cache") if embedding_cache_disk_capacity > 0 else None,
+            disk_capacity=embedding_cache_disk_capacity
+        )
+        self.embedding_function = self.embedding_cache
+        self._query_pool = ThreadPoolExecutor(max_workers=query_threads, thread_name_prefix="memory-query")
+
+        self.write_buffer_size = write_buffer_size
+        self.flush_interval = flush_interval
+        self._write_lock = threading.RLock()
+        self._conversation_buffer = WriteBuffer(None, self.embed)
+        self._fact_buffer = FactWriteBuffer(None, self.embed, near_duplicate_distance)
+        self._flush_timer: Optional[threading.Timer] = None
+        self._retrieved: Dict[str, int] = {}
+        # Built by warm_up (or the first lexical search), then kept in step with this process's writes.
+        # Writes made by other processes only show up after rebuild_lexical_indexes().
+        self._lexical_indexes: Optional[Dict[str, BM25Index]] = None
+        self._index_build_lock = threading.Lock()
+        # Writes that land while a rebuild is paging through the collections, replayed onto the result.
+        self._index_backlog: Optional[List[Tuple[str, str, Any]]] = None
+
+    def open(self) -> Dict[str, Any]:
+        if self._opened is None:
+            with self._open_lock:
+                if self._opened is None:
+                    import chromadb
+                    client = chromadb.PersistentClient(path=self.memory_dir)
+                    collections = {
+                        "conversations": client.get_or_create_collection("conversations"),
+                        "facts": client.get_or_create_collection("facts")
+                    }
+                    self._conversation_buffer.collection = collections["conversations"]
+                    self._fact_buffer.collection = collections["facts"]
+                    self.client = client
+                    self._opened = collections
+        return self._opened
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened is not None
+
+    @property
+    def conversations(self) -> Any:
+        return self.open()["conversations"]
+
+    @property
+    def facts(self) -> Any:
+        return self.open()["facts"]
+
+    @property
+    def _collections(self) -> Dict[str, Any]:
+        return self.open()
+
+    def warm_up(self) -> None:
+        """Opens the store and loads the embedding model so the first request pays for neither."""
+        self.open()
+        # Date filters on the memories page and retention both need ts on older rows.
+        self.backfill_legacy_metadata()
+        self.embedding_cache.embedding_function(["warm up"])
+        if self.retrieval_mode != "vector":
+            self.lexical_indexes()
 
     def add_conversation(self, session_id: str, user_message: str, assistant_response: str) -> None:
-        full_exchange = f"User: {user_message}\nAssistant: {assistant_response}"
-        self.conversations.add(
-            documents=[full_exchange],
-            metadatas=[{
-                "session_id": session_id,
-                "timestamp": datetime.now().isoformat(),
-                "type": "conversation"
-            }],
-            ids=[f"conv_{datetime.now().timestamp()}"]
-        )
+        self.add_conversations([(session_id, user_message, assistant_response)])
+
+    def add_conversations(self, exchanges: List[Tuple[str, str, str]]) -> None:
+        with self._write_lock:
+            for session_id, user_message, assistant_response in exchanges:
+                now = datetime.now()
+                self._conversation_buffer.append(
+                    f"User: {user_message}\nAssistant: {assistant_response}",
+                    {
+                        "session_id": session_id,
+                        "timestamp": now.isoformat(),
+                        "ts": now.timestamp(),
+                        "type": "conversation"
+                    },
+                    self._new_id("conv")
+                )
+            self._flush_if_needed()
 
     def add_fact(self, fact: Dict[str, str]) -> None:
-        self.facts.add(
-            documents=[fact["content"]],
-            metadatas=[{
-                "category": fact["category"],
-                "source": fact["source"],
-                "confidence": fact["confidence"],
-                "timestamp": fact["timestamp"],
-                "type": "fact"
-            }],
-            ids=[f"fact_{datetime.now().timestamp()}"]
-        )
+        self.add_facts([fact])
+
+    def add_facts(self, facts: List[Dict[str, str]]) -> None:
+        with self._write_lock:
+            for fact in facts:
+                seen = datetime.fromisoformat(fact["timestamp"]).timestamp()
+                self._fact_buffer.append(
+                    fact["content"],
+                    {
+                        "category": fact["category"],
+                        "source": fact["source"],
+                        "confidence": fact["confidence"],
+                        "timestamp": fact["timestamp"],
+                        "ts": seen,
+                        "last_seen": fact["timestamp"],
+                        "last_seen_ts": seen,
+                        "count": 1,
+                        "retrieved": 0,
+                        "type": "fact"
+                    },
+                    fact_id(fact["content"])
+                )
+            self._flush_if_needed()
+
+    def _new_id(self, prefix: str) -> str:
+        return f"{prefix}_{datetime.now().timestamp()}_{uuid.uuid4().hex[:8]}"
+
+    def _flush_if_needed(self) -> None:
+        buffered = len(self._conversation_buffer) + len(self._fact_buffer)
+        if buffered >= self.write_buffer_size:
+            self.flush()
+        elif buffered and self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def flush(self) -> None:
+        with timed("memory.flush"), self._write_lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not len(self._conversation_buffer) and not len(self._fact_buffer):
+                return
+            self.open()
+            self._index_written("conversations", self._conversation_buffer.flush())
+            self._index_written("facts", self._fact_buffer.flush())
+
+    def close(self) -> None:
+        self.flush()
+        self.embedding_cache.sync()
+
+    def _index_written(self, kind: str, written: List[Tuple[str, str]]) -> None:
+        if written:
+            self._apply_to_indexes("add", kind, written)
+
+    def _apply_to_indexes(self, operation: str, kind: str, payload: Any) -> None:
+        # Called with _write_lock held.
+        if self._index_backlog is not None:
+            self._index_backlog.append((operation, kind, payload))
+        if self._lexical_indexes is not None:
+            self._apply(self._lexical_indexes, operation, kind, payload)
+
+    def _apply(self, indexes: Dict[str, BM25Index], operation: str, kind: str, payload: Any) -> None:
+        if operation == "add":
+            indexes[kind].add_many(payload)
+        else:
+            indexes[kind].remove_many(payload)
+
+    def lexical_indexes(self) -> Dict[str, BM25Index]:
+        if self._lexical_indexes is None:
+            self.rebuild_lexical_indexes(only_if_missing=True)
+        return self._lexical_indexes
+
+    def rebuild_lexical_indexes(self, only_if_missing: bool = False) -> None:
+        """Rebuilds the BM25 indexes from the collections without blocking writers while it pages."""
+        with self._index_build_lock:
+            if only_if_missing and self._lexical_indexes is not None:
+                return
+            collections = self._collections
+            with self._write_lock:
+                self._index_backlog = []
+            try:
+                with timed("memory.index_build"):
+                    indexes = {kind: self._build_index(collection) for kind, collection in collections.items()}
+            except BaseException:
+                with self._write_lock:
+                    self._index_backlog = None
+                raise
+            with self._write_lock:
+                for operation, kind, payload in self._index_backlog:
+                    self._apply(indexes, operation, kind, payload)
+                self._index_backlog = None
+                self._lexical_indexes = indexes
+
+    def _build_index(self, collection: Any, page_size: int = 1000) -> BM25Index:
+        index = BM25Index()
+        offset = 0
+        while True:
+            page = collection.get(limit=page_size, offset=offset, include=["documents"])
+            index.add_many(zip(page["ids"], page["documents"]))
+            if len(page["ids"]) < page_size:
+                return index
+            offset += page_size
+
+    def upsert(self, kind: str, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]], embeddings: List[Any]) -> None:
+        with self._write_lock:
+            self._collections[kind].upsert(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+            self._index_written(kind, list(zip(ids, documents)))
+
+    def delete(self, kind: str, ids: List[str]) -> None:
+        with self._write_lock:
+            self._collections[kind].delete(ids=ids)
+            self._apply_to_indexes("remove", kind, ids)
+
+    def embed(self, texts: List[str]) -> List[Any]:
+        return list(self.embedding_function(texts))
+
+    def get_relevant_memories(
+        self,
+        query: str,
+        limit: int = 5,
+        fact_limit: Optional[int] = None,
+        mode: Optional[str] = None
+    ) -> Dict[str, List[Any]]:
+        mode = mode or self.retrieval_mode
+        fact_limit = fact_limit or limit
+        # Buffered writes are left to the size/interval flush; they show up within flush_interval.
+        if mode == "lexical":
+            # Exact-term lookups need no embedding at all.
+            with timed("memory.lexical"):
+                conversations = self._lexical_hits("conversations", query, limit)
+                facts = self._lexical_hits("facts", query, fact_limit)
+        else:
+            with timed("memory.embed"):
+                query_embeddings = self.embed([query])
+            with timed("memory.vector_search"):
+                conv_future = self._query_pool.submit(
+                    self.conversations.query,
+                    query_embeddings=query_embeddings, n_results=limit, include=["documents", "metadatas"]
+                )
+                fact_future = self._query_pool.submit(
+                    self.facts.query,
+                    query_embeddings=query_embeddings, n_results=fact_limit, include=["documents", "metadatas"]
+                )
+                conversations = SearchHits.from_query(conv_future.result())
+                facts = SearchHits.from_query(fact_future.result())
+            if mode == "hybrid":
+                with timed("memory.lexical"):
+                    conversations = self._fuse("conversations", query, conversations, limit)
+                    facts = self._fuse("facts", query, facts, fact_limit)
 
-    def get_relevant_memories(self, query: str, limit: int = 5) -> Dict[str, List[str]]:
-        conv_results = self.conversations.query(query_texts=[query], n_results=limit)
-        fact_results = self.facts.query(query_texts=[query], n_results=limit)
-        
         return {
-            "conversations": conv_results["documents"][0] if conv_results["documents"] else [],
-            "facts": fact_results["documents"][0] if fact_results["documents"] else []
+            "conversations": conversations.documents,
+            "facts": facts.documents,
+            "fact_metadatas": facts.metadatas,
+            "fact_ids": facts.ids
         }
 
-    def extract_facts_from_conversation(self, user_message: str, assistant_response: str) -> List[Dict[str, str]]:
-        facts = []
-        fact_patterns = {
-            "preference": ["i like", "i love", "i enjoy", "i prefer", "i'm fond of", "i don't like", "i hate", "i dislike"],
-            "habit": ["i usually", "i always", "i never", "i sometimes", "every day", "every week", "normally i"],
-            "personal_info": ["i am", "i'm", "my name is", "i work", "i live", "my job", "my home", "my family"],
-            "skill": ["i can", "i know how", "i'm good at", "i'm skilled in", "i'm experienced in", "i've learned"],
-            "goal": ["i want to", "i plan to", "i hope to", "i'm trying to", "my goal", "i aim to", "i wish to"],
-            "experience": ["i've been", "i have been", "i used to", "in my experience", "i remember when"]
+    def _lexical_hits(self, kind: str, query: str, limit: int) -> SearchHits:
+        ranked = [doc_id for doc_id, _ in self.lexical_indexes()[kind].search(query, limit)]
+        return self._fetch(kind, ranked, {})
+
+    def _fuse(self, kind: str, query: str, vector_hits: SearchHits, limit: int) -> SearchHits:
+        lexical_ids = [doc_id for doc_id, _ in self.lexical_indexes()[kind].search(query, limit)]
+        ranked = reciprocal_rank_fusion([vector_hits.ids, lexical_ids])[:limit]
+        known = {
+            doc_id: (document, metadata)
+            for doc_id, document, metadata in zip(vector_hits.ids, vector_hits.documents, vector_hits.metadatas)
         }
-        
-        lower_msg = user_message.lower()
-        for category, patterns in fact_patterns.items():
-            for pattern in patterns:
-                if pattern in lower_msg:
-                    sentences = user_message.split('.')
-                    for sentence in sentences:
-                        if pattern.lower() in sentence.lower():
-                            facts.append({
-                                "content": sentence.strip(),
-                                "category": category,
-                                "source": "user_message",
-                                "confidence": "high" if pattern in ["i am", "i'm", "my name is"] else "medium",
-                                "timestamp": datetime.now().isoformat()
-                            })
-        
-        confirmation_patterns = ["you mentioned that", "you said", "as you told me", "based on what you said", "you indicated"]
-        lower_resp = assistant_response.lower()
-        
-        for pattern in confirmation_patterns:
-            if pattern in lower_resp:
-                sentences = assistant_response.split('.')
-                for sentence in sentences:
-                    if pattern in sentence.lower():
-                        facts.append({
-                            "content": sentence.strip(),
-                            "category": "confirmation",
-                            "source": "assistant_response",
-                            "confidence": "medium",
-                            "timestamp": datetime.now().isoformat()
-                        })
-        
-        return facts
+        return self._fetch(kind, ranked, known)
+
+    def _fetch(self, kind: str, ranked: List[str], known: Dict[str, Tuple[str, Dict[str, Any]]]) -> SearchHits:
+        missing = [doc_id for doc_id in ranked if doc_id not in known]
+        if missing:
+            results = self._collections[kind].get(ids=missing, include=["documents", "metadatas"])
+            for doc_id, document, metadata in zip(results["ids"], results["documents"], results["metadatas"]):
+                known[doc_id] = (document, metadata)
+        hits = SearchHits([], [], [])
+        for doc_id in ranked:
+            if doc_id in known:
+                hits.ids.append(doc_id)
+                hits.documents.append(known[doc_id][0])
+                hits.metadatas.append(known[doc_id][1])
+        return hits
+
+    def _note_retrieved(self, ids: List[str]) -> None:
+        # Counted in memory and written back in batches, so a query never waits on a write.
+        with self._write_lock:
+            for doc_id in ids:
+                self._retrieved[doc_id] = self._retrieved.get(doc_id, 0) + 1
+
+    def flush_retrievals(self) -> int:
+        with self._write_lock:
+            pending, self._retrieved = self._retrieved, {}
+            if not pending:
+                return 0
+            existing = self.facts.get(ids=list(pending), include=["metadatas"])
+            if existing["ids"]:
+                self.facts.update(
+                    ids=existing["ids"],
+                    metadatas=[
+                        {**metadata, "retrieved": metadata.get("retrieved", 0) + pending[doc_id]}
+                        for doc_id, metadata in zip(existing["ids"], existing["metadatas"])
+                    ]
+                )
+            return len(existing["ids"])
+
+    def backfill_legacy_metadata(self, page_size: int = 200) -> int:
+        """Adds the fields retention filters on to rows stored before they existed.
+
+        A row missing a field never matches a filter on it, so without this older memories are never compacted.
+        Rows whose age cannot be recovered are dated from now.
+        """
+        now = datetime.now().timestamp()
+
+        def fill_conversation(metadata: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            if "ts" in metadata:
+                return None
+            return {**metadata, "ts": first_seen_timestamp(metadata, now)}
 
-    def get_context_for_prompt(self, current_message: str) -> str:
-        memories = self.get_relevant_memories(current_message, limit=3)  # Reduced from 5 to 3
+        def fill_fact(metadata: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            if "ts" in metadata and "last_seen_ts" in metadata and "retrieved" in metadata:
+                return None
+            filled = {"retrieved": 0, **metadata, "ts": first_seen_timestamp(metadata, now)}
+            filled["last_seen_ts"] = last_seen_timestamp(filled)
+            return filled
+
+        return self._backfill("conversations", fill_conversation, page_size) + self._backfill("facts", fill_fact, page_size)
+
+    def _backfill(
+        self,
+        name: str,
+        fill: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]],
+        page_size: int
+    ) -> int:
+        collection = self.open()[name]
+        updated = 0
+        offset = 0
+        while True:
+            with self._write_lock:
+                page = collection.get(limit=page_size, offset=offset, include=["metadatas"])
+                filled = [(doc_id, fill(metadata)) for doc_id, metadata in zip(page["ids"], page["metadatas"])]
+                missing = [(doc_id, metadata) for doc_id, metadata in filled if metadata is not None]
+                if missing:
+                    collection.update(ids=[doc_id for doc_id, _ in missing], metadatas=[metadata for _, metadata in missing])
+            updated += len(missing)
+            if len(page["ids"]) < page_size:
+                return updated
+            offset += page_size
+
+    def get_facts_page(
+        self,
+        category: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: int = 50,
+        offset: int = 0
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Returns one page of facts and the offset of the next page, if any."""
+        clauses: List[Dict[str, Any]] = []
+        if category:
+            clauses.append({"category": category})
+        if since is not None:
+            clauses.append({"ts": {"$gte": since}})
+        if until is not None:
+            clauses.append({"ts": {"$lt": until}})
+        where = clauses[0] if len(clauses) == 1 else {"$and": clauses} if clauses else None
+
+        # One extra row tells us whether another page exists without a count().
+        results = self.facts.get(where=where, limit=limit + 1, offset=offset, include=["documents", "metadatas"])
+        items = [
+            {"id": doc_id, "content": document, **metadata}
+            for doc_id, document, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+        ]
+        next_offset = offset + limit if len(items) > limit else None
+        return items[:limit], next_offset
+
+    def get_recent_conversations(self, limit: int = 10) -> List[Dict[str, Any]]:
+        # Chroma returns rows in insertion order, so the newest ones are at the end.
+        offset = max(self.conversations.count() - limit, 0)
+        results = self.conversations.get(limit=limit, offset=offset, include=["documents", "metadatas"])
+        return [
+            {"id": doc_id, "content": document, **metadata}
+            for doc_id, document, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+        ]
+
+    def extract_facts_from_conversation(self, user_message: str, assistant_response: str) -> List[Dict[str, str]]:
+        return extract_facts(user_message, assistant_response)
+
+    def get_context_for_prompt(self, current_message: str, limit: int = 3) -> str:
+        return "\n".join(self.get_context_snippets(current_message, limit))
+
+    def get_context_snippets(self, current_message: str, limit: int = 3) -> List[str]:
+        # Chroma evaluates a `where` filter by scanning every matching vector,
+        # so over-fetching and filtering on the returned metadata is far cheaper.
+        memories = self.get_relevant_memories(
+            current_message, limit=limit, fact_limit=limit * self.FACT_OVERSAMPLE
+        )
+        fact_ids = memories.get("fact_ids", [])
         context_parts = []
-        
-        relevant_facts = []
-        for fact in memories["facts"]:
-            metadata = self.facts.get(where={"document": fact})
-            if metadata and metadata["metadatas"]:
-                confidence = metadata["metadatas"][0].get("confidence", "medium")
-                if confidence == "high":
-                    relevant_facts.append(fact)
-        
-        if relevant_facts:
-            context_parts.extend(relevant_facts)
+        used_ids: List[str] = []
+        for index, (fact, metadata) in enumerate(zip(memories["facts"], memories["fact_metadatas"])):
+            if metadata and metadata.get("confidence") == "high" and len(context_parts) < limit:
+                context_parts.append(fact)
+                used_ids.extend(fact_ids[index:index + 1])
+        # Only facts that reach the prompt count as used; the oversampled rest stay eligible for compaction.
+        self._note_retrieved(used_ids)
         
         if memories["conversations"]:
             most_relevant = memories["conversations"][0]
             if most_relevant and len(most_relevant.strip()) > 0:
                 context_parts.append(most_relevant)
         
-        return "\n".join(context_parts) if context_parts else ""
\ No newline at end of file
+        return context_parts
@@ -0,0 +1,233 @@
+import bisect
+import contextvars
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Prometheus text exposition is simple enough that a client library isn't worth the dependency.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # Per label set: bucket counts (non-cumulative), sum, count.
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0, 0])
+            series[0][index] += 1
+            series[1][0] += value
+            series[1][1] += 1
+
+    def snapshot(self, *labels: str) -> Tuple[float, int]:
+        with self._lock:
+            series = self._series.get(labels)
+            return (series[1][0], int(series[1][1])) if series else (0.0, 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, list(counts), list(totals)) for labels, (counts, totals) in self._series.items())
+        for labels, counts, (total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {int(count)}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+STAGE_SECONDS = Histogram("chat_stage_seconds", "Time spent in each stage of a chat turn.", ["stage"])
+REQUEST_SECONDS = Histogram("chat_request_seconds", "End-to-end chat request latency.", ["endpoint"])
+TTFT_SECONDS = Histogram("chat_time_to_first_token_seconds", "Time from request start to the first model token.", ["endpoint"])
+LLM_EVAL_TOKENS = Histogram("ollama_eval_tokens", "Tokens generated per response (eval_count).", buckets=TOKEN_BUCKETS)
+LLM_PROMPT_EVAL_TOKENS = Histogram("ollama_prompt_eval_tokens", "Prompt tokens evaluated per response (prompt_eval_count).", buckets=TOKEN_BUCKETS)
+LLM_EVAL_SECONDS = Histogram("ollama_eval_seconds", "Generation time reported by Ollama (eval_duration).")
+LLM_TOKENS_PER_SECOND = Histogram("ollama_tokens_per_second", "Generation speed, eval_count / eval_duration.", buckets=RATE_BUCKETS)
+REQUESTS = Counter("chat_requests_total", "Chat requests by endpoint and outcome.", ["endpoint", "outcome"])
+
+METRICS: List[Any] = [
+    STAGE_SECONDS, REQUEST_SECONDS, TTFT_SECONDS,
+    LLM_EVAL_TOKENS, LLM_PROMPT_EVAL_TOKENS, LLM_EVAL_SECONDS, LLM_TOKENS_PER_SECOND,
+    REQUESTS
+]
+
+
+class RequestTimings:
+    """Per-request breakdown, filled in by whatever stages run while it is current."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.ttft: Optional[float] = None
+        self.generation: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def as_dict(self) -> Dict[str, Any]:
+        breakdown: Dict[str, Any] = {stage: round(seconds * 1000, 2) for stage, seconds in self.stages.items()}
+        if self.ttft is not None:
+            breakdown["ttft"] = round(self.ttft * 1000, 2)
+        breakdown["total"] = round(self.elapsed() * 1000, 2)
+        return {"ms": breakdown, **self.generation}
+
+    def server_timing(self) -> str:
+        entries = [f"{stage.replace('.', '-')};dur={seconds * 1000:.2f}" for stage, seconds in self.stages.items()]
+        if self.ttft is not None:
+            entries.append(f"ttft;dur={self.ttft * 1000:.2f}")
+        entries.append(f"total;dur={self.elapsed() * 1000:.2f}")
+        return ", ".join(entries)
+
+
+_current: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar("request_timings", default=None)
+
+
+def start_request() -> RequestTimings:
+    timings = RequestTimings()
+    _current.set(timings)
+    return timings
+
+
+def bind_request(timings: RequestTimings) -> None:
+    # Streaming bodies run in their own task; this carries the request's timings into it.
+    _current.set(timings)
+
+
+def current_request() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+class timed:
+    """Times a block into the stage histogram and the current request, if there is one."""
+
+    __slots__ = ("stage", "_started")
+
+    def __init__(self, stage: str) -> None:
+        self.stage = stage
+
+    def __enter__(self) -> "timed":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        record_stage(self.stage, time.perf_counter() - self._started)
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage)
+    timings = _current.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+def record_first_token(endpoint: str) -> None:
+    timings = _current.get()
+    if timings is not None and timings.ttft is None:
+        timings.ttft = timings.elapsed()
+        TTFT_SECONDS.observe(timings.ttft, endpoint)
+
+
+def record_generation(final: Dict[str, Any]) -> None:
+    """Feeds the counters from Ollama's closing NDJSON line (durations are nanoseconds)."""
+    eval_count = final.get("eval_count")
+    eval_duration = final.get("eval_duration")
+    prompt_eval_count = final.get("prompt_eval_count")
+    generation: Dict[str, float] = {}
+    if prompt_eval_count is not None:
+        LLM_PROMPT_EVAL_TOKENS.observe(prompt_eval_count)
+        generation["prompt_eval_count"] = prompt_eval_count
+    if eval_count is not None:
+        LLM_EVAL_TOKENS.observe(eval_count)
+        generation["eval_count"] = eval_count
+    if eval_duration:
+        LLM_EVAL_SECONDS.observe(eval_duration / 1e9)
+        generation["eval_ms"] = round(eval_duration / 1e6, 2)
+        if eval_count:
+            tokens_per_second = eval_count / (eval_duration / 1e9)
+            LLM_TOKENS_PER_SECOND.observe(tokens_per_second)
+            generation["tokens_per_second"] = round(tokens_per_second, 2)
+    timings = _current.get()
+    if timings is not None:
+        timings.generation.update(generation)
+
+
+def finish_request(endpoint: str, outcome: str, timings: RequestTimings) -> None:
+    REQUEST_SECONDS.observe(timings.elapsed(), endpoint)
+    REQUESTS.inc(endpoint, outcome)
+
+
+def render(extra: Sequence[Any] = ()) -> str:
+    lines: List[str] = []
+    for metric in [*METRICS, *extra]:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
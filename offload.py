@@ -0,0 +1,125 @@
+import asyncio
+import contextvars
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from memory_manager import MemoryManager
+from prompt_builder import Prompt, PromptBuilder
+from storage import Storage
+
+logger = logging.getLogger(__name__)
+
+
+class BlockingPool:
+    """Runs blocking calls on a sized thread pool so the event loop keeps serving other requests.
+
+    A timed-out or cancelled call stops being awaited; if its thread had already
+    started it runs to completion, otherwise it never starts.
+    """
+
+    def __init__(self, max_workers: int = 8, timeout: Optional[float] = 15.0) -> None:
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="blocking-io")
+        self.in_flight = 0
+        self.completed = 0
+        self.timeouts = 0
+
+    async def run(self, function: Callable[..., Any], *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        # Copying the context keeps per-request metrics working inside the worker thread.
+        context = contextvars.copy_context()
+        call = functools.partial(context.run, function, *args, **kwargs)
+        future = asyncio.get_running_loop().run_in_executor(self.executor, call)
+        limit = timeout if timeout is not None else self.timeout
+        if limit == float("inf"):
+            limit = None
+        self.in_flight += 1
+        try:
+            result = await asyncio.wait_for(future, limit)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            logger.warning("%s timed out after %.1fs", getattr(function, "__qualname__", function), limit)
+            raise
+        finally:
+            self.in_flight -= 1
+        self.completed += 1
+        return result
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "max_workers": self.max_workers,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "timeouts": self.timeouts
+        }
+
+
+class AsyncMemoryManager:
+    def __init__(self, memory_manager: MemoryManager, pool: BlockingPool) -> None:
+        self.memory_manager = memory_manager
+        self.pool = pool
+
+    async def get_context_snippets(self, current_message: str, limit: int = 3, timeout: Optional[float] = None) -> List[str]:
+        return await self.pool.run(self.memory_manager.get_context_snippets, current_message, limit, timeout=timeout)
+
+    async def embed(self, texts: List[str]) -> List[Any]:
+        return await self.pool.run(self.memory_manager.embed, texts)
+
+    async def get_facts_page(self, **filters: Any) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        return await self.pool.run(self.memory_manager.get_facts_page, **filters)
+
+    async def get_recent_conversations(self, limit: int = 10) -> List[Dict[str, Any]]:
+        return await self.pool.run(self.memory_manager.get_recent_conversations, limit)
+
+    async def flush(self) -> None:
+        await self.pool.run(self.memory_manager.flush)
+
+    async def close(self) -> None:
+        await self.pool.run(self.memory_manager.close)
+
+    async def warm_up(self) -> None:
+        # Loading the model can take far longer than a request, so no timeout here.
+        await self.pool.run(self.memory_manager.warm_up, timeout=float("inf"))
+
+
+class AsyncStorage:
+    def __init__(self, storage: Storage, pool: BlockingPool) -> None:
+        self.storage = storage
+        self.pool = pool
+
+    async def load_profile(self) -> Dict[str, Any]:
+        return await self.pool.run(self.storage.load_profile)
+
+    async def save_profile(self, profile_data: Dict[str, Any]) -> None:
+        await self.pool.run(self.storage.save_profile, profile_data)
+
+    async def get_context_for_prompt(self) -> str:
+        return await self.pool.run(self.storage.get_context_for_prompt)
+
+
+class AsyncPromptBuilder:
+    """Prompt assembly reads the profile file and, with the SQLite backend, the history database."""
+
+    def __init__(self, prompt_builder: PromptBuilder, pool: BlockingPool) -> None:
+        self.prompt_builder = prompt_builder
+        self.pool = pool
+
+    async def build(self, session_id: str, message: str, memory_context: Union[str, List[str]]) -> Prompt:
+        return await self.pool.run(self.prompt_builder.build, session_id, message, memory_context)
+
+    async def add_message(self, session_id: str, role: str, content: str) -> None:
+        await self.pool.run(self.prompt_builder.add_message, session_id, role, content)
+
+    async def history_text(self, session_id: str) -> str:
+        return await self.pool.run(self.prompt_builder.history_text, session_id)
+
+    async def system_message(self) -> str:
+        return await self.pool.run(self.prompt_builder.system_message)
+
+    async def get_messages(self, session_id: str) -> List[Dict[str, Any]]:
+        return await self.pool.run(self.prompt_builder.history.get_messages, session_id)
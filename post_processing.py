@@ -0,0 +1,124 @@
+import asyncio
+import logging
+from typing import Any, List, Optional
+
+from metrics import timed
+
+logger = logging.getLogger(__name__)
+
+
+class PostProcessingJob:
+    def __init__(self, session_id: str, user_message: str, assistant_response: str) -> None:
+        self.session_id = session_id
+        self.user_message = user_message
+        self.assistant_response = assistant_response
+        self.conversation_saved = False
+
+
+class PostProcessor:
+    def __init__(
+        self,
+        memory_manager: Any,
+        max_queue_size: int = 100,
+        batch_size: int = 8,
+        max_retries: int = 3,
+        retry_delay: float = 0.5,
+        workers: int = 1
+    ) -> None:
+        self.memory_manager = memory_manager
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.worker_count = workers
+        self.processed = 0
+        self.dropped = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+
+    def _ensure_running(self) -> asyncio.Queue:
+        if self._loop is not asyncio.get_running_loop() or not self._workers:
+            self.start()
+        return self._queue
+
+    async def submit(self, session_id: str, user_message: str, assistant_response: str) -> None:
+        # Blocks when the queue is full, which throttles producers instead of
+        # letting unprocessed exchanges pile up in memory.
+        queue = self._ensure_running()
+        await queue.put(PostProcessingJob(session_id, user_message, assistant_response))
+
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        if self._queue is None or self._loop is not asyncio.get_running_loop():
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Post-processing drain timed out with %d jobs pending", self._queue.qsize())
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _worker(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._process_with_retry(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _next_batch(self) -> List[PostProcessingJob]:
+        batch = [await self._queue.get()]
+        while len(batch) < self.batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _process_with_retry(self, batch: List[PostProcessingJob]) -> None:
+        pending = batch
+        for attempt in range(self.max_retries + 1):
+            pending = await asyncio.to_thread(self._process_jobs, pending)
+            if not pending:
+                break
+            if attempt < self.max_retries:
+                await asyncio.sleep(self.retry_delay * 2 ** attempt)
+
+        self.processed += len(batch) - len(pending)
+        if pending:
+            self.dropped += len(pending)
+            logger.error("Dropped %d post-processing jobs after %d retries", len(pending), self.max_retries)
+
+    def _process_jobs(self, jobs: List[PostProcessingJob]) -> List[PostProcessingJob]:
+        try:
+            with timed("post_processing.write"):
+                self._write_batch(jobs)
+        except Exception:
+            logger.exception("Post-processing failed for a batch of %d jobs", len(jobs))
+            return jobs
+        return []
+
+    def _write_batch(self, jobs: List[PostProcessingJob]) -> None:
+        unsaved = [job for job in jobs if not job.conversation_saved]
+        if unsaved:
+            self.memory_manager.add_conversations([
+                (job.session_id, job.user_message, job.assistant_response) for job in unsaved
+            ])
+            self.memory_manager.flush()
+            for job in unsaved:
+                job.conversation_saved = True
+
+        facts = []
+        for job in jobs:
+            facts.extend(self.memory_manager.extract_facts_from_conversation(job.user_message, job.assistant_response))
+        if facts:
+            self.memory_manager.add_facts(facts)
+        self.memory_manager.flush()
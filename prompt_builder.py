@@ -0,0 +1,215 @@
+import threading
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple, Union
+
+from context_packer import ContextPacker, estimate_tokens, history_snippets, ranked_snippets
+from conversation import ConversationHistory, Message
+from lexical_index import tokenize
+from storage import Storage
+
+SYSTEM_PROMPT = (
+    "You are my personal AI assistant. Focus on responding directly to the current message "
+    "while keeping relevant context in mind. Be concise and natural in your responses."
+)
+
+REMINDERS = """Remember:
+- Respond directly to the current message
+- Only reference previous context if directly relevant
+- Keep responses concise and natural
+- Don't list out everything you know about me
+- If you learn new information, update your understanding without mentioning it"""
+
+HISTORY_HEADER = "Recent conversation:"
+
+# The chat API layout puts everything static first, so Ollama can reuse the
+# evaluated prefix across turns; only the last user message carries volatile context.
+CHAT_SYSTEM_PROMPT = f"{SYSTEM_PROMPT}\n\n{REMINDERS}"
+
+# The static text between the variable sections, split once at import time.
+_PREFIX = f"{SYSTEM_PROMPT}\n\nRecent Context:\n"
+_BEFORE_MEMORY = "\n\nRelevant Background:\n"
+_BEFORE_PROFILE = "\n\nProfile Info:\n"
+_BEFORE_MESSAGE = "\n\nCurrent message: "
+_SUFFIX = f"\n\n{REMINDERS}"
+
+
+def role_label(role: str) -> str:
+    return "You" if role == "user" else "Assistant"
+
+
+def render_message(message: Message) -> str:
+    return f"{role_label(message.role)}: {message.content}"
+
+
+def chat_system_message(profile: str) -> str:
+    return f"{CHAT_SYSTEM_PROMPT}\n\n{profile}" if profile else CHAT_SYSTEM_PROMPT
+
+
+def chat_messages(
+    history: List[Tuple[str, str]],
+    memory: str,
+    profile: str,
+    message: str
+) -> List[Dict[str, str]]:
+    messages = [{"role": "system", "content": chat_system_message(profile)}]
+    for role, content in history:
+        messages.append({"role": "user" if role == "user" else "assistant", "content": content})
+    user = f"Relevant Background:\n{memory}\n\nCurrent message: {message}" if memory else message
+    messages.append({"role": "user", "content": user})
+    return messages
+
+
+class Prompt:
+    def __init__(
+        self,
+        text: str,
+        sections: Dict[str, int],
+        tokens: Optional[Dict[str, int]] = None,
+        dropped: int = 0,
+        truncated: int = 0,
+        messages: Optional[List[Dict[str, str]]] = None
+    ) -> None:
+        self.text = text
+        self.messages = messages or []
+        self.sections = sections
+        self.tokens = tokens or {}
+        self.dropped = dropped
+        self.truncated = truncated
+
+
+class RenderedHistory:
+    __slots__ = ("messages", "lines", "version", "_text")
+
+    def __init__(self, messages: Deque[Message], lines: Deque[str], version: Optional[int]) -> None:
+        self.messages = messages
+        self.lines = lines
+        self.version = version
+        self._text: Optional[str] = None
+
+    def append(self, message: Message, version: Optional[int]) -> None:
+        self.messages.append(message)
+        self.lines.append(render_message(message))
+        self.version = version
+        self._text = None
+
+    def text(self) -> str:
+        if self._text is None:
+            self._text = "\n".join([HISTORY_HEADER, *self.lines]) if self.lines else ""
+        return self._text
+
+
+class PromptBuilder:
+    def __init__(
+        self,
+        history: ConversationHistory,
+        storage: Storage,
+        max_messages: int = 5,
+        max_cached_sessions: int = 10000,
+        packer: Optional[ContextPacker] = None
+    ) -> None:
+        self.history = history
+        self.storage = storage
+        self.packer = packer
+        self.max_messages = max_messages
+        self.max_cached_sessions = max_cached_sessions
+        self._rendered: "OrderedDict[str, RenderedHistory]" = OrderedDict()
+        # Guards the rendered-history cache; history reads themselves happen outside it.
+        self._lock = threading.RLock()
+
+    def add_message(self, session_id: str, role: str, content: str) -> None:
+        with self._lock:
+            before = self.history.version(session_id)
+            self.history.add_message(session_id, role, content)
+            rendered = self._rendered.get(session_id)
+            if rendered is not None and before is not None and rendered.version == before:
+                rendered.append(Message(role, content), self.history.version(session_id))
+            else:
+                self._rendered.pop(session_id, None)
+
+    def system_message(self) -> str:
+        return chat_system_message(self.storage.get_context_for_prompt())
+
+    def history_text(self, session_id: str) -> str:
+        rendered = self._rendered_history(session_id)
+        with self._lock:
+            return rendered.text()
+
+    def _rendered_history(self, session_id: str) -> RenderedHistory:
+        with self._lock:
+            version = self.history.version(session_id)
+            rendered = self._rendered.get(session_id)
+            if rendered is not None and version is not None and rendered.version == version:
+                self._rendered.move_to_end(session_id)
+                return rendered
+
+        messages = self.history.recent_messages(session_id, self.max_messages)
+        rendered = RenderedHistory(
+            deque(messages, maxlen=self.max_messages),
+            deque((render_message(m) for m in messages), maxlen=self.max_messages),
+            version
+        )
+        if version is not None:
+            with self._lock:
+                # A write that landed during the read bumped the version; keep the newer entry.
+                if self.history.version(session_id) == version:
+                    self._rendered[session_id] = rendered
+                    self._rendered.move_to_end(session_id)
+                    while len(self._rendered) > self.max_cached_sessions:
+                        self._rendered.popitem(last=False)
+        return rendered
+
+    def build(self, session_id: str, message: str, memory_context: Union[str, List[str]]) -> Prompt:
+        rendered = self._rendered_history(session_id)
+        with self._lock:
+            history = rendered.text()
+            recent = list(rendered.messages)
+            lines = list(rendered.lines)
+        profile = self.storage.get_context_for_prompt()
+        memories = [memory_context] if isinstance(memory_context, str) else list(memory_context)
+        memories = [memory for memory in memories if memory]
+        memory = "\n".join(memories)
+        history_turns = [(m.role, m.content) for m in recent]
+
+        dropped = truncated = 0
+        context_tokens = estimate_tokens(history) + estimate_tokens(memory) + estimate_tokens(profile)
+        if self.packer is not None and context_tokens > self.packer.budget:
+            packed = self.packer.pack(
+                history_snippets(lines, set(tokenize(message)))
+                + ranked_snippets("memory", memories)
+                + ranked_snippets("profile", [profile] if profile else [], recency=1.0),
+                budget=self.packer.budget - estimate_tokens(HISTORY_HEADER) - 1
+            )
+            history_lines = packed.sections.get("history")
+            history = "\n".join([HISTORY_HEADER, *history_lines]) if history_lines else ""
+            history_turns = []
+            for position, line in zip(packed.positions.get("history", []), history_lines or []):
+                role = recent[position].role
+                history_turns.append((role, line[len(role_label(role)) + 2:]))
+            memory = "\n".join(packed.sections.get("memory", []))
+            profile = "\n".join(packed.sections.get("profile", []))
+            dropped, truncated = packed.dropped, packed.truncated
+
+        parts: List[str] = [
+            _PREFIX, history,
+            _BEFORE_MEMORY, memory,
+            _BEFORE_PROFILE, profile,
+            _BEFORE_MESSAGE, message,
+            _SUFFIX
+        ]
+        system = _PREFIX + _BEFORE_MEMORY + _BEFORE_PROFILE + _BEFORE_MESSAGE + _SUFFIX
+        sections = {
+            "system": len(system),
+            "history": len(history),
+            "memory": len(memory),
+            "profile": len(profile),
+            "message": len(message)
+        }
+        tokens = {
+            "system": estimate_tokens(system),
+            "history": estimate_tokens(history),
+            "memory": estimate_tokens(memory),
+            "profile": estimate_tokens(profile),
+            "message": estimate_tokens(message)
+        }
+        messages = chat_messages(history_turns, memory, profile, message)
+        return Prompt("".join(parts), sections, tokens, dropped, truncated, messages)
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+
+def digest(*parts: str) -> str:
+    hasher = hashlib.sha256()
+    for part in parts:
+        hasher.update(part.encode("utf-8"))
+        hasher.update(b"\0")
+    return hasher.hexdigest()
+
+
+class CacheKey:
+    """Identifies a reply: the exact prompt, plus what a paraphrase must share to reuse it."""
+
+    __slots__ = ("prompt", "fingerprint", "vector")
+
+    def __init__(self, prompt: str, fingerprint: str, vector: Optional[np.ndarray] = None) -> None:
+        self.prompt = prompt
+        self.fingerprint = fingerprint
+        self.vector = vector
+
+
+class CachedResponse:
+    __slots__ = ("text", "fingerprint", "vector", "expires_at")
+
+    def __init__(self, text: str, fingerprint: str, vector: Optional[np.ndarray], expires_at: float) -> None:
+        self.text = text
+        self.fingerprint = fingerprint
+        self.vector = vector
+        self.expires_at = expires_at
+
+
+def make_key(
+    prompt_text: str,
+    messages: List[Dict[str, str]],
+    profile: str,
+    memory: List[str],
+    history: str,
+    vector: Optional[np.ndarray] = None
+) -> CacheKey:
+    exact = digest(prompt_text, json.dumps(messages, sort_keys=True))
+    fingerprint = digest(profile, *memory, history)
+    if vector is not None:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        vector = vector / norm if norm else None
+    return CacheKey(exact, fingerprint, vector)
+
+
+class ResponseCache:
+    """LRU of finished replies keyed by prompt hash, with an optional embedding-distance tier."""
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl: float = 3600,
+        semantic_distance: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.semantic_distance = semantic_distance
+        self.clock = clock
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        # Paraphrase candidates are only compared within the same profile and context.
+        self._by_fingerprint: Dict[str, List[str]] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @property
+    def semantic(self) -> bool:
+        return self.enabled and self.semantic_distance is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, endpoint: str, key: CacheKey) -> Optional[str]:
+        if not self.enabled:
+            return None
+        counters = self._counters.setdefault(endpoint, {"hits": 0, "semantic_hits": 0, "misses": 0})
+        entry = self._live(key.prompt)
+        if entry is not None:
+            counters["hits"] += 1
+            return entry.text
+        if self.semantic and key.vector is not None:
+            match = self._closest(key)
+            if match is not None:
+                counters["semantic_hits"] += 1
+                return match.text
+        counters["misses"] += 1
+        return None
+
+    def put(self, key: CacheKey, text: str) -> None:
+        if not self.enabled or not text:
+            return
+        self._discard(key.prompt)
+        self._entries[key.prompt] = CachedResponse(text, key.fingerprint, key.vector, self.clock() + self.ttl)
+        self._by_fingerprint.setdefault(key.fingerprint, []).append(key.prompt)
+        while len(self._entries) > self.max_entries:
+            self._discard(next(iter(self._entries)))
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._by_fingerprint.clear()
+
+    def _live(self, prompt: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(prompt)
+        if entry is None:
+            return None
+        if entry.expires_at <= self.clock():
+            self._discard(prompt)
+            return None
+        self._entries.move_to_end(prompt)
+        return entry
+
+    def _closest(self, key: CacheKey) -> Optional[CachedResponse]:
+        best_prompt = None
+        best_distance = self.semantic_distance
+        for prompt in list(self._by_fingerprint.get(key.fingerprint, ())):
+            entry = self._live(prompt)
+            if entry is None or entry.vector is None:
+                continue
+            distance = 1.0 - float(np.dot(entry.vector, key.vector))
+            if distance <= best_distance:
+                best_prompt, best_distance = prompt, distance
+        return self._entries[best_prompt] if best_prompt is not None else None
+
+    def _discard(self, prompt: str) -> None:
+        entry = self._entries.pop(prompt, None)
+        if entry is None:
+            return
+        siblings = self._by_fingerprint.get(entry.fingerprint)
+        if siblings is not None:
+            siblings.remove(prompt)
+            if not siblings:
+                del self._by_fingerprint[entry.fingerprint]
+
+    def stats(self) -> Dict[str, Any]:
+        endpoints = {}
+        for endpoint, counters in self._counters.items():
+            lookups = counters["hits"] + counters["semantic_hits"] + counters["misses"]
+            hit_rate = (counters["hits"] + counters["semantic_hits"]) / lookups if lookups else 0.0
+            endpoints[endpoint] = {**counters, "hit_rate": round(hit_rate, 4)}
+        return {
+            "entries": len(self._entries),
+            "evictions": self.evictions,
+            "endpoints": endpoints
+        }
@@ -0,0 +1,128 @@
+import asyncio
+import statistics
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Ticket:
+    __slots__ = ("session_id", "future", "enqueued_at", "granted", "released")
+
+    def __init__(self, session_id: str, future: asyncio.Future, enqueued_at: float) -> None:
+        self.session_id = session_id
+        self.future = future
+        self.enqueued_at = enqueued_at
+        self.granted = False
+        self.released = False
+
+
+class FairScheduler:
+    """Admits at most max_in_flight LLM calls, serving waiting sessions round-robin."""
+
+    def __init__(
+        self,
+        max_in_flight: int = 2,
+        max_queue: int = 64,
+        max_queue_per_session: int = 4,
+        clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_queue_per_session = max_queue_per_session
+        self.clock = clock
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._queues: "OrderedDict[str, Deque[Ticket]]" = OrderedDict()
+        self._waits: Deque[float] = deque(maxlen=1000)
+
+    def enqueue(self, session_id: str) -> Ticket:
+        ticket = Ticket(session_id, asyncio.get_running_loop().create_future(), self.clock())
+        if self.in_flight < self.max_in_flight and not self._queues:
+            self._grant(ticket)
+            return ticket
+
+        waiting = self._queues.get(session_id)
+        if self.queued >= self.max_queue or (waiting is not None and len(waiting) >= self.max_queue_per_session):
+            self.rejected += 1
+            raise QueueFull(session_id)
+        self._queues.setdefault(session_id, deque()).append(ticket)
+        self.queued += 1
+        return ticket
+
+    async def acquire(self, ticket: Ticket) -> None:
+        await asyncio.shield(ticket.future)
+
+    async def wait(self, ticket: Ticket, timeout: float) -> bool:
+        await asyncio.wait({ticket.future}, timeout=timeout)
+        return ticket.granted
+
+    def position(self, ticket: Ticket) -> int:
+        """1-based place in line, counting the round-robin turns of the other sessions."""
+        if ticket.granted:
+            return 0
+        own = self._queues.get(ticket.session_id)
+        if own is None or ticket not in own:
+            return 0
+        rounds = own.index(ticket)
+        ahead = 0
+        before_own = True
+        for session_id, waiting in self._queues.items():
+            if session_id == ticket.session_id:
+                before_own = False
+                continue
+            ahead += min(len(waiting), rounds + 1 if before_own else rounds)
+        return ahead + rounds + 1
+
+    def release(self, ticket: Ticket) -> None:
+        if ticket.released:
+            return
+        ticket.released = True
+        if ticket.granted:
+            self.in_flight -= 1
+        else:
+            waiting = self._queues.get(ticket.session_id)
+            if waiting is not None and ticket in waiting:
+                waiting.remove(ticket)
+                self.queued -= 1
+                if not waiting:
+                    del self._queues[ticket.session_id]
+            ticket.future.cancel()
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self.in_flight < self.max_in_flight and self._queues:
+            session_id, waiting = next(iter(self._queues.items()))
+            ticket = waiting.popleft()
+            self.queued -= 1
+            if waiting:
+                self._queues.move_to_end(session_id)
+            else:
+                del self._queues[session_id]
+            self._grant(ticket)
+
+    def _grant(self, ticket: Ticket) -> None:
+        ticket.granted = True
+        self.in_flight += 1
+        self.admitted += 1
+        self._waits.append(self.clock() - ticket.enqueued_at)
+        ticket.future.set_result(None)
+
+    def stats(self) -> Dict[str, float]:
+        waits = sorted(self._waits)
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": self.queued,
+            "sessions_waiting": len(self._queues),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "wait_ms_p50": round(statistics.median(waits) * 1000, 2) if waits else 0.0,
+            "wait_ms_p95": round(waits[min(int(len(waits) * 0.95), len(waits) - 1)] * 1000, 2) if waits else 0.0,
+            "wait_ms_max": round(waits[-1] * 1000, 2) if waits else 0.0
+        }
@@ -1,30 +1,86 @@
 import json
 import os
+import tempfile
+import threading
+import time
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
+
+from metrics import timed
 
 class Storage:
-    def __init__(self, data_dir: str = "data") -> None:
+    def __init__(self, data_dir: str = "data", revalidate_interval: float = 1.0) -> None:
         self.data_dir = data_dir
         os.makedirs(data_dir, exist_ok=True)
         self.profile_path = os.path.join(data_dir, "profile.json")
+        self.revalidate_interval = revalidate_interval
+        self._lock = threading.Lock()
+        self._profile: Optional[Dict[str, Any]] = None
+        self._context: Optional[str] = None
+        self._signature: Optional[Tuple[int, int]] = None
+        self._checked_at = 0.0
+
+    def _file_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.profile_path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _cached_profile(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        if self._profile is not None and now - self._checked_at < self.revalidate_interval:
+            return self._profile
+
+        signature = self._file_signature()
+        self._checked_at = now
+        if self._profile is None or signature != self._signature:
+            self._profile = self._read_profile() if signature else {}
+            self._context = None
+            self._signature = signature
+        return self._profile
+
+    def _read_profile(self) -> Dict[str, Any]:
+        with open(self.profile_path, 'r') as f:
+            return json.load(f)
 
     def load_profile(self) -> Dict[str, Any]:
-        if os.path.exists(self.profile_path):
-            with open(self.profile_path, 'r') as f:
-                return json.load(f)
-        return {}
+        with self._lock:
+            return dict(self._cached_profile())
 
     def save_profile(self, profile_data: Dict[str, Any]) -> None:
-        existing_data = self.load_profile()
-        existing_data.update(profile_data)
-        existing_data["last_updated"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        with open(self.profile_path, 'w') as f:
-            json.dump(existing_data, f, indent=2)
+        with self._lock:
+            self._checked_at = 0.0
+            existing_data = dict(self._cached_profile())
+            existing_data.update(profile_data)
+            existing_data["last_updated"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+            self._write_atomic(existing_data)
+            self._profile = existing_data
+            self._context = None
+            self._signature = self._file_signature()
+            self._checked_at = time.monotonic()
+
+    def _write_atomic(self, data: Dict[str, Any]) -> None:
+        fd, temp_path = tempfile.mkstemp(dir=self.data_dir, prefix=".profile-", suffix=".json")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.profile_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
 
     def get_context_for_prompt(self) -> str:
-        profile = self.load_profile()
+        with timed("storage.profile"), self._lock:
+            profile = self._cached_profile()
+            if self._context is None:
+                self._context = self._render_context(profile)
+            return self._context
+
+    def _render_context(self, profile: Dict[str, Any]) -> str:
         if not profile:
             return ""
 
@@ -42,4 +98,4 @@ class Storage:
         if profile.get('preferences'):
             context.append(f"Preferences: {profile['preferences']}")
 
-        return "\n".join(context)
\ No newline at end of file
+        return "\n".join(context)
@@ -0,0 +1,128 @@
+import asyncio
+from typing import AsyncIterator, Dict, List, Optional
+
+# Appended to a response that stopped early, so the history shows it was cut off.
+PARTIAL_RESPONSE_MARKER = " [cancelled]"
+
+
+class StreamCancelled(Exception):
+    pass
+
+
+class TokenCoalescer:
+    """Groups streamed tokens into frames, flushed by age or size, whichever comes first."""
+
+    def __init__(self, max_delay: float = 0.05, max_bytes: int = 256) -> None:
+        self.max_delay = max_delay
+        self.max_bytes = max_bytes
+
+    async def coalesce(self, tokens: AsyncIterator[str]) -> AsyncIterator[str]:
+        if self.max_delay <= 0:
+            async for token in tokens:
+                yield token
+            return
+
+        loop = asyncio.get_running_loop()
+        iterator = tokens.__aiter__()
+        buffer: List[str] = []
+        size = 0
+        deadline = 0.0
+        pending: Optional[asyncio.Future] = None
+        try:
+            while True:
+                if pending is None:
+                    pending = asyncio.ensure_future(iterator.__anext__())
+                timeout = max(deadline - loop.time(), 0) if buffer else None
+                done, _ = await asyncio.wait({pending}, timeout=timeout)
+                if not done:
+                    # The window closed while the model was still thinking; ship what we have.
+                    yield "".join(buffer)
+                    buffer, size = [], 0
+                    continue
+
+                next_token, pending = pending, None
+                try:
+                    token = next_token.result()
+                except StopAsyncIteration:
+                    break
+                if not buffer:
+                    deadline = loop.time() + self.max_delay
+                buffer.append(token)
+                size += len(token.encode("utf-8"))
+                if size >= self.max_bytes:
+                    yield "".join(buffer)
+                    buffer, size = [], 0
+            if buffer:
+                yield "".join(buffer)
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+
+async def replay(text: str, frame_size: int = 256) -> AsyncIterator[str]:
+    """Sends an already finished reply in frames shaped like a live stream's."""
+    for start in range(0, len(text), max(frame_size, 1)):
+        yield text[start:start + frame_size]
+
+
+class StreamHandle:
+    def __init__(self, stream_id: str, session_id: str) -> None:
+        self.stream_id = stream_id
+        self.session_id = session_id
+        self._cancelled = asyncio.Event()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    async def guard(self, tokens: AsyncIterator[str]) -> AsyncIterator[str]:
+        """Passes tokens through until cancelled, then abandons the upstream read at once."""
+        iterator = tokens.__aiter__()
+        waiter = asyncio.ensure_future(self._cancelled.wait())
+        next_token: Optional[asyncio.Future] = None
+        try:
+            while True:
+                next_token = asyncio.ensure_future(iterator.__anext__())
+                await asyncio.wait({next_token, waiter}, return_when=asyncio.FIRST_COMPLETED)
+                if not next_token.done():
+                    raise StreamCancelled(self.stream_id)
+                try:
+                    token = next_token.result()
+                except StopAsyncIteration:
+                    return
+                yield token
+        finally:
+            # Cancelling the pending read unwinds the HTTP stream, closing the upstream connection.
+            if next_token is not None and not next_token.done():
+                next_token.cancel()
+            waiter.cancel()
+
+
+class StreamRegistry:
+    def __init__(self) -> None:
+        self._streams: Dict[str, StreamHandle] = {}
+        self.cancelled = 0
+        self.disconnected = 0
+
+    def __len__(self) -> int:
+        return len(self._streams)
+
+    def open(self, stream_id: str, session_id: str) -> StreamHandle:
+        handle = StreamHandle(stream_id, session_id)
+        self._streams[stream_id] = handle
+        return handle
+
+    def close(self, stream_id: str) -> None:
+        self._streams.pop(stream_id, None)
+
+    def cancel(self, stream_id: str, session_id: Optional[str]) -> bool:
+        handle = self._streams.get(stream_id)
+        # Only the session that started a stream may cancel it.
+        if handle is None or handle.session_id != session_id:
+            return False
+        handle.cancel()
+        self.cancelled += 1
+        return True
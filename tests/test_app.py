@@ -1,6 +1,14 @@
+import asyncio
+import threading
+import time
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
 from fastapi.testclient import TestClient
 import pytest
+import app as app_module
 from app import app, conversation_history
+from response_cache import ResponseCache
+from scheduler import FairScheduler
 
 @pytest.fixture
 def client():
@@ -145,4 +153,242 @@ def test_session_persistence_across_routes(client, temp_data_dir):
     history = response.context["chat_history"]
     assert len(history) > 0
     assert history[0]["role"] == "user"
-    assert history[0]["content"] == message
\ No newline at end of file
+    assert history[0]["content"] == message
+
+
+def test_cancel_unknown_stream_is_not_found(client):
+    response = client.post("/cancel", params={"stream_id": "missing"})
+    assert response.status_code == 200
+    assert response.json() == {"status": "not_found"}
+
+def test_health_live(client):
+    assert client.get("/health/live").json() == {"status": "alive"}
+
+
+@pytest.fixture
+def memory_warm_up(monkeypatch):
+    """Runs the app's lifespan with a controllable memory warm-up and nothing torn down for later tests."""
+    state = {"error": None, "release": threading.Event()}
+
+    async def warm_up():
+        if state["error"]:
+            raise RuntimeError(state["error"])
+        while not state["release"].is_set():
+            await asyncio.sleep(0.01)
+
+    monkeypatch.setattr(app_module, "MEMORY_WARM_UP", True)
+    monkeypatch.setattr(app_module, "MEMORY_WARM_UP_RETRY", 0.01)
+    monkeypatch.setattr(app_module, "LLM_WARM_UP", False)
+    monkeypatch.setattr(app_module.async_memory, "warm_up", warm_up)
+    monkeypatch.setattr(app_module.async_memory, "close", AsyncMock())
+    monkeypatch.setattr(app_module.blocking_pool, "shutdown", MagicMock())
+    monkeypatch.setattr(app_module.conversation_history, "close", MagicMock())
+    monkeypatch.setattr(app_module.llm_client, "aclose", AsyncMock())
+    return state
+
+
+def wait_for_status(client, status, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        response = client.get("/health/ready")
+        if response.json()["status"] == status or time.monotonic() > deadline:
+            return response
+        time.sleep(0.01)
+
+
+def test_ready_waits_for_memory_warm_up(memory_warm_up):
+    with TestClient(app) as started:
+        response = started.get("/health/ready")
+        assert response.status_code == 503
+        assert response.json()["status"] == "starting"
+        assert response.json()["warming_up"] == ["memory"]
+
+        memory_warm_up["release"].set()
+
+        assert wait_for_status(started, "ready").status_code == 200
+
+
+def test_failed_memory_warm_up_is_reported_and_retried(memory_warm_up):
+    memory_warm_up["error"] = "disk full"
+    memory_warm_up["release"].set()
+    with TestClient(app) as started:
+        response = wait_for_status(started, "failed")
+        assert response.status_code == 503
+        assert response.json()["error"] == "disk full"
+
+        memory_warm_up["error"] = None
+
+        response = wait_for_status(started, "ready")
+        assert response.status_code == 200
+        assert "error" not in response.json()
+
+
+@pytest.fixture
+def cached_reply(monkeypatch):
+    cache = ResponseCache(max_entries=8)
+    cache.get = MagicMock(return_value="Cached reply")
+    monkeypatch.setattr(app_module, "response_cache", cache)
+    monkeypatch.setattr(app_module.async_memory, "get_context_snippets", AsyncMock(return_value=[]))
+    submit = AsyncMock()
+    monkeypatch.setattr(app_module.post_processor, "submit", submit)
+    return submit
+
+
+def test_cached_chat_reply_is_not_ingested_again(client, cached_reply):
+    response = client.post("/chat", data={"message": "Hello"}, cookies={"session": "cached"})
+
+    assert response.json() == {"response": "Cached reply"}
+    cached_reply.assert_not_called()
+
+
+def test_cached_stream_reply_is_not_ingested_again(client, cached_reply):
+    response = client.get("/stream-chat", params={"message": "Hello"}, cookies={"session": "cached-stream"})
+
+    assert "event: done" in response.text
+    assert "Cached reply" in response.text
+    cached_reply.assert_not_called()
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    """No memory lookups, no ingestion, and a model that answers "Hello there"."""
+    async def reply(prompt):
+        for token in ("Hello", " there"):
+            yield token
+
+    monkeypatch.setattr(app_module, "stream_reply", reply)
+    monkeypatch.setattr(app_module.async_memory, "get_context_snippets", AsyncMock(return_value=[]))
+    monkeypatch.setattr(app_module.post_processor, "submit", AsyncMock())
+
+
+def use_scheduler(monkeypatch, scheduler):
+    monkeypatch.setattr(app_module, "scheduler", scheduler)
+    return scheduler
+
+
+def test_failures_after_enqueue_give_the_slot_back(client, fake_model, monkeypatch):
+    scheduler = use_scheduler(monkeypatch, FairScheduler(max_in_flight=2))
+    monkeypatch.setattr(app_module.async_prompt_builder, "add_message", AsyncMock(side_effect=asyncio.TimeoutError))
+
+    for index in range(3):
+        response = client.post("/chat", data={"message": "Hello"}, cookies={"session": f"s{index}"})
+        assert response.json()["response"].startswith("Error")
+    response = client.get("/stream-chat", params={"message": "Hello"}, cookies={"session": "stream"})
+
+    assert "event: error" in response.text
+    assert scheduler.stats()["in_flight"] == 0
+    assert scheduler.stats()["queue_depth"] == 0
+
+
+def test_full_queue_is_rejected_with_retry_after(client, fake_model, monkeypatch):
+    use_scheduler(monkeypatch, FairScheduler(max_in_flight=0, max_queue=0))
+
+    for response in (
+        client.post("/chat", data={"message": "Hello"}, cookies={"session": "busy"}),
+        client.get("/stream-chat", params={"message": "Hello"}, cookies={"session": "busy"})
+    ):
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "5"
+
+
+class OneSlotTaken(FairScheduler):
+    """Starts with its only slot busy and frees it after the first queue position is reported."""
+
+    def __init__(self):
+        super().__init__(max_in_flight=1)
+        self.in_flight = 1
+
+    async def wait(self, ticket, timeout):
+        if not ticket.granted and self.in_flight == 1:
+            self.in_flight = 0
+            self._dispatch()
+        return await super().wait(ticket, timeout)
+
+
+def test_stream_reports_queue_position_while_waiting(client, fake_model, monkeypatch):
+    scheduler = use_scheduler(monkeypatch, OneSlotTaken())
+
+    response = client.get("/stream-chat", params={"message": "Hello"}, cookies={"session": "queued"})
+
+    events = [line.split(":", 1)[1].strip() for line in response.text.splitlines() if line.startswith("event:")]
+    assert events[:2] == ["start", "queued"]
+    assert events[-1] == "done"
+    assert '"position": 1' in response.text
+    assert scheduler.stats()["in_flight"] == 0
+
+
+@pytest.fixture
+def memories(monkeypatch):
+    """Stub memory reads: one fact with a next page at offset 50, and one recent conversation."""
+    facts_page = AsyncMock(return_value=([{"content": "I like tea", "category": "preference"}], 50))
+    recent = AsyncMock(return_value=[{"content": "User: Hi\nAssistant: Hello"}])
+    monkeypatch.setattr(app_module.async_memory, "get_facts_page", facts_page)
+    monkeypatch.setattr(app_module.async_memory, "get_recent_conversations", recent)
+    return facts_page, recent
+
+
+def test_cursor_round_trips():
+    assert app_module.decode_cursor(app_module.encode_cursor(150)) == 150
+    assert app_module.decode_cursor(None) == 0
+
+
+def test_memories_api_returns_first_page_with_conversations(client, memories):
+    facts_page, recent = memories
+
+    response = client.get("/api/memories", params={"category": "preference", "limit": 10})
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "facts": [{"content": "I like tea", "category": "preference"}],
+        "conversations": [{"content": "User: Hi\nAssistant: Hello"}],
+        "next_cursor": app_module.encode_cursor(50)
+    }
+    facts_page.assert_awaited_once_with(category="preference", since=None, until=None, limit=10, offset=0)
+    recent.assert_awaited_once_with(app_module.RECENT_CONVERSATIONS)
+
+
+def test_memories_api_later_pages_skip_conversations(client, memories):
+    facts_page, recent = memories
+    facts_page.return_value = ([], None)
+
+    response = client.get("/api/memories", params={"cursor": app_module.encode_cursor(50)})
+
+    assert response.json() == {"facts": [], "conversations": [], "next_cursor": None}
+    assert facts_page.await_args.kwargs["offset"] == 50
+    assert facts_page.await_args.kwargs["limit"] == app_module.MEMORIES_PAGE_SIZE
+    recent.assert_not_called()
+
+
+def test_memories_api_until_date_includes_the_whole_day(client, memories):
+    facts_page, _ = memories
+
+    client.get("/api/memories", params={"since": "2024-01-03", "until": "2024-01-03"})
+    client.get("/api/memories", params={"until": "2024-01-03T12:00:00"})
+
+    first, second = facts_page.await_args_list
+    assert first.kwargs["since"] == datetime(2024, 1, 3).timestamp()
+    assert first.kwargs["until"] == datetime(2024, 1, 4).timestamp()
+    assert second.kwargs["until"] == datetime(2024, 1, 3, 12).timestamp()
+
+
+@pytest.mark.parametrize("params, detail", [
+    ({"cursor": "not a cursor"}, "Invalid cursor"),
+    ({"cursor": app_module.encode_cursor(-1)}, "Invalid cursor"),
+    ({"since": "yesterday"}, "Invalid since date"),
+    ({"until": "2024-13-01"}, "Invalid until date")
+])
+def test_memories_api_rejects_bad_input(client, memories, params, detail):
+    response = client.get("/api/memories", params=params)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == detail
+    memories[0].assert_not_called()
+
+
+def test_memories_api_times_out_with_504(client, memories):
+    memories[0].side_effect = asyncio.TimeoutError
+
+    response = client.get("/api/memories")
+
+    assert response.status_code == 504
+    assert response.json()["detail"] == "Loading memories timed out"
@@ -0,0 +1,174 @@
+import shutil
+import tempfile
+from datetime import datetime
+from unittest.mock import MagicMock
+import pytest
+from compaction import SUMMARY_HEADER, Compactor, RetentionPolicy, excerpt_summary
+from memory_manager import MemoryManager
+
+DAY = 24 * 3600
+NOW = datetime(2024, 3, 1).timestamp()
+
+
+@pytest.fixture
+def manager():
+    temp_dir = tempfile.mkdtemp()
+    embed = MagicMock(side_effect=lambda texts: [[float(len(text)), 1.0] for text in texts])
+    yield MemoryManager(data_dir=temp_dir, embedding_function=embed)
+    shutil.rmtree(temp_dir)
+
+
+def add_conversation(manager, session_id, message, ts):
+    manager.conversations.add(
+        ids=[f"conv_{session_id}_{message}"],
+        documents=[f"User: {message}\nAssistant: ok"],
+        metadatas=[{"session_id": session_id, "timestamp": "", "ts": ts, "type": "conversation"}],
+        embeddings=[[1.0, 0.0]]
+    )
+
+
+def add_fact(manager, content, confidence, timestamp):
+    manager.add_fact({
+        "content": content,
+        "category": "preference",
+        "source": "user_message",
+        "confidence": confidence,
+        "timestamp": timestamp
+    })
+
+
+def test_old_conversations_are_rolled_into_session_summaries(manager):
+    add_conversation(manager, "a", "first", NOW - 40 * DAY)
+    add_conversation(manager, "a", "second", NOW - 35 * DAY)
+    add_conversation(manager, "b", "old", NOW - 31 * DAY)
+    add_conversation(manager, "a", "recent", NOW - DAY)
+    compactor = Compactor(manager, RetentionPolicy(fact_max_age=None), clock=lambda: NOW)
+
+    result = compactor.run_once()
+
+    assert result["conversations_deleted"] == 3
+    assert result["summaries_written"] == 2
+    assert result["vectors_reclaimed"] == 1
+    stored = manager.conversations.get()
+    documents = dict(zip(stored["ids"], stored["documents"]))
+    assert documents["summary_a"] == f"{SUMMARY_HEADER}\n- User: first\n- User: second"
+    assert documents["summary_b"] == f"{SUMMARY_HEADER}\n- User: old"
+    assert "conv_a_recent" in documents
+    assert compactor.run_once()["conversations_deleted"] == 0
+
+
+def test_compaction_processes_a_bounded_batch_per_run(manager):
+    for index in range(5):
+        add_conversation(manager, "a", f"message {index}", NOW - 60 * DAY)
+    compactor = Compactor(manager, RetentionPolicy(fact_max_age=None, batch_size=2), clock=lambda: NOW)
+
+    assert compactor.run_once()["conversations_deleted"] == 2
+    assert compactor.run_once()["conversations_deleted"] == 2
+    assert compactor.run_once()["conversations_deleted"] == 1
+    summary = manager.conversations.get(ids=["summary_a"])["documents"][0]
+    assert summary.count("\n- ") == 5
+    assert compactor.totals["conversations_deleted"] == 5
+    assert compactor.totals["vectors_reclaimed"] == 4
+
+
+def test_unused_low_confidence_facts_are_dropped(manager):
+    add_fact(manager, "I like tea", "medium", "2024-01-01T00:00:00")
+    add_fact(manager, "I like coffee", "medium", "2024-01-01T00:00:00")
+    add_fact(manager, "I am a developer", "high", "2024-01-01T00:00:00")
+    add_fact(manager, "I like juice", "medium", "2024-02-28T00:00:00")
+    compactor = Compactor(manager, RetentionPolicy(conversation_max_age=None), clock=lambda: NOW)
+
+    result = compactor.run_once()
+
+    assert result["facts_deleted"] == 2
+    assert result["bytes_reclaimed"] > 0
+    remaining = manager.facts.get()["documents"]
+    assert sorted(remaining) == ["I am a developer", "I like juice"]
+
+
+def test_facts_used_in_a_prompt_are_kept(manager):
+    add_fact(manager, "I like tea", "high", "2024-01-01T00:00:00")
+    add_fact(manager, "I like coffee", "high", "2024-01-01T00:00:00")
+    add_fact(manager, "I like juice", "high", "2024-01-01T00:00:00")
+    ids = dict(zip(manager.facts.get()["documents"], manager.facts.get()["ids"]))
+    # Both come back from the oversampled query, but only one fits the prompt.
+    manager.facts.query = MagicMock(return_value={
+        "ids": [[ids["I like coffee"], ids["I like tea"]]],
+        "documents": [["I like coffee", "I like tea"]],
+        "metadatas": [[{"confidence": "high"}, {"confidence": "high"}]]
+    })
+    manager.conversations.query = MagicMock(return_value={"documents": [[]]})
+    manager.get_context_snippets("coffee", limit=1)
+    compactor = Compactor(
+        manager, RetentionPolicy(conversation_max_age=None, fact_max_confidence="high"), clock=lambda: NOW
+    )
+
+    assert compactor.run_once()["facts_deleted"] == 2
+    assert manager.facts.get()["documents"] == ["I like coffee"]
+
+
+def test_restated_facts_age_from_when_they_were_last_seen(manager):
+    add_fact(manager, "I like tea", "medium", "2024-01-01T00:00:00")
+    add_fact(manager, "I like tea", "medium", "2024-02-28T00:00:00")
+    add_fact(manager, "I like coffee", "medium", "2024-01-01T00:00:00")
+    compactor = Compactor(manager, RetentionPolicy(conversation_max_age=None), clock=lambda: NOW)
+
+    assert compactor.run_once()["facts_deleted"] == 1
+    assert manager.facts.get()["documents"] == ["I like tea"]
+
+
+def test_facts_without_last_seen_ts_are_backfilled(manager):
+    metadata = {"category": "preference", "confidence": "medium", "retrieved": 0, "ts": NOW - 60 * DAY}
+    manager.facts.add(
+        ids=["fact_old", "fact_restated"],
+        documents=["I like tea", "I like coffee"],
+        metadatas=[metadata, {**metadata, "last_seen": "2024-02-28T00:00:00"}],
+        embeddings=[[1.0, 0.0], [0.0, 1.0]]
+    )
+    compactor = Compactor(manager, RetentionPolicy(conversation_max_age=None), clock=lambda: NOW)
+
+    assert compactor.run_once()["facts_deleted"] == 1
+    stored = manager.facts.get()
+    assert stored["documents"] == ["I like coffee"]
+    assert stored["metadatas"][0]["last_seen_ts"] == datetime(2024, 2, 28).timestamp()
+
+
+def test_rows_stored_before_this_release_are_compacted(manager):
+    # The metadata shape written before ts, last_seen_ts and retrieved existed.
+    for index, timestamp in enumerate(["2024-01-01T00:00:00", "2024-02-28T00:00:00"]):
+        manager.conversations.add(
+            ids=[f"conv_{index}"],
+            documents=[f"User: message {index}\nAssistant: ok"],
+            metadatas=[{"session_id": "a", "timestamp": timestamp, "type": "conversation"}],
+            embeddings=[[1.0, 0.0]]
+        )
+        manager.facts.add(
+            ids=[f"fact_{index}"],
+            documents=[f"I like topic {index}"],
+            metadatas=[{
+                "category": "preference",
+                "source": "user_message",
+                "confidence": "medium",
+                "timestamp": timestamp,
+                "type": "fact"
+            }],
+            embeddings=[[1.0, 0.0]]
+        )
+    compactor = Compactor(manager, RetentionPolicy(), clock=lambda: NOW)
+
+    result = compactor.run_once()
+
+    assert result["conversations_deleted"] == 1
+    assert result["facts_deleted"] == 1
+    assert "conv_1" in manager.conversations.get()["ids"]
+    kept = manager.facts.get()
+    assert kept["ids"] == ["fact_1"]
+    assert kept["metadatas"][0]["ts"] == datetime(2024, 2, 28).timestamp()
+    assert kept["metadatas"][0]["retrieved"] == 0
+
+
+def test_excerpt_summary_keeps_newest_points_within_budget():
+    summary = excerpt_summary(None, [f"User: message {index}\nAssistant: ok" for index in range(50)], max_chars=100)
+
+    assert len(summary) <= 100
+    assert summary.endswith("- User: message 49")
@@ -0,0 +1,41 @@
+from context_packer import (
+    TRUNCATION_MARK, ContextPacker, Snippet, estimate_tokens, history_snippets, ranked_snippets
+)
+
+
+def test_estimate_tokens_is_about_four_characters_per_token():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2
+
+
+def test_pack_prefers_higher_scores_and_keeps_section_order():
+    packer = ContextPacker(budget=10)
+    snippets = ranked_snippets("memory", ["a" * 16, "b" * 16, "c" * 16])
+
+    packed = packer.pack(snippets)
+
+    assert packed.sections == {"memory": ["a" * 16, "b" * 16]}
+    assert packed.tokens == {"memory": 8}
+    assert packed.dropped == 1
+
+
+def test_history_favours_recent_and_relevant_lines():
+    lines = ["You: I adopted a cat", "Assistant: Lovely", "You: What's the weather?", "Assistant: Sunny"]
+    packer = ContextPacker(budget=12)
+
+    packed = packer.pack(history_snippets(lines, {"cat"}))
+
+    assert packed.sections["history"] == ["You: I adopted a cat", "Assistant: Sunny"]
+
+
+def test_oversized_snippet_is_truncated_not_dropped():
+    packer = ContextPacker(budget=50, min_truncated_tokens=10)
+    log = "x" * 4000
+
+    packed = packer.pack([Snippet("memory", 0, log, 1.0, 0.0)])
+
+    text = packed.sections["memory"][0]
+    assert text.endswith(TRUNCATION_MARK)
+    assert packed.tokens["memory"] <= 50
+    assert packed.truncated == 1
@@ -1,5 +1,7 @@
+import pytest
+import time
 from datetime import datetime
-from conversation import ConversationHistory
+from conversation import ConversationHistory, Message, SessionStore, SQLiteHistoryBackend
 
 import tempfile
 import shutil
@@ -102,4 +104,124 @@ def test_get_messages_respects_max_history(temp_data_dir):
         data = json.load(f)
         assert len(data[session_id]) == 2
         assert data[session_id][-2]["content"] == "Message 2"
-        assert data[session_id][-1]["content"] == "Response 2"
\ No newline at end of file
+        assert data[session_id][-1]["content"] == "Response 2"
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_history_keeps_last_max_history_messages():
+    conv = ConversationHistory(max_history=3)
+    for index in range(5):
+        conv.add_message("session", "user", f"Message {index}")
+
+    contents = [msg["content"] for msg in conv.get_history("session")]
+    assert contents == ["Message 2", "Message 3", "Message 4"]
+    assert conv.stats()["messages"] == 3
+
+
+def test_session_store_evicts_least_recently_used_session():
+    store = SessionStore(max_sessions=2)
+    store.append("a", Message("user", "hi"))
+    store.append("b", Message("user", "hi"))
+    store.get("a")
+    store.append("c", Message("user", "hi"))
+
+    assert "a" in store
+    assert "b" not in store
+    assert "c" in store
+    assert store.stats()["evicted_sessions"] == 1
+
+
+def test_session_store_expires_idle_sessions():
+    clock = FakeClock()
+    store = SessionStore(ttl=60, clock=clock)
+    store.append("idle", Message("user", "hello"))
+    clock.now = 30
+    store.append("active", Message("user", "hello"))
+
+    clock.now = 70
+    assert store.get("idle") is None
+    assert store.get("active") is not None
+    assert store.stats()["expired_sessions"] == 1
+
+
+def test_session_store_stats_track_dropped_messages():
+    store = SessionStore(max_messages=2, max_sessions=1)
+    store.append("a", Message("user", "12345"))
+    store.append("a", Message("assistant", "123"))
+    store.append("a", Message("user", "1"))
+    assert store.stats()["content_chars"] == 4
+
+    store.append("b", Message("user", "12"))
+    stats = store.stats()
+    assert stats["sessions"] == 1
+    assert stats["messages"] == 1
+    assert stats["content_chars"] == 2
+    assert stats["estimated_bytes"] > 2
+
+
+def test_message_uses_slots():
+    message = Message("user", "hello")
+
+    assert not hasattr(message, "__dict__")
+    assert message.to_dict()["content"] == "hello"
+
+
+@pytest.fixture
+def sqlite_backend(tmp_path):
+    backend = SQLiteHistoryBackend(str(tmp_path / "history.db"), max_messages=3, batch_size=100, flush_interval=60)
+    yield backend
+    backend.close()
+
+
+def test_sqlite_backend_reads_its_own_buffered_writes(sqlite_backend):
+    conv = ConversationHistory(max_history=3, backend=sqlite_backend)
+    conv.add_message("session", "user", "Hello")
+    conv.add_message("session", "assistant", "Hi there!")
+
+    assert sqlite_backend.stats()["pending_writes"] == 2
+    messages = conv.get_messages("session")
+    assert messages == [
+        {"role": "user", "content": "Hello"},
+        {"role": "bot", "content": "Hi there!"}
+    ]
+
+
+def test_sqlite_backend_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "history.db")
+    first = SQLiteHistoryBackend(path, batch_size=1)
+    second = SQLiteHistoryBackend(path, batch_size=1)
+    ConversationHistory(backend=first).add_message("session", "user", "from worker one")
+
+    history = ConversationHistory(backend=second).get_history("session")
+
+    assert [msg["content"] for msg in history] == ["from worker one"]
+    first.close()
+    second.close()
+
+
+def test_sqlite_backend_trims_each_session_to_max_messages(sqlite_backend):
+    for index in range(5):
+        sqlite_backend.append("session", Message("user", f"Message {index}"))
+    sqlite_backend.append("other", Message("user", "Other"))
+    sqlite_backend.flush()
+
+    assert [m.content for m in sqlite_backend.recent("session", 10)] == ["Message 2", "Message 3", "Message 4"]
+    assert sqlite_backend.stats() == {"sessions": 2, "messages": 4, "pending_writes": 0}
+
+
+def test_sqlite_backend_expires_idle_sessions(tmp_path):
+    backend = SQLiteHistoryBackend(str(tmp_path / "history.db"), ttl=60, batch_size=1)
+    backend.append("idle", Message("user", "old", timestamp=time.time() - 120))
+    backend._last_expiry = 0.0
+    backend.append("active", Message("user", "new"))
+
+    assert backend.recent("idle", 10) == []
+    assert len(backend.recent("active", 10)) == 1
+    backend.close()
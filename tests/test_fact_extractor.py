@@ -0,0 +1,78 @@
+import re
+from fact_extractor import FACT_PATTERNS, extract_facts, trie_regex
+
+
+def legacy_contents(message):
+    contents = {}
+    for category, patterns in FACT_PATTERNS.items():
+        for pattern in patterns:
+            for sentence in message.split('.'):
+                if pattern in sentence.lower():
+                    confidence = "high" if pattern in ["i am", "i'm", "my name is"] else "medium"
+                    if contents.get(sentence.strip()) != "high":
+                        contents[sentence.strip()] = confidence
+    return contents
+
+
+def test_same_sentences_and_strongest_confidence_as_pattern_loop():
+    message = (
+        "I'm trying to learn Rust. Normally I am up early. My name is Sam and I live in Oslo. "
+        "The weather is bad. I've been coding for years. Every day I walk the dog. I like tea"
+    )
+
+    facts = extract_facts(message, "")
+
+    assert {fact["content"]: fact["confidence"] for fact in facts} == legacy_contents(message)
+
+
+def test_one_fact_per_sentence_when_several_patterns_match():
+    facts = extract_facts("I'm good at chess and I like it and I love it", "")
+
+    assert len(facts) == 1
+    assert facts[0]["confidence"] == "high"
+    assert facts[0]["category"] == "personal_info"
+
+
+def test_most_specific_pattern_breaks_confidence_ties():
+    facts = extract_facts("I know how to bake bread", "")
+
+    assert facts[0]["category"] == "skill"
+
+
+def test_repeated_sentences_are_deduplicated():
+    facts = extract_facts("I like tea. I like tea. I like coffee", "")
+
+    assert [fact["content"] for fact in facts] == ["I like tea", "I like coffee"]
+
+
+def test_overlapping_patterns_are_found():
+    facts = extract_facts("Normally I am at home", "")
+
+    assert facts[0]["confidence"] == "high"
+
+
+def test_lowercasing_that_changes_length_keeps_sentences_aligned():
+    facts = extract_facts("İİİ is a word. I live in Berlin", "")
+
+    assert [fact["content"] for fact in facts] == ["I live in Berlin"]
+
+
+def test_assistant_confirmations_are_extracted():
+    facts = extract_facts("Hello", "Sure. As you told me, you live in Oslo.")
+
+    assert facts == [{
+        "content": "As you told me, you live in Oslo",
+        "category": "confirmation",
+        "source": "assistant_response",
+        "confidence": "medium",
+        "timestamp": facts[0]["timestamp"]
+    }]
+
+
+def test_trie_regex_prefers_longest_pattern():
+    automaton = re.compile(trie_regex(["i'm", "i'm fond of", "i am"]))
+
+    assert automaton.match("i'm fond of tea").group() == "i'm fond of"
+    assert automaton.match("i'm tired").group() == "i'm"
+    assert automaton.match("i a") is None
+
@@ -0,0 +1,38 @@
+from lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+def test_tokenize_drops_case_punctuation_and_stopwords():
+    assert tokenize("My order is SKU-4521, from Zürich!") == ["order", "sku", "4521", "zürich"]
+
+
+def test_search_ranks_rare_terms_highest():
+    index = BM25Index()
+    index.add_many([
+        ("a", "I like hiking in the mountains"),
+        ("b", "I like reading books"),
+        ("c", "My colleague Anneliese likes hiking")
+    ])
+
+    results = index.search("hiking with Anneliese", limit=2)
+
+    assert [doc_id for doc_id, _ in results] == ["c", "a"]
+
+
+def test_add_replaces_and_remove_forgets_documents():
+    index = BM25Index()
+    index.add("a", "I live in Lisbon")
+    index.add("a", "I live in Porto")
+    index.add("b", "I work in Lisbon")
+
+    assert [doc_id for doc_id, _ in index.search("lisbon", limit=5)] == ["b"]
+
+    index.remove_many(["b", "missing"])
+    assert index.search("lisbon", limit=5) == []
+    assert len(index) == 1
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"]])
+
+    assert fused[0] == "b"
+    assert set(fused) == {"a", "b", "c", "d"}
@@ -0,0 +1,139 @@
+import asyncio
+import json
+from typing import AsyncIterator, List
+import httpx
+import pytest
+from llm_client import OllamaClient, LLMError, iter_ndjson
+
+
+async def _chunks(parts: List[bytes]) -> AsyncIterator[bytes]:
+    for part in parts:
+        yield part
+
+
+def _collect(parts: List[bytes]) -> List[dict]:
+    async def run():
+        return [obj async for obj in iter_ndjson(_chunks(parts))]
+    return asyncio.run(run())
+
+
+def _ndjson(*objs: dict) -> bytes:
+    return b"".join(json.dumps(obj).encode() + b"\n" for obj in objs)
+
+
+def test_iter_ndjson_handles_lines_split_across_chunks():
+    data = _ndjson({"response": "Hel"}, {"response": "lo"}, {"done": True})
+    parts = [data[:5], data[5:23], data[23:]]
+
+    assert _collect(parts) == [{"response": "Hel"}, {"response": "lo"}, {"done": True}]
+
+
+def test_iter_ndjson_skips_blank_and_malformed_lines():
+    parts = [b'{"response": "a"}\n\nnot json\n', b'{"response": "b"}']
+
+    assert _collect(parts) == [{"response": "a"}, {"response": "b"}]
+
+
+def test_generate_joins_response_tokens():
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        assert request.url.path == "/api/generate"
+        assert body["prompt"] == "Hi"
+        assert body["model"] == "test-model"
+        return httpx.Response(200, content=_ndjson(
+            {"response": "Hello"}, {"response": " there"}, {"response": "", "done": True}
+        ))
+
+    client = OllamaClient(model="test-model", transport=httpx.MockTransport(handler))
+
+    async def run():
+        try:
+            return await client.generate("Hi")
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(run()) == "Hello there"
+
+
+def test_stream_raises_llm_error_on_bad_status():
+    client = OllamaClient(transport=httpx.MockTransport(lambda request: httpx.Response(500)))
+
+    async def run():
+        return [token async for token in client.stream_tokens("Hi")]
+
+    with pytest.raises(LLMError):
+        asyncio.run(run())
+
+
+def test_client_reuses_pool_within_a_loop():
+    client = OllamaClient(transport=httpx.MockTransport(lambda request: httpx.Response(200)))
+
+    async def run():
+        first = client._get_client()
+        second = client._get_client()
+        await client.aclose()
+        return first is second
+
+    assert asyncio.run(run())
+
+
+def test_chat_posts_messages_with_keep_alive():
+    messages = [{"role": "system", "content": "Be brief"}, {"role": "user", "content": "Hi"}]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        assert request.url.path == "/api/chat"
+        assert body["messages"] == messages
+        assert body["keep_alive"] == "30m"
+        return httpx.Response(200, content=_ndjson(
+            {"message": {"role": "assistant", "content": "Hel"}},
+            {"message": {"role": "assistant", "content": "lo"}},
+            {"message": {"role": "assistant", "content": ""}, "done": True}
+        ))
+
+    client = OllamaClient(keep_alive="30m", transport=httpx.MockTransport(handler))
+
+    assert asyncio.run(client.chat(messages)) == "Hello"
+
+
+def test_warm_up_primes_the_system_prompt():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append((request.url.path, json.loads(request.content)))
+        return httpx.Response(200, json={"done": True})
+
+    client = OllamaClient(keep_alive=-1, transport=httpx.MockTransport(handler))
+
+    assert asyncio.run(client.warm_up("System")) is True
+    path, body = requests[0]
+    assert path == "/api/chat"
+    assert body["messages"] == [{"role": "system", "content": "System"}]
+    assert body["keep_alive"] == -1
+
+
+def test_warm_up_failure_is_not_fatal():
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("refused")
+
+    client = OllamaClient(transport=httpx.MockTransport(handler))
+
+    assert asyncio.run(client.warm_up()) is False
+
+
+def test_final_stream_object_is_reported():
+    final = {"message": {"role": "assistant", "content": ""}, "done": True, "eval_count": 2, "eval_duration": 1000}
+    handler = lambda request: httpx.Response(200, content=_ndjson(
+        {"message": {"role": "assistant", "content": "Hi"}, "done": False}, final
+    ))
+    reported = []
+    client = OllamaClient(transport=httpx.MockTransport(handler), on_complete=reported.append)
+
+    async def run():
+        try:
+            return await client.chat([{"role": "user", "content": "Hello"}])
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(run()) == "Hi"
+    assert reported == [final]
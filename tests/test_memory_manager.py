@@ -1,10 +1,12 @@
+import hashlib
 import os
 import tempfile
 import shutil
 from datetime import datetime
 import pytest
 from unittest.mock import MagicMock, patch
-from memory_manager import MemoryManager
+import numpy as np
+from memory_manager import DiskEmbeddingStore, EmbeddingCache, MemoryManager, fact_id
 
 @pytest.fixture
 def temp_data_dir():
@@ -17,6 +19,7 @@ def mock_chroma():
     with patch('chromadb.PersistentClient') as mock_client:
         mock_conversations = MagicMock()
         mock_facts = MagicMock()
+        mock_facts.get.return_value = {"ids": [], "metadatas": []}
         
         # Setup mock collections
         mock_client.return_value.get_or_create_collection.side_effect = [
@@ -31,8 +34,12 @@ def mock_chroma():
         }
 
 @pytest.fixture
-def memory_manager(temp_data_dir, mock_chroma):
-    return MemoryManager(data_dir=temp_data_dir)
+def embedding_function():
+    return MagicMock(side_effect=lambda texts: [[float(len(text)), 1.0] for text in texts])
+
+@pytest.fixture
+def memory_manager(temp_data_dir, mock_chroma, embedding_function):
+    return MemoryManager(data_dir=temp_data_dir, embedding_function=embedding_function)
 
 def test_init_creates_memory_dir(temp_data_dir):
     MemoryManager(data_dir=temp_data_dir)
@@ -66,15 +73,16 @@ def test_add_fact(memory_manager, mock_chroma):
     
     memory_manager.add_fact(fact)
     
-    mock_chroma['facts'].add.assert_called_once()
-    call_args = mock_chroma['facts'].add.call_args[1]
+    mock_chroma['facts'].upsert.assert_called_once()
+    call_args = mock_chroma['facts'].upsert.call_args[1]
     
     assert call_args['documents'][0] == fact["content"]
     assert call_args['metadatas'][0]['category'] == fact["category"]
     assert call_args['metadatas'][0]['source'] == fact["source"]
     assert call_args['metadatas'][0]['confidence'] == fact["confidence"]
     assert call_args['metadatas'][0]['timestamp'] == fact["timestamp"]
-    assert len(call_args['ids'][0]) > 0
+    assert call_args['metadatas'][0]['count'] == 1
+    assert call_args['ids'][0] == fact_id(fact["content"])
 
 def test_get_relevant_memories(memory_manager, mock_chroma):
     query = "test query"
@@ -93,12 +101,21 @@ def test_get_relevant_memories(memory_manager, mock_chroma):
     assert memories["conversations"] == ["Past conversation 1", "Past conversation 2"]
     assert memories["facts"] == ["Fact 1", "Fact 2"]
     
-    memory_manager.conversations.query.assert_called_once_with(
-        query_texts=[query], n_results=2
-    )
-    memory_manager.facts.query.assert_called_once_with(
-        query_texts=[query], n_results=2
-    )
+    for collection in (memory_manager.conversations, memory_manager.facts):
+        collection.query.assert_called_once()
+        call_args = collection.query.call_args[1]
+        assert [list(vector) for vector in call_args["query_embeddings"]] == [[float(len(query)), 1.0]]
+        assert call_args["n_results"] == 2
+        assert call_args["include"] == ["documents", "metadatas"]
+
+
+def test_get_relevant_memories_embeds_query_once(memory_manager, embedding_function):
+    memory_manager.conversations.query.return_value = {"documents": [[]]}
+    memory_manager.facts.query.return_value = {"documents": [[]]}
+
+    memory_manager.get_relevant_memories("where do I live?")
+
+    embedding_function.assert_called_once_with(["where do I live?"])
 
 def test_extract_facts_from_conversation_user_preferences():
     manager = MemoryManager()
@@ -149,14 +166,10 @@ def test_get_context_for_prompt(memory_manager, mock_chroma):
     mock_facts = ["I am a developer", "I live in New York"]
     mock_conversations = ["Previous conversation about work"]
     
-    # Mock the facts collection get method
-    memory_manager.facts.get.return_value = {
-        "metadatas": [{"confidence": "high"}, {"confidence": "high"}]
-    }
-    
     # Mock query results
     memory_manager.get_relevant_memories = MagicMock(return_value={
         "facts": mock_facts,
+        "fact_metadatas": [{"confidence": "high"}, {"confidence": "high"}],
         "conversations": mock_conversations
     })
     
@@ -166,4 +179,361 @@ def test_get_context_for_prompt(memory_manager, mock_chroma):
     assert "I live in New York" in context
     assert "Previous conversation about work" in context
     
-    memory_manager.get_relevant_memories.assert_called_once_with(query, limit=3)
\ No newline at end of file
+    memory_manager.get_relevant_memories.assert_called_once_with(query, limit=3, fact_limit=30)
+    memory_manager.facts.get.assert_not_called()
+
+
+def test_get_context_for_prompt_filters_confidence_from_query_metadata(memory_manager, mock_chroma):
+    memory_manager.conversations.query.return_value = {"documents": [["Earlier chat"]]}
+    memory_manager.facts.query.return_value = {
+        "documents": [["I like tea", "I am a developer", "My name is Sam", "I'm tall", "I am 30"]],
+        "metadatas": [[
+            {"confidence": "medium"},
+            {"confidence": "high"},
+            {"confidence": "high"},
+            {"confidence": "high"},
+            {"confidence": "high"}
+        ]]
+    }
+
+    context = memory_manager.get_context_for_prompt("what do I do?")
+
+    assert context == "I am a developer\nMy name is Sam\nI'm tall\nEarlier chat"
+    assert memory_manager.facts.query.call_count == 1
+    assert memory_manager.conversations.query.call_count == 1
+    memory_manager.facts.get.assert_not_called()
+
+def test_add_facts_writes_batch_in_one_call(memory_manager, mock_chroma):
+    facts = [
+        {
+            "content": f"I like topic {index}",
+            "category": "preference",
+            "source": "user_message",
+            "confidence": "medium",
+            "timestamp": datetime.now().isoformat()
+        }
+        for index in range(5)
+    ]
+
+    memory_manager.add_facts(facts)
+
+    mock_chroma['facts'].get.assert_called_once()
+    mock_chroma['facts'].upsert.assert_called_once()
+    call_args = mock_chroma['facts'].upsert.call_args[1]
+    assert call_args['documents'] == [fact["content"] for fact in facts]
+    assert len(call_args['embeddings']) == 5
+    assert len(set(call_args['ids'])) == 5
+
+
+def make_fact(content, confidence="medium", timestamp="2024-01-01T00:00:00"):
+    return {
+        "content": content,
+        "category": "preference",
+        "source": "user_message",
+        "confidence": confidence,
+        "timestamp": timestamp
+    }
+
+
+def test_fact_ids_ignore_case_and_whitespace():
+    assert fact_id("I like  Tea") == fact_id("i like tea")
+    assert fact_id("I like tea") != fact_id("I like coffee")
+
+
+def test_repeated_facts_are_merged(temp_data_dir, embedding_function):
+    manager = MemoryManager(data_dir=temp_data_dir, embedding_function=embedding_function)
+
+    manager.add_facts([make_fact("I like tea"), make_fact("i like  tea", confidence="high")])
+    manager.add_fact(make_fact("I like tea", timestamp="2024-02-01T00:00:00"))
+
+    stored = manager.facts.get(include=["documents", "metadatas"])
+    assert stored["documents"] == ["I like tea"]
+    metadata = stored["metadatas"][0]
+    assert metadata["count"] == 3
+    assert metadata["confidence"] == "high"
+    assert metadata["timestamp"] == "2024-01-01T00:00:00"
+    assert metadata["last_seen"] == "2024-02-01T00:00:00"
+    assert metadata["last_seen_ts"] == datetime(2024, 2, 1).timestamp()
+
+
+def test_near_duplicate_facts_merge_by_distance(temp_data_dir):
+    embed = MagicMock(side_effect=lambda texts: [[1.0, 0.0] if "tea" in text else [0.0, 1.0] for text in texts])
+    manager = MemoryManager(data_dir=temp_data_dir, embedding_function=embed, near_duplicate_distance=0.01)
+
+    manager.add_fact(make_fact("I like tea"))
+    manager.add_fact(make_fact("I really like tea"))
+    manager.add_fact(make_fact("I like coffee"))
+
+    stored = manager.facts.get(include=["documents", "metadatas"])
+    counts = dict(zip(stored["documents"], (metadata["count"] for metadata in stored["metadatas"])))
+    assert counts == {"I like tea": 2, "I like coffee": 1}
+
+
+def test_write_buffer_flushes_on_size(temp_data_dir, mock_chroma, embedding_function):
+    manager = MemoryManager(
+        data_dir=temp_data_dir, write_buffer_size=3, flush_interval=60, embedding_function=embedding_function
+    )
+
+    manager.add_conversation("session", "Hello", "Hi")
+    manager.add_conversation("session", "How are you?", "Fine")
+    mock_chroma['conversations'].add.assert_not_called()
+
+    manager.add_conversation("session", "Bye", "Bye")
+    mock_chroma['conversations'].add.assert_called_once()
+    assert len(mock_chroma['conversations'].add.call_args[1]['documents']) == 3
+
+
+def test_write_buffer_flushes_on_interval(temp_data_dir, mock_chroma, embedding_function):
+    manager = MemoryManager(
+        data_dir=temp_data_dir, write_buffer_size=100, flush_interval=0.05, embedding_function=embedding_function
+    )
+
+    manager.add_conversation("session", "Hello", "Hi")
+    timer = manager._flush_timer
+    timer.join()
+
+    mock_chroma['conversations'].add.assert_called_once()
+
+
+def test_queries_leave_buffered_writes_to_the_flush(temp_data_dir, mock_chroma, embedding_function):
+    manager = MemoryManager(
+        data_dir=temp_data_dir, write_buffer_size=100, flush_interval=60, embedding_function=embedding_function
+    )
+    manager.conversations.query.return_value = {"documents": [[]]}
+    manager.facts.query.return_value = {"documents": [[]]}
+
+    manager.add_conversation("session", "Hello", "Hi")
+    manager.get_relevant_memories("Hello")
+
+    mock_chroma['conversations'].add.assert_not_called()
+    embedding_function.assert_called_once_with(["Hello"])
+
+
+def test_embedding_cache_serves_repeats_from_memory(embedding_function):
+    cache = EmbeddingCache(embedding_function)
+
+    first = cache(["Hello there"])
+    second = cache(["  hello   THERE "])
+
+    embedding_function.assert_called_once_with(["Hello there"])
+    assert list(first[0]) == list(second[0])
+    assert cache.stats()["memory_hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_embedding_cache_only_embeds_missing_texts(embedding_function):
+    cache = EmbeddingCache(embedding_function)
+    cache(["hi"])
+
+    vectors = cache(["hi", "thanks"])
+
+    assert embedding_function.call_args_list[-1].args == (["thanks"],)
+    assert [list(vector) for vector in vectors] == [[2.0, 1.0], [6.0, 1.0]]
+
+
+def test_embedding_cache_evicts_least_recently_used(embedding_function):
+    cache = EmbeddingCache(embedding_function, memory_size=2)
+    cache(["a"])
+    cache(["bb"])
+    cache(["a"])
+    cache(["ccc"])
+
+    assert cache.stats()["memory_entries"] == 2
+    cache(["bb"])
+    assert cache.stats()["misses"] == 4
+
+
+def test_embedding_cache_disk_tier_survives_restart(embedding_function, temp_data_dir):
+    cache_dir = os.path.join(temp_data_dir, "embedding_cache")
+    EmbeddingCache(embedding_function, cache_dir=cache_dir)(["I live in Berlin"])
+
+    restarted = EmbeddingCache(embedding_function, cache_dir=cache_dir)
+    vectors = restarted(["I live in Berlin"])
+
+    assert embedding_function.call_count == 1
+    assert list(vectors[0]) == [16.0, 1.0]
+    assert restarted.stats()["disk_hits"] == 1
+
+
+def test_embedding_cache_syncs_disk_on_a_timer(embedding_function, temp_data_dir):
+    cache = EmbeddingCache(embedding_function, cache_dir=temp_data_dir, sync_interval=60)
+    with patch.object(DiskEmbeddingStore, "sync") as sync:
+        cache(["a"])
+        cache(["bb"])
+        sync.assert_not_called()
+
+        cache.sync()
+        sync.assert_called_once()
+    assert cache._sync_timer is None
+
+
+def test_disk_embedding_store_recreates_ring_when_dimension_changes(temp_data_dir, caplog):
+    DiskEmbeddingStore(temp_data_dir, capacity=4).put(b"a" * 20, np.array([1, 2], dtype=np.float32))
+
+    store = DiskEmbeddingStore(temp_data_dir, capacity=4)
+    store.put(b"b" * 20, np.array([1, 2, 3], dtype=np.float32))
+
+    assert "Embedding size changed" in caplog.text
+    assert store.dim == 3
+    assert store.get(b"a" * 20) is None
+    assert list(store.get(b"b" * 20)) == [1.0, 2.0, 3.0]
+    assert len(DiskEmbeddingStore(temp_data_dir, capacity=4)) == 1
+
+
+def test_disk_embedding_store_overwrites_oldest_when_full(temp_data_dir):
+    store = DiskEmbeddingStore(temp_data_dir, capacity=2)
+    for index in range(3):
+        store.put(bytes([index]) * 20, np.array([index, index], dtype=np.float32))
+
+    assert len(store) == 2
+    assert store.get(bytes([0]) * 20) is None
+    assert list(store.get(bytes([2]) * 20)) == [2.0, 2.0]
+
+
+def test_disk_embedding_store_shared_by_two_processes(temp_data_dir):
+    hello, goodbye = hashlib.sha1(b"hello").digest(), hashlib.sha1(b"goodbye").digest()
+    first = DiskEmbeddingStore(temp_data_dir, capacity=1)
+    second = DiskEmbeddingStore(temp_data_dir, capacity=1)
+
+    first.put(hello, np.array([1, 1], dtype=np.float32))
+    second.put(goodbye, np.array([2, 2], dtype=np.float32))
+
+    assert first.get(hello) is None
+    assert hello not in first._index
+    assert list(second.get(goodbye)) == [2.0, 2.0]
+
+    third = DiskEmbeddingStore(temp_data_dir, capacity=2)
+    fourth = DiskEmbeddingStore(temp_data_dir, capacity=2)
+    third.put(hello, np.array([1, 1], dtype=np.float32))
+    fourth.put(goodbye, np.array([2, 2], dtype=np.float32))
+    # Slots come from a shared counter, so the second writer does not reuse the first one's slot.
+    assert list(third.get(hello)) == [1.0, 1.0]
+    assert list(DiskEmbeddingStore(temp_data_dir, capacity=2).get(goodbye)) == [2.0, 2.0]
+
+
+def test_facts_page_filters_and_paginates(temp_data_dir, embedding_function):
+    manager = MemoryManager(data_dir=temp_data_dir, embedding_function=embedding_function)
+    manager.add_facts([
+        make_fact(f"I like topic {index}", timestamp=f"2024-01-{index + 1:02d}T00:00:00") for index in range(5)
+    ])
+    manager.add_fact({**make_fact("I am a developer", timestamp="2024-01-03T00:00:00"), "category": "personal_info"})
+
+    first, next_offset = manager.get_facts_page(category="preference", limit=3)
+    second, last_offset = manager.get_facts_page(category="preference", limit=3, offset=next_offset)
+    assert [fact["content"] for fact in first + second] == [f"I like topic {index}" for index in range(5)]
+    assert next_offset == 3
+    assert last_offset is None
+
+    since = datetime(2024, 1, 3).timestamp()
+    until = datetime(2024, 1, 4).timestamp()
+    window, _ = manager.get_facts_page(since=since, until=until)
+    assert sorted(fact["content"] for fact in window) == ["I am a developer", "I like topic 2"]
+
+
+def test_recent_conversations_fetches_only_the_tail(temp_data_dir, embedding_function):
+    manager = MemoryManager(data_dir=temp_data_dir, embedding_function=embedding_function)
+    manager.add_conversations([("session", f"Message {index}", "Reply") for index in range(15)])
+
+    recent = manager.get_recent_conversations(limit=10)
+
+    assert [conv["content"].split("\n")[0] for conv in recent] == [f"User: Message {index}" for index in range(5, 15)]
+
+
+def test_lexical_mode_finds_exact_terms_without_embedding(temp_data_dir, embedding_function):
+    manager = MemoryManager(data_dir=temp_data_dir, embedding_function=embedding_function, retrieval_mode="lexical")
+    manager.add_facts([make_fact("My order number is SKU-4521"), make_fact("I like hiking")])
+    manager.add_conversation("session", "I met Anneliese today", "Nice")
+    embedding_function.reset_mock()
+
+    memories = manager.get_relevant_memories("where is sku 4521?")
+
+    assert memories["facts"] == ["My order number is SKU-4521"]
+    assert memories["conversations"] == []
+    embedding_function.assert_not_called()
+
+    manager.add_fact(make_fact("My backup order is SKU-9000"))
+    assert manager.get_relevant_memories("sku 9000")["facts"][0] == "My backup order is SKU-9000"
+
+
+def test_hybrid_mode_fuses_lexical_and_vector_hits(temp_data_dir):
+    # Every text embeds to the same vector, so only the lexical side can tell them apart.
+    embed = MagicMock(side_effect=lambda texts: [[1.0, 0.0] for _ in texts])
+    manager = MemoryManager(data_dir=temp_data_dir, embedding_function=embed, retrieval_mode="hybrid")
+    manager.add_facts([make_fact(f"I like topic {index}") for index in range(20)] + [make_fact("My cat is named Biscuit")])
+
+    memories = manager.get_relevant_memories("what is Biscuit?", limit=3)
+
+    assert "My cat is named Biscuit" in memories["facts"]
+    assert len(memories["facts"]) == 3
+    assert all(metadata["category"] == "preference" for metadata in memories["fact_metadatas"])
+
+
+def test_deletes_are_reflected_in_lexical_index(temp_data_dir, embedding_function):
+    manager = MemoryManager(data_dir=temp_data_dir, embedding_function=embedding_function, retrieval_mode="lexical")
+    manager.add_fact(make_fact("My order number is SKU-4521"))
+    manager.get_relevant_memories("sku")
+
+    manager.delete("facts", [fact_id("My order number is SKU-4521")])
+
+    assert manager.get_relevant_memories("sku")["facts"] == []
+
+
+def test_warm_up_builds_the_lexical_index(temp_data_dir, embedding_function):
+    manager = MemoryManager(data_dir=temp_data_dir, embedding_function=embedding_function, retrieval_mode="hybrid")
+    manager.add_fact(make_fact("My order number is SKU-4521"))
+    assert manager._lexical_indexes is None
+
+    manager.warm_up()
+
+    assert len(manager._lexical_indexes["facts"]) == 1
+
+
+def test_warm_up_dates_facts_stored_before_ts_existed(temp_data_dir, embedding_function):
+    manager = MemoryManager(data_dir=temp_data_dir, embedding_function=embedding_function)
+    manager.facts.add(
+        ids=["fact_old"],
+        documents=["I like tea"],
+        metadatas=[{"category": "preference", "confidence": "medium", "timestamp": "2024-01-03T00:00:00", "type": "fact"}],
+        embeddings=[[1.0, 0.0]]
+    )
+
+    manager.warm_up()
+
+    window, _ = manager.get_facts_page(since=datetime(2024, 1, 3).timestamp(), until=datetime(2024, 1, 4).timestamp())
+    assert [fact["content"] for fact in window] == ["I like tea"]
+
+
+def test_writes_during_an_index_rebuild_are_not_lost(temp_data_dir, embedding_function):
+    manager = MemoryManager(data_dir=temp_data_dir, embedding_function=embedding_function, retrieval_mode="lexical")
+    build_index = manager._build_index
+
+    def build_while_writing(collection, *args):
+        index = build_index(collection, *args)
+        if collection is manager.facts:
+            manager.add_fact(make_fact("My backup order is SKU-9000"))
+        return index
+
+    with patch.object(manager, "_build_index", side_effect=build_while_writing):
+        manager.rebuild_lexical_indexes()
+
+    assert manager.get_relevant_memories("sku 9000")["facts"] == ["My backup order is SKU-9000"]
+
+def test_store_opens_on_first_use(temp_data_dir, mock_chroma, embedding_function):
+    manager = MemoryManager(data_dir=temp_data_dir, embedding_function=embedding_function)
+    manager.flush()
+
+    assert not manager.is_open
+    mock_chroma['client'].assert_not_called()
+
+    manager.conversations.count()
+
+    assert manager.is_open
+    mock_chroma['client'].assert_called_once()
+
+def test_warm_up_opens_store_and_loads_model(temp_data_dir, mock_chroma, embedding_function):
+    manager = MemoryManager(data_dir=temp_data_dir, embedding_function=embedding_function)
+    manager.warm_up()
+
+    assert manager.is_open
+    embedding_function.assert_called_once()
+    assert manager.embedding_cache.stats()["memory_entries"] == 0
@@ -0,0 +1,53 @@
+import asyncio
+from metrics import Counter, Histogram, RequestTimings, bind_request, record_generation, start_request, timed
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("test_seconds", "Test latency.", ["stage"], buckets=(0.1, 1.0))
+    histogram.observe(0.05, "a")
+    histogram.observe(0.5, "a")
+    histogram.observe(5, "a")
+
+    lines = histogram.render()
+
+    assert lines[:2] == ["# HELP test_seconds Test latency.", "# TYPE test_seconds histogram"]
+    assert 'test_seconds_bucket{stage="a",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="a",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{stage="a",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{stage="a"} 3' in lines
+    assert histogram.snapshot("a") == (5.55, 3)
+
+
+def test_counter_escapes_label_values():
+    counter = Counter("test_total", "Test counter.", ["name"])
+    counter.inc('say "hi"', amount=2)
+
+    assert counter.render()[-1] == 'test_total{name="say \\"hi\\""} 2'
+
+
+def test_timed_stages_accumulate_on_the_current_request():
+    async def run():
+        timings = start_request()
+        with timed("retrieval"):
+            pass
+        with timed("retrieval"):
+            pass
+        return timings
+
+    timings = asyncio.run(run())
+
+    assert list(timings.stages) == ["retrieval"]
+    assert timings.as_dict()["ms"]["total"] >= timings.as_dict()["ms"]["retrieval"]
+
+
+def test_bound_request_collects_generation_stats():
+    timings = RequestTimings()
+
+    async def run():
+        bind_request(timings)
+        record_generation({"done": True, "eval_count": 50, "eval_duration": 2_000_000_000, "prompt_eval_count": 10})
+
+    asyncio.run(run())
+
+    assert timings.generation == {"prompt_eval_count": 10, "eval_count": 50, "eval_ms": 2000.0, "tokens_per_second": 25.0}
+    assert timings.server_timing().startswith("total;dur=")
@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock
+import pytest
+from metrics import start_request, timed
+from offload import AsyncMemoryManager, AsyncPromptBuilder, AsyncStorage, BlockingPool
+
+
+def test_calls_run_off_the_event_loop_thread():
+    pool = BlockingPool(max_workers=2)
+
+    async def run():
+        return await pool.run(threading.get_ident)
+
+    try:
+        assert asyncio.run(run()) != threading.get_ident()
+        assert pool.stats()["completed"] == 1
+    finally:
+        pool.shutdown()
+
+
+def test_concurrent_calls_overlap():
+    pool = BlockingPool(max_workers=4)
+
+    async def run():
+        started = time.perf_counter()
+        await asyncio.gather(*(pool.run(time.sleep, 0.1) for _ in range(4)))
+        return time.perf_counter() - started
+
+    try:
+        assert asyncio.run(run()) < 0.3
+    finally:
+        pool.shutdown()
+
+
+def test_timeout_raises_and_is_counted():
+    pool = BlockingPool(max_workers=1, timeout=0.01)
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await pool.run(time.sleep, 0.2)
+
+    try:
+        asyncio.run(run())
+        assert pool.stats()["timeouts"] == 1
+        assert pool.stats()["in_flight"] == 0
+    finally:
+        pool.shutdown()
+
+
+def test_request_timings_reach_the_worker_thread():
+    pool = BlockingPool(max_workers=1)
+
+    def work():
+        with timed("memory.embed"):
+            pass
+
+    async def run():
+        timings = start_request()
+        await pool.run(work)
+        return timings
+
+    try:
+        assert "memory.embed" in asyncio.run(run()).stages
+    finally:
+        pool.shutdown()
+
+
+def test_facades_delegate_to_the_wrapped_objects():
+    pool = BlockingPool(max_workers=2)
+    memory_manager = MagicMock()
+    memory_manager.get_context_snippets.return_value = ["likes tea"]
+    memory_manager.get_facts_page.return_value = ([], None)
+    storage = MagicMock()
+    storage.load_profile.return_value = {"name": "Sam"}
+    storage.get_context_for_prompt.return_value = "Name: Sam"
+    prompt_builder = MagicMock()
+    prompt_builder.build.return_value = "prompt"
+
+    async def run():
+        memory = AsyncMemoryManager(memory_manager, pool)
+        profile = AsyncStorage(storage, pool)
+        prompts = AsyncPromptBuilder(prompt_builder, pool)
+        await prompts.add_message("s", "user", "hi")
+        return (
+            await memory.get_context_snippets("tea", 2),
+            await memory.get_facts_page(category="interests", limit=5),
+            await profile.load_profile(),
+            await profile.get_context_for_prompt(),
+            await prompts.build("s", "hi", ["likes tea"])
+        )
+
+    try:
+        assert asyncio.run(run()) == (["likes tea"], ([], None), {"name": "Sam"}, "Name: Sam", "prompt")
+        memory_manager.get_context_snippets.assert_called_once_with("tea", 2)
+        memory_manager.get_facts_page.assert_called_once_with(category="interests", limit=5)
+        prompt_builder.add_message.assert_called_once_with("s", "user", "hi")
+        prompt_builder.build.assert_called_once_with("s", "hi", ["likes tea"])
+    finally:
+        pool.shutdown()
@@ -0,0 +1,75 @@
+import asyncio
+from unittest.mock import MagicMock
+import pytest
+from post_processing import PostProcessor
+
+
+@pytest.fixture
+def memory_manager():
+    manager = MagicMock()
+    manager.extract_facts_from_conversation.return_value = [{"content": "I like tea"}]
+    return manager
+
+
+def test_submitted_jobs_are_processed_before_stop_returns(memory_manager):
+    processor = PostProcessor(memory_manager, batch_size=4)
+
+    async def run():
+        processor.start()
+        for index in range(10):
+            await processor.submit("session", f"message {index}", "response")
+        await processor.stop()
+
+    asyncio.run(run())
+
+    conversations = [call.args[0] for call in memory_manager.add_conversations.call_args_list]
+    facts = [call.args[0] for call in memory_manager.add_facts.call_args_list]
+    assert sum(len(batch) for batch in conversations) == 10
+    assert sum(len(batch) for batch in facts) == 10
+    assert max(len(batch) for batch in conversations) <= 4
+    assert processor.processed == 10
+    assert processor.pending() == 0
+
+
+def test_failed_job_is_retried_without_duplicating_conversation(memory_manager):
+    memory_manager.add_facts.side_effect = [RuntimeError("chroma unavailable"), None]
+    processor = PostProcessor(memory_manager, retry_delay=0)
+
+    async def run():
+        await processor.submit("session", "I like tea", "Noted")
+        await processor.stop()
+
+    asyncio.run(run())
+
+    assert memory_manager.add_conversations.call_count == 1
+    assert memory_manager.add_facts.call_count == 2
+    assert processor.processed == 1
+    assert processor.dropped == 0
+
+
+def test_job_is_dropped_after_max_retries(memory_manager):
+    memory_manager.add_conversations.side_effect = RuntimeError("chroma unavailable")
+    processor = PostProcessor(memory_manager, max_retries=2, retry_delay=0)
+
+    async def run():
+        await processor.submit("session", "hello", "hi")
+        await processor.stop()
+
+    asyncio.run(run())
+
+    assert memory_manager.add_conversations.call_count == 3
+    assert processor.dropped == 1
+
+
+def test_submit_applies_backpressure_when_queue_is_full(memory_manager):
+    processor = PostProcessor(memory_manager, max_queue_size=1)
+
+    async def run():
+        processor.start()
+        for worker in processor._workers:
+            worker.cancel()
+        await processor.submit("session", "first", "response")
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(processor.submit("session", "second", "response"), 0.05)
+
+    asyncio.run(run())
@@ -0,0 +1,158 @@
+import pytest
+from conversation import ConversationHistory, SQLiteHistoryBackend
+from context_packer import ContextPacker
+from prompt_builder import PromptBuilder
+from storage import Storage
+
+
+def legacy_prompt(conv_context: str, memory_context: str, profile_context: str, message: str) -> str:
+    return f"""You are my personal AI assistant. Focus on responding directly to the current message while keeping relevant context in mind. Be concise and natural in your responses.
+
+Recent Context:
+{conv_context}
+
+Relevant Background:
+{memory_context}
+
+Profile Info:
+{profile_context}
+
+Current message: {message}
+
+Remember:
+- Respond directly to the current message
+- Only reference previous context if directly relevant
+- Keep responses concise and natural
+- Don't list out everything you know about me
+- If you learn new information, update your understanding without mentioning it"""
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = Storage(data_dir=str(tmp_path))
+    storage.save_profile({"name": "Test User", "location": "Test City"})
+    return storage
+
+
+@pytest.fixture
+def history():
+    return ConversationHistory()
+
+
+@pytest.fixture
+def builder(history, storage):
+    return PromptBuilder(history, storage)
+
+
+def test_build_matches_previous_inline_prompt(builder, history, storage):
+    builder.add_message("session", "user", "Hello")
+    builder.add_message("session", "assistant", "Hi there!")
+
+    prompt = builder.build("session", "How are you?", "I am a developer")
+
+    expected = legacy_prompt(
+        history.get_context_string("session"),
+        "I am a developer",
+        storage.get_context_for_prompt(),
+        "How are you?"
+    )
+    assert prompt.text == expected
+
+
+def test_history_is_extended_incrementally(builder, history):
+    for index in range(7):
+        builder.add_message("session", "user", f"Message {index}")
+        assert builder.history_text("session") == history.get_context_string("session")
+
+    assert builder._rendered["session"].lines[0] == "You: Message 2"
+
+
+def test_messages_added_outside_builder_are_picked_up(builder, history):
+    builder.add_message("session", "user", "Hello")
+    builder.history_text("session")
+
+    history.add_message("session", "assistant", "Added directly")
+
+    assert builder.history_text("session").endswith("Assistant: Added directly")
+
+
+def test_section_sizes(builder):
+    builder.add_message("session", "user", "Hello")
+
+    prompt = builder.build("session", "Question", "Memory")
+
+    assert prompt.sections["history"] == len("Recent conversation:\nYou: Hello")
+    assert prompt.sections["memory"] == len("Memory")
+    assert prompt.sections["message"] == len("Question")
+    assert sum(prompt.sections.values()) == len(prompt.text)
+
+
+def test_shared_backend_is_always_read_fresh(tmp_path, storage):
+    path = str(tmp_path / "history.db")
+    worker_one = PromptBuilder(ConversationHistory(backend=SQLiteHistoryBackend(path, batch_size=1)), storage)
+    worker_two = PromptBuilder(ConversationHistory(backend=SQLiteHistoryBackend(path, batch_size=1)), storage)
+
+    worker_one.add_message("session", "user", "Hello")
+    assert worker_two.history_text("session") == "Recent conversation:\nYou: Hello"
+
+    worker_two.add_message("session", "assistant", "Hi")
+    assert worker_one.history_text("session").endswith("Assistant: Hi")
+
+
+def test_token_usage_is_reported_per_section(builder):
+    builder.add_message("session", "user", "Hello")
+
+    prompt = builder.build("session", "Question", ["Memory"])
+
+    assert prompt.tokens["memory"] == 2
+    assert prompt.tokens["message"] == 2
+    assert set(prompt.tokens) == set(prompt.sections)
+
+
+def test_packer_leaves_prompts_within_budget_unchanged(history, storage):
+    packed_builder = PromptBuilder(history, storage, packer=ContextPacker(budget=1000))
+    plain_builder = PromptBuilder(history, storage)
+    packed_builder.add_message("session", "user", "Hello")
+
+    assert packed_builder.build("session", "Hi", ["Memory"]).text == plain_builder.build("session", "Hi", "Memory").text
+
+
+def test_packer_keeps_context_within_budget(history, storage):
+    builder = PromptBuilder(history, storage, packer=ContextPacker(budget=200))
+    builder.add_message("session", "user", "Here is my log: " + "error line\n" * 500)
+    builder.add_message("session", "assistant", "That looks like a disk problem")
+
+    prompt = builder.build("session", "Is it the disk?", ["I am a sysadmin", "I live in Oslo"])
+
+    assert prompt.tokens["history"] + prompt.tokens["memory"] + prompt.tokens["profile"] <= 200
+    assert "Name: Test User" in prompt.text
+    assert "I am a sysadmin" in prompt.text
+    assert "Assistant: That looks like a disk problem" in prompt.text
+    assert prompt.truncated + prompt.dropped >= 1
+
+
+def test_chat_messages_keep_static_content_first(builder, storage):
+    builder.add_message("session", "user", "Hello")
+    builder.add_message("session", "assistant", "Hi there!")
+
+    first = builder.build("session", "How are you?", ["I am a developer"]).messages
+    second = builder.build("session", "Anything new?", ["I live in Oslo"]).messages
+
+    assert first[0] == {"role": "system", "content": builder.system_message()}
+    assert "Name: Test User" in first[0]["content"]
+    assert first[1:3] == [{"role": "user", "content": "Hello"}, {"role": "assistant", "content": "Hi there!"}]
+    assert first[:3] == second[:3]
+    assert first[3] == {
+        "role": "user",
+        "content": "Relevant Background:\nI am a developer\n\nCurrent message: How are you?"
+    }
+
+
+def test_packed_chat_history_drops_role_labels(history, storage):
+    builder = PromptBuilder(history, storage, packer=ContextPacker(budget=60, min_truncated_tokens=1000))
+    builder.add_message("session", "user", "x" * 1000)
+    builder.add_message("session", "assistant", "Short answer")
+
+    messages = builder.build("session", "Next", []).messages
+
+    assert messages[1:-1] == [{"role": "assistant", "content": "Short answer"}]
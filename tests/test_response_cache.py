@@ -0,0 +1,83 @@
+import numpy as np
+from response_cache import ResponseCache, make_key
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def key(text: str, profile: str = "Name: Sam", vector=None, history: str = ""):
+    return make_key(f"prompt: {text}", [{"role": "user", "content": text}], profile, ["likes tea"], history, vector)
+
+
+def test_exact_prompt_hit_and_miss():
+    cache = ResponseCache(max_entries=4)
+    cache.put(key("hello"), "Hi there")
+
+    assert cache.get("chat", key("hello")) == "Hi there"
+    assert cache.get("chat", key("goodbye")) is None
+    assert cache.stats()["endpoints"]["chat"] == {"hits": 1, "semantic_hits": 0, "misses": 1, "hit_rate": 0.5}
+
+
+def test_disabled_cache_stores_nothing():
+    cache = ResponseCache(max_entries=0)
+    cache.put(key("hello"), "Hi there")
+
+    assert cache.get("chat", key("hello")) is None
+    assert cache.stats()["endpoints"] == {}
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = ResponseCache(max_entries=4, ttl=10, clock=clock)
+    cache.put(key("hello"), "Hi there")
+    clock.now = 11
+
+    assert cache.get("chat", key("hello")) is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.put(key("a"), "A")
+    cache.put(key("b"), "B")
+    cache.get("chat", key("a"))
+    cache.put(key("c"), "C")
+
+    assert cache.get("chat", key("b")) is None
+    assert cache.get("chat", key("a")) == "A"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_semantic_tier_reuses_close_paraphrase():
+    cache = ResponseCache(max_entries=4, semantic_distance=0.1)
+    cache.put(key("summarize my goals", vector=np.array([1.0, 0.0])), "Your goals are...")
+
+    close = key("summarise my goals please", vector=np.array([0.99, 0.05]))
+    far = key("what's the weather", vector=np.array([0.0, 1.0]))
+
+    assert cache.get("stream-chat", close) == "Your goals are..."
+    assert cache.get("stream-chat", far) is None
+    assert cache.stats()["endpoints"]["stream-chat"]["semantic_hits"] == 1
+
+
+def test_semantic_tier_requires_matching_fingerprint():
+    cache = ResponseCache(max_entries=4, semantic_distance=0.1)
+    cache.put(key("summarize my goals", vector=np.array([1.0, 0.0])), "Your goals are...")
+
+    other_profile = key("summarise my goals", profile="Name: Alex", vector=np.array([1.0, 0.0]))
+    other_history = key("summarise my goals", history="You: hi", vector=np.array([1.0, 0.0]))
+
+    assert cache.get("chat", other_profile) is None
+    assert cache.get("chat", other_history) is None
+
+
+def test_semantic_tier_is_off_without_threshold():
+    cache = ResponseCache(max_entries=4)
+    cache.put(key("summarize my goals", vector=np.array([1.0, 0.0])), "Your goals are...")
+
+    assert cache.get("chat", key("summarise my goals", vector=np.array([1.0, 0.0]))) is None
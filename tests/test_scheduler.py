@@ -0,0 +1,110 @@
+import asyncio
+import pytest
+from scheduler import FairScheduler, QueueFull
+
+
+def run(coroutine):
+    return asyncio.run(coroutine())
+
+
+def test_grants_immediately_below_limit():
+    async def scenario():
+        scheduler = FairScheduler(max_in_flight=2)
+        first = scheduler.enqueue("a")
+        second = scheduler.enqueue("a")
+        third = scheduler.enqueue("b")
+        return first.granted, second.granted, third.granted, scheduler.stats()
+
+    first, second, third, stats = run(scenario)
+
+    assert (first, second, third) == (True, True, False)
+    assert stats["in_flight"] == 2
+    assert stats["queue_depth"] == 1
+
+
+def test_waiting_sessions_are_served_round_robin():
+    async def scenario():
+        scheduler = FairScheduler(max_in_flight=1, max_queue_per_session=10)
+        running = scheduler.enqueue("busy")
+        greedy = [scheduler.enqueue("greedy") for _ in range(3)]
+        polite = scheduler.enqueue("polite")
+        order = []
+        current = running
+        for _ in range(4):
+            scheduler.release(current)
+            current = next(t for t in greedy + [polite] if t.granted and t not in order)
+            order.append(current)
+        return order, greedy, polite
+
+    order, greedy, polite = run(scenario)
+
+    assert order == [greedy[0], polite, greedy[1], greedy[2]]
+
+
+def test_position_counts_other_sessions_turns():
+    async def scenario():
+        scheduler = FairScheduler(max_in_flight=1, max_queue_per_session=10)
+        scheduler.enqueue("busy")
+        greedy = [scheduler.enqueue("greedy") for _ in range(3)]
+        polite = scheduler.enqueue("polite")
+        return [scheduler.position(t) for t in greedy], scheduler.position(polite)
+
+    greedy_positions, polite_position = run(scenario)
+
+    assert greedy_positions == [1, 3, 4]
+    assert polite_position == 2
+
+
+def test_rejects_when_session_or_total_queue_is_full():
+    async def scenario():
+        scheduler = FairScheduler(max_in_flight=1, max_queue=2, max_queue_per_session=1)
+        scheduler.enqueue("a")
+        scheduler.enqueue("a")
+        with pytest.raises(QueueFull):
+            scheduler.enqueue("a")
+        scheduler.enqueue("b")
+        with pytest.raises(QueueFull):
+            scheduler.enqueue("c")
+        return scheduler.stats()
+
+    stats = run(scenario)
+
+    assert stats["rejected"] == 2
+    assert stats["queue_depth"] == 2
+
+
+def test_releasing_a_waiting_ticket_leaves_the_queue():
+    async def scenario():
+        scheduler = FairScheduler(max_in_flight=1)
+        running = scheduler.enqueue("a")
+        waiting = scheduler.enqueue("b")
+        scheduler.release(waiting)
+        scheduler.release(waiting)
+        scheduler.release(running)
+        return waiting, scheduler.stats()
+
+    waiting, stats = run(scenario)
+
+    assert not waiting.granted
+    assert waiting.future.cancelled()
+    assert stats["in_flight"] == 0
+    assert stats["queue_depth"] == 0
+    assert stats["sessions_waiting"] == 0
+
+
+def test_acquire_waits_for_a_free_slot():
+    async def scenario():
+        scheduler = FairScheduler(max_in_flight=1)
+        running = scheduler.enqueue("a")
+        waiting = scheduler.enqueue("b")
+        granted_early = await scheduler.wait(waiting, 0.01)
+        asyncio.get_running_loop().call_later(0.01, scheduler.release, running)
+        await asyncio.wait_for(scheduler.acquire(waiting), 1)
+        return granted_early, waiting.granted, scheduler.stats()
+
+    granted_early, granted, stats = run(scenario)
+
+    assert not granted_early
+    assert granted
+    assert stats["admitted"] == 2
+    assert stats["wait_ms_max"] > 0
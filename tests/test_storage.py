@@ -58,4 +58,47 @@ def test_get_context_for_prompt_with_data(storage):
     assert "Occupation: Tester" in context
     assert "Interests: Testing" in context
     assert "Goals: Write more tests" in context
-    assert "Preferences: Python" in context
\ No newline at end of file
+    assert "Preferences: Python" in context
+
+def test_load_profile_returns_copy(storage):
+    storage.save_profile({"name": "Test User"})
+
+    storage.load_profile()["name"] = "Changed"
+
+    assert storage.load_profile()["name"] == "Test User"
+
+
+def test_cached_profile_does_not_reread_file(storage, monkeypatch):
+    storage.save_profile({"name": "Test User"})
+    storage.get_context_for_prompt()
+
+    def fail(*args, **kwargs):
+        raise AssertionError("profile.json should not be read")
+
+    monkeypatch.setattr(storage, "_read_profile", fail)
+    assert "Name: Test User" in storage.get_context_for_prompt()
+    assert storage.load_profile()["name"] == "Test User"
+
+
+def test_external_edit_is_picked_up_after_revalidation(temp_data_dir):
+    storage = Storage(data_dir=temp_data_dir, revalidate_interval=0)
+    storage.save_profile({"name": "Test User"})
+    assert "Name: Test User" in storage.get_context_for_prompt()
+
+    with open(storage.profile_path, 'w') as f:
+        json.dump({"name": "Edited By Hand", "location": "Somewhere"}, f)
+
+    context = storage.get_context_for_prompt()
+    assert "Name: Edited By Hand" in context
+    assert "Location: Somewhere" in context
+
+
+def test_save_profile_leaves_no_temp_files(storage, temp_data_dir):
+    storage.save_profile({"name": "Test User"})
+    storage.save_profile({"location": "Test City"})
+
+    assert os.listdir(temp_data_dir) == ["profile.json"]
+    with open(storage.profile_path, 'r') as f:
+        data = json.load(f)
+    assert data["name"] == "Test User"
+    assert data["location"] == "Test City"
@@ -0,0 +1,91 @@
+import asyncio
+from typing import AsyncIterator, List, Tuple
+import pytest
+from streaming import StreamCancelled, StreamRegistry, TokenCoalescer, replay
+
+
+async def _tokens(schedule: List[Tuple[float, str]]) -> AsyncIterator[str]:
+    for delay, token in schedule:
+        await asyncio.sleep(delay)
+        yield token
+
+
+def _frames(coalescer: TokenCoalescer, schedule: List[Tuple[float, str]]) -> List[str]:
+    async def run():
+        return [frame async for frame in coalescer.coalesce(_tokens(schedule))]
+    return asyncio.run(run())
+
+
+def test_fast_tokens_are_grouped_into_one_frame():
+    frames = _frames(TokenCoalescer(max_delay=0.5), [(0, "Hel"), (0, "lo"), (0, " there")])
+
+    assert frames == ["Hello there"]
+
+
+def test_frames_flush_when_size_limit_is_reached():
+    frames = _frames(TokenCoalescer(max_delay=10, max_bytes=4), [(0, "ab"), (0, "cd"), (0, "ef")])
+
+    assert frames == ["abcd", "ef"]
+
+
+def test_window_flushes_while_waiting_for_a_slow_token():
+    frames = _frames(TokenCoalescer(max_delay=0.02), [(0, "a"), (0, "b"), (0.2, "c")])
+
+    assert frames == ["ab", "c"]
+
+
+def test_zero_interval_passes_tokens_through():
+    frames = _frames(TokenCoalescer(max_delay=0), [(0, "a"), (0, "b")])
+
+    assert frames == ["a", "b"]
+
+
+def test_cancel_stops_the_stream_and_closes_upstream():
+    registry = StreamRegistry()
+    upstream = {"closed": False, "sent": 0}
+
+    async def slow_tokens() -> AsyncIterator[str]:
+        try:
+            while True:
+                upstream["sent"] += 1
+                yield "tok "
+                await asyncio.sleep(0.01)
+        finally:
+            upstream["closed"] = True
+
+    async def run():
+        handle = registry.open("stream", "session")
+        received = []
+        with pytest.raises(StreamCancelled):
+            async for token in handle.guard(slow_tokens()):
+                received.append(token)
+                if len(received) == 3:
+                    assert registry.cancel("stream", "session")
+        await asyncio.sleep(0.05)
+        return received
+
+    assert len(asyncio.run(run())) == 3
+    assert upstream["closed"]
+    assert upstream["sent"] <= 4
+    assert registry.cancelled == 1
+
+
+def test_only_the_owning_session_can_cancel():
+    registry = StreamRegistry()
+
+    async def run():
+        handle = registry.open("stream", "owner")
+        assert not registry.cancel("stream", "someone-else")
+        assert not registry.cancel("missing", "owner")
+        return handle.cancelled
+
+    assert asyncio.run(run()) is False
+    registry.close("stream")
+    assert len(registry) == 0
+
+
+def test_replay_splits_text_into_frames():
+    async def run():
+        return [frame async for frame in replay("abcdefg", 3)]
+
+    assert asyncio.run(run()) == ["abc", "def", "g"]